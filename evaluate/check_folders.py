@@ -1,59 +1,63 @@
-import json
 import os
-from tqdm import tqdm
 from dotenv import load_dotenv
-import openai
-from multiprocessing import Pool
+from utils.clients import get_client
+from utils.judge import judge_file, judge_version
+from utils.prefilter import rule_verdict
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import result_files
 
 load_dotenv()
 
-def query_openai(message):
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=openai_api_key)
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            temperature=0.0,
-            messages=[
-                {"role": "developer", "content": "You are a medical AI trained to evaluate answers on the MedQA dataset. Read the full LLM response carefully, including both the answer and its explanation. Compare both components against the correct answer and explanation criteria. Output 'true' only if both the answer and the explanation are correct and fully consistent with the expected solution; otherwise, output 'false'. Do not provide any additional text or explanations."},
-                {"role": "user", "content": message}
-            ]
-        )
-        return response.choices[0].message.content.strip().lower()
-    except Exception as e:
-        print(f"Error querying OpenAI: {e}")
-        return "false"
+MODEL_PARAMS = {"model": "gpt-4o", "temperature": 0.0}
+SYSTEM_PROMPT = "You are a medical AI trained to evaluate answers on the MedQA dataset. Read the full LLM response carefully, including both the answer and its explanation. Compare both components against the correct answer and explanation criteria. Output 'true' only if both the answer and the explanation are correct and fully consistent with the expected solution; otherwise, output 'false'. Do not provide any additional text or explanations."
+JUDGE_VERSION = judge_version(MODEL_PARAMS, SYSTEM_PROMPT)
+
+@cached_response(**MODEL_PARAMS, system=SYSTEM_PROMPT)
+@rate_limited("openai", MODEL_PARAMS)
+def request_verdict(message):
+    client = get_client("openai")
+    response = client.chat.completions.create(
+        **MODEL_PARAMS,
+        messages=[
+            {"role": "developer", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": message}
+        ]
+    )
+    return response.choices[0].message.content.strip().lower()
+
+def judge_message(entry):
+    response = entry.get("response", "")
+    correct_answer = entry.get("correct_answer", "")
+    answer_idx = entry.get("answer_idx", "")
+    return (
+        f"LLM Response: '{response}'\n"
+        f"Correct Answer: '{correct_answer}'\n"
+        f"Correct Answer Index: '{answer_idx}'"
+    )
+
+def should_judge(entry):
+    return entry.get('is_correct') != False
+
+def local_verdict(entry):
+    # Responses committing to a wrong option are 'false' by rules; the rest go to the judge.
+    return rule_verdict(entry.get("response", ""), entry.get("correct_answer", ""), entry.get("answer_idx", ""))
+
+def apply_verdict(entry, verdict):
+    if verdict == 'true':
+        entry["is_correct"] = True
+        return True
+    return False
 
 def process_json_file(json_path):
     try:
-        with open(json_path, 'r') as file:
-            data = json.load(file)
-    except Exception as e:
-        print(f"Error loading {json_path}: {e}")
+        corrected_count = judge_file(json_path, request_verdict, judge_message, apply_verdict, should_judge,
+                                     version=JUDGE_VERSION, prefilter=local_verdict)
+    except (OSError, ValueError) as e:
+        # The file is only replaced once every entry has a verdict.
+        print(f"Error processing {json_path}: {e}")
         return 0
 
-    corrected_count = 0
-    
-    for entry in tqdm(data, desc=f"Validating {os.path.basename(json_path)}", unit="entry"):
-        if entry.get('is_correct') != False:
-            response = entry.get("response", "")
-            correct_answer = entry.get("correct_answer", "")
-            answer_idx = entry.get("answer_idx", "")
-
-            query_message = (
-                f"LLM Response: '{response}'\n"
-                f"Correct Answer: '{correct_answer}'\n"
-                f"Correct Answer Index: '{answer_idx}'"
-            )
-
-            is_correct = query_openai(query_message)
-            if is_correct == 'true':
-                entry["is_correct"] = True
-                corrected_count += 1
-
-    with open(json_path, 'w') as file:
-        json.dump(data, file, indent=4)
-    
     print(f"Updated file: {json_path} | Corrected: {corrected_count}")
     return corrected_count
 
@@ -62,7 +66,9 @@ def process_folder(folder_path):
         print(f"Folder not found: {folder_path}")
         return 0
 
-    json_files = [f for f in os.listdir(folder_path) if f.endswith(".json")]
+    # Only result sets; verdict logs, request files and other artifacts next
+    # to them have a dot in the stem and are left alone.
+    json_files = [f for f in result_files(folder_path) if os.path.exists(os.path.join(folder_path, f))]
 
     if not json_files:
         print(f"No JSON files found in: {folder_path}")
@@ -90,8 +96,8 @@ def main():
     ]
     
     results = {}
-    with Pool(processes=2) as pool:
-        results_list = pool.map(process_folder, json_folders)
+    # Folders run one after another; the entries of each file are judged concurrently.
+    results_list = [process_folder(folder) for folder in json_folders]
     
     for model, count in zip(json_folders, results_list):
         results[model] = count
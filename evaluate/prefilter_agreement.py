@@ -0,0 +1,66 @@
+"""How often the rule prefilter agrees with verdicts the judge already gave.
+
+For every entry of the given result files that has a judge verdict, the
+verdict of utils/prefilter.py is compared with it. Verdicts are read from
+the <name>.verdicts.jsonl logs written by check_files/check_folders, or,
+with --from-field, from the is_correct field of files that were judged
+before the prefilter existed.
+
+    python -m evaluate.prefilter_agreement files results/llama3/llama3_8var.json
+    python -m evaluate.prefilter_agreement folders res_medbullet/gpt/ablation/*_results.json --from-field
+"""
+import argparse
+import importlib
+
+from utils.judge import logged_verdicts
+from utils.prefilter import agreement
+from utils.result_store import iter_json_file
+
+JUDGES = {"files": "evaluate.check_files", "folders": "evaluate.check_folders"}
+
+
+def field_verdicts(json_path):
+    for entry in iter_json_file(json_path):
+        value = entry.get("is_correct")
+        if value in (True, False, "true", "false"):
+            yield entry, "true" if value in (True, "true") else "false"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the rule prefilter with stored judge verdicts.")
+    parser.add_argument("judge", choices=list(JUDGES), help="which evaluate script judged the files")
+    parser.add_argument("files", nargs="+", help="judged result files")
+    parser.add_argument("--from-field", action="store_true",
+                        help="use is_correct as the judge verdict (files judged before the prefilter)")
+    parser.add_argument("--show", type=int, default=5, help="disagreements to print")
+    args = parser.parse_args()
+    judge = importlib.import_module(JUDGES[args.judge])
+
+    pairs = []
+    disagreements = []
+    for json_path in args.files:
+        if args.from_field:
+            judged = field_verdicts(json_path)
+        else:
+            judged = logged_verdicts(json_path, judge.judge_message, judge.JUDGE_VERSION)
+        for entry, verdict in judged:
+            rule = judge.local_verdict(entry)
+            pairs.append((rule, verdict))
+            if rule is not None and rule != verdict:
+                disagreements.append((json_path, entry))
+
+    counts = agreement(pairs)
+    if not counts["total"]:
+        print("No judged entries found.")
+        return
+    settled = counts["settled"]
+    print(f"{counts['total']} judged entries, {settled} ({settled / counts['total']:.1%}) settled by rules")
+    if settled:
+        print(f"Judge agreed on {counts['agreed']} of them ({counts['agreed'] / settled:.2%}); "
+              f"{counts['judge_true']} were 'true' for the judge")
+    for json_path, entry in disagreements[:args.show]:
+        print(f"\n{json_path}:\n{str(entry.get('response', ''))[:300]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,10 @@
+import os
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib as mpl
+from utils.result_table import ablation_accuracy, results_root_arg, scan_results
 
 exclusion = ['No Exclusion', 'Physical Exam', 'Past History', 'History Taking', 'Demographic', 'Lab Diagnostic', 'Other']
-medqa = {
-    'Pharmacotherapy, Interventions and Management': {},
-    'Diagnosis': {},
-    'Health Maintenance, Prevention and Surveillance': {}
-}
-
-medbullet = {
-    'Diagnosis': {},
-    'Health Maintenance, Prevention and Surveillance': {},
-    'Pharmacotherapy, Interventions and Management': {}
-}
-
-datasets = {'MedQA': medqa, 'MedBullet': medbullet}
-
 colors = {
     'GPT-4o': '#5b9bd5',
     'Claude-3.5 Haiku': '#9e480e',
@@ -28,6 +16,26 @@ colors = {
     'DeepSeek-R1 8B': '#d36b6b'
 }
 
+categories = ['Pharmacotherapy, Interventions and Management', 'Diagnosis', 'Health Maintenance, Prevention and Surveillance']
+# Ablation files in the order of ``exclusion``.
+exclusion_keys = ['no_exclusion', 'physical_exam', 'past_history', 'history_taking', 'demographic_data', 'lab_tests', 'others']
+
+def category_data(results_dir, categories):
+    table = scan_results(results_dir)
+    models = list(colors)
+    data = {}
+    for category in categories:
+        accuracy = ablation_accuracy(table, models, exclusion_keys, category=category)
+        # Models without results for a category are left out of its chart.
+        data[category] = {model: values.tolist() for model, values in zip(models, accuracy)
+                          if not np.isnan(values).all()}
+    return data
+
+results_root = results_root_arg('Ablation accuracy per question category.')
+medqa = category_data(os.path.join(results_root, 'medqa_results'), categories)
+medbullet = category_data(os.path.join(results_root, 'medbullets_results'), [categories[1], categories[2], categories[0]])
+datasets = {'MedQA': medqa, 'MedBullet': medbullet}
+
 primary_models = ['Llama-3 Med42 8B', 'Llama-3 8B', 'DeepSeek-R1 8B']
 secondary_models = ['GPT-4o', 'Claude-3.5 Haiku', 'Claude-3.5 Sonnet', 'Gemini-1.5 Pro', 'Gemini-1.5 Flash']
 
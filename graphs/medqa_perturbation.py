@@ -3,6 +3,9 @@ import pandas as pd
 from statsmodels.stats.multitest import multipletests
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+import os
+from utils.result_table import perturbation_counts, results_root_arg, scan_results, unperturbed_counts
+from utils.stats import accuracy_ci, bootstrap_accuracy, make_rng, permutation_test, proportion_test
 plt.rcParams['hatch.linewidth'] = 3
 
 
@@ -17,49 +20,39 @@ variations = ["Original prompt",
 "Definitive Tone/Novice physician/Medical assistant AI",
 "Definitive Tone/Expert physician/Medical expert AI",
 "Definitive Tone/Expert physician/Medical assistant AI"]
-medqa = np.array([], dtype=object)
-baseline_counts = {
-'GPT-4o': (0, 0),
-'Claude-3.5 Haiku': (0, 0),
-'Claude-3.5 Sonnet': (0, 0),
-'Gemini-1.5 Pro': (0, 0),
-'Gemini-1.5 Flash': (0, 0),
-'Llama-3 8B': (0, 0),
-'Llama-3 Med42 8B': (0, 0),
-'DeepSeek-R1 8B': (0, 0)
-}
+# Folder the runners wrote to (utils.scheduler.OUTPUT_ROOTS).
+RESULTS_DIR = os.path.join(results_root_arg("MedQA perturbation accuracy chart."), "medqa_results")
+table = scan_results(RESULTS_DIR)
+medqa = perturbation_counts(table, models, variations)
+baseline_counts = dict(zip(models, map(tuple, unperturbed_counts(table, models))))
+
 data = np.array([[t/(t+f)*100 for t,f in model_data] for model_data in medqa])
 
-def paired_permutation_test(baseline, perturbed, n_permutations=10000):
-    observed_diff = np.mean(perturbed) - np.mean(baseline)
-    combined = np.concatenate((baseline, perturbed))
-    n = len(baseline)
-    count = 0
-    for _ in range(n_permutations):
-        np.random.shuffle(combined)
-        perm_baseline = combined[:n]
-        perm_perturbed = combined[n:]
-        perm_diff = np.mean(perm_perturbed) - np.mean(perm_baseline)
-        if abs(perm_diff) >= abs(observed_diff):
-            count += 1
-    return count/n_permutations
+N_RESAMPLES = 1000
+CI_METHOD = "percentile"  # "percentile", "bca" or "wilson"
+# "permutation" (bootstrap + permutation test), or "fisher"/"ztest" straight
+# from the counts in well under a second.
+SIGNIFICANCE_TEST = "permutation"
+rng = make_rng()
+counts = np.array(medqa.tolist(), dtype=float)
+perturbed_true = counts[..., 0]
+perturbed_total = counts.sum(axis=-1)
+baseline = np.array([baseline_counts[model] for model in models], dtype=float)
+baseline_true = np.repeat(baseline[:, :1], len(variations), axis=1)
+baseline_total = np.repeat(baseline.sum(axis=1, keepdims=True), len(variations), axis=1)
 
-p_values = np.zeros((len(models), len(variations)))
-ci_lower = np.zeros((len(models), len(variations)))
-ci_upper = np.zeros((len(models), len(variations)))
-for i, model in enumerate(models):
-    baseline_true, baseline_false = baseline_counts[model]
-    baseline_total = baseline_true + baseline_false
-    for j in range(len(variations)):
-        perturbed_true, perturbed_false = medqa[i][j]
-        perturbed_total = perturbed_true + perturbed_false
-        obs_perturbed = perturbed_true/perturbed_total*100
-        baseline_bs = [np.random.binomial(n=baseline_total, p=baseline_true/baseline_total)/baseline_total*100 for _ in range(1000)]
-        perturbed_bs = [np.random.binomial(n=perturbed_total, p=perturbed_true/perturbed_total)/perturbed_total*100 for _ in range(1000)]
-        boot_ci = np.percentile(perturbed_bs, [2.5, 97.5])
-        ci_lower[i,j] = obs_perturbed - boot_ci[0]
-        ci_upper[i,j] = boot_ci[1] - obs_perturbed
-        p_values[i,j] = paired_permutation_test(baseline_bs, perturbed_bs)
+baseline_bs = bootstrap_accuracy(baseline_true, baseline_total, N_RESAMPLES, rng)
+perturbed_bs = bootstrap_accuracy(perturbed_true, perturbed_total, N_RESAMPLES, rng)
+lower, upper = accuracy_ci(perturbed_true, perturbed_total, CI_METHOD, samples=perturbed_bs)
+ci_lower = data - lower
+ci_upper = upper - data
+if SIGNIFICANCE_TEST == "permutation":
+    p_values = np.zeros((len(models), len(variations)))
+    for i in range(len(models)):
+        for j in range(len(variations)):
+            p_values[i, j] = permutation_test(baseline_bs[i, j], perturbed_bs[i, j], rng=rng)
+else:
+    p_values = proportion_test(SIGNIFICANCE_TEST, baseline_true, baseline_total, perturbed_true, perturbed_total)
 
 adjusted_p_values = multipletests(p_values.flatten(), method="fdr_bh")[1].reshape(p_values.shape)
 
@@ -4,6 +4,7 @@ from statsmodels.stats.multitest import multipletests
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.legend_handler import HandlerPatch
+from utils.stats import accuracy_ci, bootstrap_accuracy, make_rng, permutation_test, proportion_test
 plt.rcParams['font.family'] = 'Arial'
 plt.rcParams['hatch.linewidth'] = 5
 class CustomHatchHandler(HandlerPatch):
@@ -72,20 +73,6 @@ HealthMaintenance_Prevention_and_Surveillance_counts = {
 
 
 
-def paired_permutation_test(baseline, perturbed, n_permutations=10000):
-    observed_diff = np.mean(perturbed) - np.mean(baseline)
-    combined = np.concatenate((baseline, perturbed))
-    n = len(baseline)
-    count = 0
-    for _ in range(n_permutations):
-        np.random.shuffle(combined)
-        perm_baseline = combined[:n]
-        perm_perturbed = combined[n:]
-        perm_diff = np.mean(perm_perturbed) - np.mean(perm_baseline)
-        if abs(perm_diff) >= abs(observed_diff):
-            count += 1
-    return count/n_permutations
-
 def plot_data(data, ci_lower, ci_upper, p_vals, title, save_path):
     x = np.arange(len(variations))
     width = 0.6
@@ -149,23 +136,36 @@ categories = {
     "Health Maintenance, Prevention and Surveillance": (HealthMaintenance_Prevention_and_Surveillance, HealthMaintenance_Prevention_and_Surveillance_counts, "medqa_health_maintenance_prevention_and_surveillance.png")
 }
 
-for cat_name, (cat_array, cat_counts, filename) in categories.items():
-    data = np.array([[t/(t+f)*100 for t, f in row] for row in cat_array])
-    ci_lower = np.zeros((len(models), len(variations)))
-    ci_upper = np.zeros((len(models), len(variations)))
-    p_values = np.zeros((len(models), len(variations)))
-    for i, model in enumerate(models):
-        baseline_true, baseline_false = cat_counts[model]
-        baseline_total = baseline_true + baseline_false
-        for j in range(len(variations)):
-            perturbed_true, perturbed_false = cat_array[i][j]
-            perturbed_total = perturbed_true + perturbed_false
-            obs_perturbed = perturbed_true/perturbed_total*100
-            baseline_bs = [np.random.binomial(n=baseline_total, p=baseline_true/baseline_total)/baseline_total*100 for _ in range(1000)]
-            perturbed_bs = [np.random.binomial(n=perturbed_total, p=perturbed_true/perturbed_total)/perturbed_total*100 for _ in range(1000)]
-            boot_ci = np.percentile(perturbed_bs, [2.5, 97.5])
-            ci_lower[i, j] = obs_perturbed - boot_ci[0]
-            ci_upper[i, j] = boot_ci[1] - obs_perturbed
-            p_values[i, j] = paired_permutation_test(baseline_bs, perturbed_bs)
+N_RESAMPLES = 1000
+CI_METHOD = "percentile"  # "percentile", "bca" or "wilson"
+# "permutation" (bootstrap + permutation test), or "fisher"/"ztest" straight
+# from the counts in well under a second.
+SIGNIFICANCE_TEST = "permutation"
+rng = make_rng()
+# Every category's cells are bootstrapped together: (category, model, variation).
+counts = np.array([cat_array.tolist() for cat_array, _, _ in categories.values()], dtype=float)
+perturbed_true = counts[..., 0]
+perturbed_total = counts.sum(axis=-1)
+baseline = np.array([[cat_counts[model] for model in models] for _, cat_counts, _ in categories.values()], dtype=float)
+baseline_true = np.repeat(baseline[..., :1], len(variations), axis=-1)
+baseline_total = np.repeat(baseline.sum(axis=-1, keepdims=True), len(variations), axis=-1)
+
+baseline_bs = bootstrap_accuracy(baseline_true, baseline_total, N_RESAMPLES, rng)
+perturbed_bs = bootstrap_accuracy(perturbed_true, perturbed_total, N_RESAMPLES, rng)
+lower, upper = accuracy_ci(perturbed_true, perturbed_total, CI_METHOD, samples=perturbed_bs)
+accuracies = perturbed_true / perturbed_total * 100
+
+for c, (cat_name, (cat_array, cat_counts, filename)) in enumerate(categories.items()):
+    data = accuracies[c]
+    ci_lower = data - lower[c]
+    ci_upper = upper[c] - data
+    if SIGNIFICANCE_TEST == "permutation":
+        p_values = np.zeros((len(models), len(variations)))
+        for i in range(len(models)):
+            for j in range(len(variations)):
+                p_values[i, j] = permutation_test(baseline_bs[c, i, j], perturbed_bs[c, i, j], rng=rng)
+    else:
+        p_values = proportion_test(SIGNIFICANCE_TEST, baseline_true[c], baseline_total[c],
+                                   perturbed_true[c], perturbed_total[c])
     adjusted_p_values = multipletests(p_values.flatten(), method="fdr_bh")[1].reshape(p_values.shape)
     plot_data(data, ci_lower, ci_upper, adjusted_p_values, "LLM Performance Across Perturbations (MedQA)\n" + cat_name, filename)
\ No newline at end of file
@@ -1,6 +1,8 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap
+from utils.result_table import EXCLUSIONS, ablation_accuracy, results_root_arg, scan_results
 
 def create_radar_chart(data, title, ax, colors):
     labels = ['No Exclusion', 'Demographic Data', 'History Taking', 
@@ -39,22 +41,34 @@ def create_radar_chart(data, title, ax, colors):
     
     ax.set_title(title, fontsize=14, fontweight='bold', y=1.1)
     ax.legend(loc="lower center", bbox_to_anchor=(0.5, -0.15), ncol=8, fontsize=10)
-    # Data
-    data1 = { "Llama 3 Med42 (8B)": [], "Llama 3 (8B)": [], "DeepSeek (8B)": [] } 
-    data2 = { "GPT-4o": [], "Gemini 1.5 Pro": [], "Gemini 1.5 Flash": [], "Claude 3.5 Sonnet": [], "Claude 3.5 Haiku": [] }
 
-    data3 = {
-        "Llama 3 Med42 (8B)": [],
-        "Llama 3 (8B)": [],
-        "DeepSeek (8B)": []
-    }
-    data4 = {
-        "GPT-4o": [],
-        "Gemini 1.5 Pro": [],
-        "Gemini 1.5 Flash": [],
-        "Claude 3.5 Sonnet": [],
-        "Claude 3.5 Haiku": []
-    }
+# Legend label -> model label in utils.result_table.
+MODEL_NAMES = {
+    "Llama 3 Med42 (8B)": "Llama-3 Med42 8B",
+    "Llama 3 (8B)": "Llama-3 8B",
+    "DeepSeek (8B)": "DeepSeek-R1 8B",
+    "GPT-4o": "GPT-4o",
+    "Gemini 1.5 Pro": "Gemini-1.5 Pro",
+    "Gemini 1.5 Flash": "Gemini-1.5 Flash",
+    "Claude 3.5 Sonnet": "Claude-3.5 Sonnet",
+    "Claude 3.5 Haiku": "Claude-3.5 Haiku",
+}
+EXCLUSION_KEYS = list(EXCLUSIONS)
+
+def ablation_data(table, names):
+    accuracy = ablation_accuracy(table, [MODEL_NAMES[name] for name in names], EXCLUSION_KEYS)
+    return {name: values.tolist() for name, values in zip(names, accuracy)}
+
+# Data
+results_root = results_root_arg("Ablation radar charts for open and proprietary models.")
+medqa_table = scan_results(os.path.join(results_root, "medqa_results"))
+medbullets_table = scan_results(os.path.join(results_root, "medbullets_results"))
+open_models = ["Llama 3 Med42 (8B)", "Llama 3 (8B)", "DeepSeek (8B)"]
+proprietary_models = ["GPT-4o", "Gemini 1.5 Pro", "Gemini 1.5 Flash", "Claude 3.5 Sonnet", "Claude 3.5 Haiku"]
+data1 = ablation_data(medqa_table, open_models)
+data2 = ablation_data(medqa_table, proprietary_models)
+data3 = ablation_data(medbullets_table, open_models)
+data4 = ablation_data(medbullets_table, proprietary_models)
 
 set1_colors = plt.get_cmap('Dark2').colors
 set2_colors = plt.get_cmap('Set1').colors
@@ -1,50 +1,23 @@
-import google.generativeai as genai
 from dotenv import load_dotenv
 import json
 import os
 from tqdm import tqdm
 import re
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.checkpoint import Checkpoint
+from utils.clients import get_gemini_model
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-pro")
+
+MODEL_PARAMS = {"model": "gemini-1.5-pro"}
 
 def load_json(file_path):
     with open(file_path, "r") as f:
         return json.load(f)
 
 
-def save_results_to_json(results, output_dir, filename):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    out_path = os.path.join(output_dir, filename)
-
-    # Read existing results from the file, if any
-    if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-        with open(out_path, "r", encoding="utf-8") as f:
-            try:
-                existing_results = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: {filename} is corrupted or empty. Starting fresh.")
-                existing_results = []
-    else:
-        existing_results = []
-
-    # Deduplicate by ensuring no repeated prompts
-    existing_prompts = {entry["prompt"] for entry in existing_results}
-    new_results = [record for record in results if record["prompt"] not in existing_prompts]
-
-    # Append only new results
-    combined_results = existing_results + new_results
-
-    # Write combined results to the file
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(combined_results, f, indent=4)
-
-    print(f"Results saved to {out_path}")
-
-
 def create_prompt(data_entry):
     question = data_entry["question"]
     options = data_entry["options"]
@@ -69,13 +42,30 @@ def extract_answer(response_text):
     return "Unknown"  # Return "Unknown" if no match is found
 
 
+@cached_response(**MODEL_PARAMS)
+@rate_limited("gemini", MODEL_PARAMS)
 def query_gemini(prompt):
     
-    response = model.generate_content(prompt)
+    response = get_gemini_model(MODEL_PARAMS["model"]).generate_content(prompt)
     return response.text
 
 
 
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    model_answer = extract_answer(response_text)
+
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry["answer_idx"],
+        "category": data_entry["category"],
+        "is_correct": model_answer == data_entry["answer_idx"],
+    }
+    return record
+
+
 def process_datasets(input_dir, output_dir):
     if not os.path.exists(input_dir):
         print(f"Input directory '{input_dir}' does not exist.")
@@ -92,30 +82,14 @@ def process_datasets(input_dir, output_dir):
 
         dataset = load_json(dataset_path)
         output_file = f"{dataset_name}.json"
-        results = []
-
-        for data_entry in tqdm(dataset, desc=f"Processing {dataset_file}", leave=False):
-            try:
-                prompt = create_prompt(data_entry)
-                response_text = query_gemini(prompt)
-                model_answer = extract_answer(response_text)
-
-                record = {
-                    "prompt": prompt,
-                    "response": response_text,
-                    "correct_answer": data_entry["answer"],
-                    "answer_idx": data_entry["answer_idx"],
-                    "category": data_entry["category"],
-                    "is_correct": model_answer == data_entry["answer_idx"],
-                }
-                results.append(record)
-
-                # Save results incrementally
-                save_results_to_json([record], output_dir, output_file)
-
-            except Exception as e:
-                print(f"Error during query for {dataset_file}: {e}")
-                continue
+
+        checkpoint = Checkpoint(output_dir, output_file, dataset_path)
+        with ResultWriter(output_dir, output_file) as writer, checkpoint:
+            evaluate_prompts(
+                iter_entry_prompts(dataset, create_prompt), query_gemini, build_record, writer,
+                provider="gemini", desc=f"Processing {dataset_file}", total=len(dataset),
+                checkpoint=checkpoint,
+            )
 
 
 
@@ -2,19 +2,26 @@ import json
 import os
 from dotenv import load_dotenv
 from tqdm import tqdm
-import anthropic
 import re
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.batch import run_batch
+from utils.checkpoint import Checkpoint
+from utils.clients import get_client
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 
 # Load environment variables
 load_dotenv()
-anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-client = anthropic.Anthropic(api_key=anthropic_api_key)
 
+MODEL_PARAMS = {"model": "claude-3-5-haiku-20241022", "max_tokens": 350}
+
+@cached_response(**MODEL_PARAMS)
+@rate_limited("anthropic", MODEL_PARAMS)
 def query_claude(prompt):
     """Query Claude AI model with a given prompt."""
-    response = client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=350,
+    response = get_client("anthropic").messages.create(
+        **MODEL_PARAMS,
         messages=[
             {"role": "user", "content": prompt},
         ],
@@ -53,18 +60,24 @@ def create_prompt(data_entry):
     )
     return prompt
 
-def save_results_to_json(results, output_file):
-    """Save processed results to a JSON file."""
-    output_dir = os.path.dirname(output_file)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=4)
-    
-    print(f"Results saved to {output_file}")
-
-def process_dataset(file_path, output_file):
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    chosen_answer = extract_answer(response_text)
+    answer = data_entry["answer"]
+    is_correct = chosen_answer == answer
+
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "chosen_answer": chosen_answer,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry.get("answer_idx", ""),
+        "category": data_entry["category"],
+        "is_correct": is_correct,
+    }
+    return record
+
+def process_dataset(file_path, output_file, batch=False):
     """Process a single JSON dataset file."""
     try:
         dataset = load_json(file_path)
@@ -75,51 +88,40 @@ def process_dataset(file_path, output_file):
         print(f"Error decoding {file_path}: {e}")
         return
 
-    results = []
-
-    for data_entry in tqdm(dataset, desc=f"Processing {os.path.basename(file_path)}"):
-        prompt = create_prompt(data_entry)
-        try:
-            response_text = query_claude(prompt)
-            chosen_answer = extract_answer(response_text)
-            answer = data_entry["answer"]
-            is_correct = chosen_answer == answer
-
-            record = {
-                "prompt": prompt,
-                "response": response_text,
-                "chosen_answer": chosen_answer,
-                "correct_answer": data_entry["answer"],
-                "answer_idx": data_entry.get("answer_idx", ""),
-                "category": data_entry["category"],
-                "is_correct": is_correct,
-            }
-            results.append(record)
-        except Exception as e:
-            print(f"Error during query or processing for {file_path}: {e}")
-            continue
-
-    save_results_to_json(results, output_file)
-
-def main():
-    """Main function to process multiple JSON files in a folder."""
-    INPUT_DIR = "/home/ujinkang/Desktop/vscode/ubunut/medbullet_asfd"
-    OUTPUT_DIR = "/home/ujinkang/Desktop/vscode/ubunut/res_medbullet/haiku/ablation"
-    
-    if not os.path.exists(INPUT_DIR):
-        print(f"Error: Input directory '{INPUT_DIR}' does not exist.")
+    checkpoint = Checkpoint(os.path.dirname(output_file), os.path.basename(output_file), file_path)
+    with ResultWriter(os.path.dirname(output_file), os.path.basename(output_file)) as writer, checkpoint:
+        if batch:
+            run_batch(iter_entry_prompts(dataset, create_prompt), "anthropic", MODEL_PARAMS,
+                      build_record, writer, checkpoint=checkpoint)
+            return
+        evaluate_prompts(
+            iter_entry_prompts(dataset, create_prompt), query_claude, build_record, writer,
+            provider="anthropic", desc=f"Processing {os.path.basename(file_path)}", total=len(dataset),
+            checkpoint=checkpoint,
+        )
+
+def process_datasets(input_dir, output_dir, batch=False):
+    """Process every JSON file in a folder."""
+    if not os.path.exists(input_dir):
+        print(f"Error: Input directory '{input_dir}' does not exist.")
         return
     
-    json_files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".json")]
+    json_files = [f for f in os.listdir(input_dir) if f.endswith(".json")]
     
     if not json_files:
-        print(f"No JSON files found in '{INPUT_DIR}'.")
+        print(f"No JSON files found in '{input_dir}'.")
         return
 
     for json_file in tqdm(json_files, desc="Processing datasets"):
-        input_path = os.path.join(INPUT_DIR, json_file)
-        output_path = os.path.join(OUTPUT_DIR, json_file)
-        process_dataset(input_path, output_path)
+        input_path = os.path.join(input_dir, json_file)
+        output_path = os.path.join(output_dir, json_file)
+        process_dataset(input_path, output_path, batch=batch)
+
+def main():
+    """Main function to process multiple JSON files in a folder."""
+    INPUT_DIR = "/home/ujinkang/Desktop/vscode/ubunut/medbullet_asfd"
+    OUTPUT_DIR = "/home/ujinkang/Desktop/vscode/ubunut/res_medbullet/haiku/ablation"
+    process_datasets(INPUT_DIR, OUTPUT_DIR)
 
 if __name__ == "__main__":
     main()
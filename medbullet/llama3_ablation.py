@@ -2,40 +2,21 @@ from dotenv import load_dotenv
 import json
 import os
 import re
-import ollama
-from tqdm import tqdm
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.checkpoint import Checkpoint
+from utils.ollama_backend import ollama_generate, warm_up
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 
 load_dotenv()
 
+MODEL_PARAMS = {"model": "llama3:instruct"}
+
 def load_json(file_path):
     with open(file_path, "r") as f:
         return json.load(f)
 
-def save_results_to_json(results, output_file):
-    output_dir = os.path.dirname(output_file)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-        with open(output_file, "r", encoding="utf-8") as f:
-            try:
-                existing_results = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: {output_file} is corrupted or empty. Starting fresh.")
-                existing_results = []
-    else:
-        existing_results = []
-
-    existing_prompts = {entry["prompt"] for entry in existing_results}
-    new_results = [record for record in results if record["prompt"] not in existing_prompts]
-    
-    combined_results = existing_results + new_results
-    
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(combined_results, f, indent=4)
-    
-    print(f"Results saved to {output_file}")
-
 def create_prompt(data_entry):
     question = data_entry["question"]
     options = data_entry["options"]
@@ -53,9 +34,24 @@ def extract_answer(response_text):
     answer_match = re.search(r"Answer:\s*([A-Z])", response_clean)
     return answer_match.group(1) if answer_match else "Unknown"
 
+@cached_response(**MODEL_PARAMS)
+@rate_limited("ollama", MODEL_PARAMS)
 def query_ollama(messages):
-    response = ollama.generate(model="llama3:instruct", prompt=messages, stream=False)
-    return response["response"]
+    return ollama_generate(**MODEL_PARAMS, prompt=messages)
+
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    model_answer = extract_answer(response_text)
+
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry["answer_idx"],
+        "category": data_entry["category"],
+        "is_correct": model_answer == data_entry["answer"],
+    }
+    return record
 
 def process_dataset(input_file, output_file):
     if not os.path.exists(input_file):
@@ -63,28 +59,23 @@ def process_dataset(input_file, output_file):
         return
     
     dataset = load_json(input_file)
-    results = []
-    
-    for data_entry in tqdm(dataset, desc="Processing dataset"):
-        try:
-            prompt = create_prompt(data_entry)
-            response_text = query_ollama(prompt)
-            model_answer = extract_answer(response_text)
-            
-            record = {
-                "prompt": prompt,
-                "response": response_text,
-                "correct_answer": data_entry["answer"],
-                "answer_idx": data_entry["answer_idx"],
-                "category": data_entry["category"],
-                "is_correct": model_answer == data_entry["answer"],
-            }
-            results.append(record)
-            
-            save_results_to_json([record], output_file)
-        except Exception as e:
-            print(f"Error during query for {input_file}: {e}")
-            continue
+
+    warm_up(MODEL_PARAMS["model"])
+    checkpoint = Checkpoint(os.path.dirname(output_file), os.path.basename(output_file), input_file)
+    with ResultWriter(os.path.dirname(output_file), os.path.basename(output_file)) as writer, checkpoint:
+        evaluate_prompts(
+            iter_entry_prompts(dataset, create_prompt), query_ollama, build_record, writer,
+            provider="ollama", desc="Processing dataset", total=len(dataset),
+            checkpoint=checkpoint,
+        )
+
+def process_datasets(input_dir, output_dir):
+    if not os.path.exists(input_dir):
+        print(f"Input directory '{input_dir}' does not exist.")
+        return
+
+    for dataset_file in sorted(f for f in os.listdir(input_dir) if f.endswith(".json")):
+        process_dataset(os.path.join(input_dir, dataset_file), os.path.join(output_dir, dataset_file))
 
 if __name__ == "__main__":
     INPUT_FILE = "/home/ujinkang/Desktop/vscode/ubunut/medbullet_dataset.json"
@@ -6,46 +6,22 @@ import json
 import os
 from tqdm import tqdm
 import re
-import ollama
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.checkpoint import Checkpoint
+from utils.ollama_backend import ollama_generate, warm_up
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 
 load_dotenv()
 
+MODEL_PARAMS = {"model": "thewindmom/llama3-med42-8b", "options": {"num_predict": 350}}
+
 def load_json(file_path):
     with open(file_path, "r") as f:
         return json.load(f)
 
 
-def save_results_to_json(results, output_dir, filename):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    out_path = os.path.join(output_dir, filename)
-
-    # Read existing results from the file, if any
-    if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-        with open(out_path, "r", encoding="utf-8") as f:
-            try:
-                existing_results = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: {filename} is corrupted or empty. Starting fresh.")
-                existing_results = []
-    else:
-        existing_results = []
-
-    # Deduplicate by ensuring no repeated prompts
-    existing_prompts = {entry["prompt"] for entry in existing_results}
-    new_results = [record for record in results if record["prompt"] not in existing_prompts]
-
-    # Append only new results
-    combined_results = existing_results + new_results
-
-    # Write combined results to the file
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(combined_results, f, indent=4)
-
-    print(f"Results saved to {out_path}")
-
-
 def create_prompt(data_entry):
     question = data_entry["question"]
     options = data_entry["options"]
@@ -70,11 +46,27 @@ def extract_answer(response_text):
     return "Unknown"
 
 
+@cached_response(**MODEL_PARAMS)
+@rate_limited("ollama", MODEL_PARAMS)
 def query_ollama(messages):
-    response = ollama.generate(model="thewindmom/llama3-med42-8b", prompt=messages, options={"num_predict": 350}, stream=False)
-    return response["response"]
+    return ollama_generate(**MODEL_PARAMS, prompt=messages)
+
 
 
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    model_answer = extract_answer(response_text)
+
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry["answer_idx"],
+        "category": data_entry["category"],
+        "is_correct": model_answer == data_entry["answer"],
+    }
+    return record
+
 
 def process_datasets(input_dir, output_dir):
     if not os.path.exists(input_dir):
@@ -92,30 +84,15 @@ def process_datasets(input_dir, output_dir):
 
         dataset = load_json(dataset_path)
         output_file = f"{dataset_name}_results.json"
-        results = []
-
-        for data_entry in tqdm(dataset, desc=f"Processing {dataset_file}", leave=False):
-            try:
-                prompt = create_prompt(data_entry)
-                response_text = query_ollama(prompt)
-                model_answer = extract_answer(response_text)
-
-                record = {
-                    "prompt": prompt,
-                    "response": response_text,
-                    "correct_answer": data_entry["answer"],
-                    "answer_idx": data_entry["answer_idx"],
-                    "category": data_entry["category"],
-                    "is_correct": model_answer == data_entry["answer"],
-                }
-                results.append(record)
-
-                # Save results incrementally
-                save_results_to_json([record], output_dir, output_file)
-
-            except Exception as e:
-                print(f"Error during query for {dataset_file}: {e}")
-                continue
+
+        warm_up(MODEL_PARAMS["model"])
+        checkpoint = Checkpoint(output_dir, output_file, dataset_path)
+        with ResultWriter(output_dir, output_file) as writer, checkpoint:
+            evaluate_prompts(
+                iter_entry_prompts(dataset, create_prompt), query_ollama, build_record, writer,
+                provider="ollama", desc=f"Processing {dataset_file}", total=len(dataset),
+                checkpoint=checkpoint,
+            )
 
 
 
@@ -1,42 +1,24 @@
 from dotenv import load_dotenv
 import json
-import openai
 from tqdm import tqdm
 import os
 import re
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.batch import run_batch
+from utils.checkpoint import Checkpoint
+from utils.clients import get_client
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 
 load_dotenv()
 
+MODEL_PARAMS = {"model": "gpt-4o", "max_completion_tokens": 250}
+
 def load_json(file_path):
     with open(file_path, "r") as f:
         return json.load(f)
 
-def save_results_to_json(results, output_dir, filename):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    out_path = os.path.join(output_dir, filename)
-
-    if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
-        with open(out_path, "r", encoding="utf-8") as f:
-            try:
-                existing_results = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: {filename} is corrupted or empty. Starting fresh.")
-                existing_results = []
-    else:
-        existing_results = []
-
-    existing_prompts = {entry["prompt"] for entry in existing_results}
-    new_results = [record for record in results if record["prompt"] not in existing_prompts]
-
-    combined_results = existing_results + new_results
-
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(combined_results, f, indent=4)
-
-    print(f"Results saved to {out_path}")
-
 def extract_answer(response_text):
     response_clean = response_text.strip()
     
@@ -59,17 +41,32 @@ def create_prompt(data_entry):
     )
     return prompt
 
+@cached_response(**MODEL_PARAMS)
+@rate_limited("openai", MODEL_PARAMS)
 def query_openai(message):
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=openai_api_key)
+    client = get_client("openai")
     response = client.chat.completions.create(
-        model="gpt-4o", max_completion_tokens=250, messages=[
+        **MODEL_PARAMS, messages=[
             {"role": "user", "content": message} 
         ]
     )
     return response.choices[0].message.content
 
-def process_datasets(input_dir, output_dir):
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    model_answer = extract_answer(response_text)
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "model_answer": model_answer,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry["answer_idx"],
+        "category": data_entry.get("Category", ""),
+        "is_correct": model_answer == data_entry["answer"],
+    }
+    return record
+
+def process_datasets(input_dir, output_dir, batch=False):
     if not os.path.exists(input_dir):
         print(f"Input directory '{input_dir}' does not exist.")
         return
@@ -85,30 +82,18 @@ def process_datasets(input_dir, output_dir):
 
         dataset = load_json(dataset_path)
         output_file = f"{dataset_name}_results.json"
-        results = []
-
-        for data_entry in tqdm(dataset, desc=f"Processing {dataset_file}", leave=False):
-            try:
-                prompt = create_prompt(data_entry)
-                response_text = query_openai(prompt)
-                model_answer = extract_answer(response_text)
-
-                record = {
-                    "prompt": prompt,
-                    "response": response_text,
-                    "model_answer": model_answer,
-                    "correct_answer": data_entry["answer"],
-                    "answer_idx": data_entry["answer_idx"],
-                    "category": data_entry.get("Category", ""),
-                    "is_correct": model_answer == data_entry["answer"],
-                }
-                results.append(record)
-
-                save_results_to_json([record], output_dir, output_file)
-            
-            except Exception as e:
-                print(f"Error during query for {dataset_file}: {e}")
+
+        checkpoint = Checkpoint(output_dir, output_file, dataset_path)
+        with ResultWriter(output_dir, output_file) as writer, checkpoint:
+            if batch:
+                run_batch(iter_entry_prompts(dataset, create_prompt), "openai", MODEL_PARAMS,
+                          build_record, writer, checkpoint=checkpoint)
                 continue
+            evaluate_prompts(
+                iter_entry_prompts(dataset, create_prompt), query_openai, build_record, writer,
+                provider="openai", desc=f"Processing {dataset_file}", total=len(dataset),
+                checkpoint=checkpoint,
+            )
 
 def main():
     INPUT_DIR = ""  # folder path including the json files
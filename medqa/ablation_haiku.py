@@ -1,17 +1,24 @@
 import json
 import os
 from dotenv import load_dotenv
-from tqdm import tqdm
-import anthropic
 import re
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.batch import run_batch
+from utils.checkpoint import Checkpoint
+from utils.clients import ANTHROPIC_MAX_TOKENS, get_client
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 
 load_dotenv()
-anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-client = anthropic.Anthropic(api_key=anthropic_api_key)
 
+MODEL_PARAMS = {"model": "claude-3-5-haiku-20241022", "max_tokens": ANTHROPIC_MAX_TOKENS}
+
+@cached_response(**MODEL_PARAMS)
+@rate_limited("anthropic", MODEL_PARAMS)
 def query_claude(prompt):
-    response = client.messages.create(
-        model="claude-3-5-haiku-20241022",
+    response = get_client("anthropic").messages.create(
+        **MODEL_PARAMS,
         messages=[
             {"role": "user", "content": prompt},
         ],
@@ -42,47 +49,44 @@ def create_prompt(data_entry):
     )
     return prompt
 
-def save_results_to_json(results, output_file):
-    output_dir = os.path.dirname(output_file)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=4)
-    print(f"Results saved to {output_file}")
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    chosen_answer = extract_answer(response_text)
+    is_correct = chosen_answer == data_entry["answer"]
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "chosen_answer": chosen_answer,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry.get("answer_idx", ""),
+        "category": data_entry["Category"],
+        "is_correct": is_correct,
+    }
+    return record
+
 
-def process_datasets(folder_path, output_folder):
+def process_datasets(folder_path, output_folder, batch=False):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     for file_name in os.listdir(folder_path):
         if file_name.endswith(".json") and file_name != "other.json":
             input_file = os.path.join(folder_path, file_name)
-            output_file = os.path.join(output_folder, file_name)
             try:
                 dataset = load_json(input_file)
             except (FileNotFoundError, json.JSONDecodeError) as e:
                 print(f"Error loading {input_file}: {e}")
                 continue
-            results = []
-            for data_entry in tqdm(dataset, desc=f"Processing {input_file}"):
-                prompt = create_prompt(data_entry)
-                try:
-                    response_text = query_claude(prompt)
-                    chosen_answer = extract_answer(response_text)
-                    is_correct = chosen_answer == data_entry["answer"]
-                    record = {
-                        "prompt": prompt,
-                        "response": response_text,
-                        "chosen_answer": chosen_answer,
-                        "correct_answer": data_entry["answer"],
-                        "answer_idx": data_entry.get("answer_idx", ""),
-                        "category": data_entry["Category"],
-                        "is_correct": is_correct,
-                    }
-                    results.append(record)
-                except Exception as e:
-                    print(f"Error processing {input_file}: {e}")
+            checkpoint = Checkpoint(output_folder, file_name, input_file)
+            with ResultWriter(output_folder, file_name) as writer, checkpoint:
+                if batch:
+                    run_batch(iter_entry_prompts(dataset, create_prompt), "anthropic", MODEL_PARAMS,
+                              build_record, writer, checkpoint=checkpoint)
                     continue
-            save_results_to_json(results, output_file)
+                evaluate_prompts(
+                    iter_entry_prompts(dataset, create_prompt), query_claude, build_record, writer,
+                    provider="anthropic", desc=f"Processing {input_file}", total=len(dataset),
+                    checkpoint=checkpoint,
+                )
 
 def main():
     INPUT_FOLDER = "" # folder path containing the json files
@@ -1,19 +1,25 @@
 import json
 import os
 from dotenv import load_dotenv
-from tqdm import tqdm
-import anthropic
 import re
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.batch import run_batch
+from utils.checkpoint import Checkpoint
+from utils.clients import get_client
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter
 
 load_dotenv()
-anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-client = anthropic.Anthropic(api_key=anthropic_api_key)
 
+MODEL_PARAMS = {"model": "claude-3-5-sonnet-20241022", "max_tokens": 400}
 
+
+@cached_response(**MODEL_PARAMS)
+@rate_limited("anthropic", MODEL_PARAMS)
 def query_claude(prompt):
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20241022",
-        max_tokens=400,
+    response = get_client("anthropic").messages.create(
+        **MODEL_PARAMS,
         messages=[
             {"role": "user", "content": prompt},
         ],
@@ -48,7 +54,23 @@ def create_prompt(data_entry):
     return prompt
 
 
-def process_datasets(input_folder, output_folder):
+def build_record(prompt_data, response_text):
+    data_entry = prompt_data["data_entry"]
+    chosen_answer = extract_answer(response_text)
+    is_correct = chosen_answer == data_entry["answer"]
+    record = {
+        "prompt": prompt_data["prompt"],
+        "response": response_text,
+        "model_answer": chosen_answer,
+        "correct_answer": data_entry["answer"],
+        "answer_idx": data_entry.get("answer_idx", ""),
+        "category": data_entry["Category"],
+        "is_correct": is_correct,
+    }
+    return record
+
+
+def process_datasets(input_folder, output_folder, batch=False):
     # Ensure output folder exists
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
@@ -56,42 +78,24 @@ def process_datasets(input_folder, output_folder):
     for file_name in os.listdir(input_folder):
         if file_name.endswith(".json"):
             input_file = os.path.join(input_folder, file_name)
-            output_file = os.path.join(output_folder, file_name)
-            print(f"Processing file: {input_file} -> {output_file}")
+            print(f"Processing file: {input_file} -> {os.path.join(output_folder, file_name)}")
             try:
                 dataset = load_json(input_file)
             except (FileNotFoundError, json.JSONDecodeError) as e:
                 print(f"Error loading {input_file}: {e}")
                 continue
 
-            results = []
-            for data_entry in tqdm(dataset, desc=f"Processing {file_name}"):
-                prompt = create_prompt(data_entry)
-                try:
-                    response_text = query_claude(prompt)
-                    chosen_answer = extract_answer(response_text)
-                    is_correct = chosen_answer == data_entry["answer"]
-                    record = {
-                        "prompt": prompt,
-                        "response": response_text,
-                        "model_answer": chosen_answer,
-                        "correct_answer": data_entry["answer"],
-                        "answer_idx": data_entry.get("answer_idx", ""),
-                        "category": data_entry["Category"],
-                        "is_correct": is_correct,
-                    }
-                    results.append(record)
-                except Exception as e:
-                    print(f"Error processing entry in {input_file}: {e}")
+            checkpoint = Checkpoint(output_folder, file_name, input_file)
+            with ResultWriter(output_folder, file_name) as writer, checkpoint:
+                if batch:
+                    run_batch(iter_entry_prompts(dataset, create_prompt), "anthropic", MODEL_PARAMS,
+                              build_record, writer, checkpoint=checkpoint)
                     continue
-
-            # Write out the results to the output file
-            output_dir = os.path.dirname(output_file)
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=4)
-            print(f"Results saved to {output_file}")
+                evaluate_prompts(
+                    iter_entry_prompts(dataset, create_prompt), query_claude, build_record, writer,
+                    provider="anthropic", desc=f"Processing {file_name}", total=len(dataset),
+                    checkpoint=checkpoint,
+                )
 
 
 def main():
@@ -1,17 +1,13 @@
-import json
 import pandas as pd
 from collections import defaultdict
+from utils.result_store import iter_json_file
 
 def process_json(file_path, model_name, include_metadata=True):
-    with open(file_path, 'r') as f:
-        data = json.load(f)
-    
-    if not isinstance(data, list):
-        raise ValueError(f"Unexpected JSON structure in {file_path}. Expected a list of entries.")
-    
     counts = defaultdict(lambda: {"true": 0, "not_true": 0})
     
-    for entry in data:
+    # Entries are read one at a time; a file that is not a JSON array (or a
+    # JSONL log) raises ValueError.
+    for entry in iter_json_file(file_path):
         if not isinstance(entry, dict):  
             continue
         
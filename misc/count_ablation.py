@@ -66,9 +66,9 @@
 # analyze_is_correct_by_excluded_and_category(medbullet, "medbullet_ablation.xlsx")
 # #analyze_is_correct_by_excluded_and_category(medqa, "medqa_ablation.xlsx")
 
-import json
 import os
 from collections import defaultdict
+from utils.result_store import iter_json_file
 
 def analyze_is_correct_by_excluded_and_category(folders):
     for model_name, folder_path in folders.items():
@@ -77,20 +77,25 @@ def analyze_is_correct_by_excluded_and_category(folders):
         for filename in os.listdir(folder_path):
             if filename.endswith(".json"):
                 file_path = os.path.join(folder_path, filename)
-                with open(file_path, 'r') as file:
-                    try:
-                        data = json.load(file)
-                        for entry in data:
-                            excluded = entry.get("excluded", "Unknown")
-                            category = entry.get("category", "Unknown")
-                            is_correct = entry.get("is_correct", "other")
+                # Counted on its own first: a file that turns out to be
+                # corrupt halfway through must not add its first entries.
+                file_counts = defaultdict(lambda: {"true": 0, "other": 0})
+                try:
+                    for entry in iter_json_file(file_path):
+                        excluded = entry.get("excluded", "Unknown")
+                        category = entry.get("category", "Unknown")
+                        is_correct = entry.get("is_correct", "other")
 
-                            if is_correct is True or is_correct == "true":
-                                results[excluded][category]["true"] += 1
-                            else:
-                                results[excluded][category]["other"] += 1
-                    except json.JSONDecodeError:
-                        print(f"Error decoding JSON in file: {filename}")
+                        if is_correct is True or is_correct == "true":
+                            file_counts[(excluded, category)]["true"] += 1
+                        else:
+                            file_counts[(excluded, category)]["other"] += 1
+                except ValueError:
+                    print(f"Error decoding JSON in file: {filename}")
+                    continue
+                for (excluded, category), counts in file_counts.items():
+                    results[excluded][category]["true"] += counts["true"]
+                    results[excluded][category]["other"] += counts["other"]
 
         print(f"\nModel: {model_name}")
         for excluded, category_dict in results.items():
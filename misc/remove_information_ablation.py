@@ -1,89 +1,242 @@
 import json
 import os
-import openai
-from tqdm import tqdm
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from dotenv import load_dotenv
+from utils.async_engine import evaluate_prompts, iter_entry_prompts
+from utils.checkpoint import Checkpoint
+from utils.clients import get_client
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+from utils.result_store import ResultWriter, iter_records, jsonl_path_for, load_results, segment_paths
 
 load_dotenv(override=True)
 
+MODEL_PARAMS = {"model": "gpt-4o"}
+
+@cached_response(**MODEL_PARAMS)
+@rate_limited("openai", MODEL_PARAMS)
 def query_openai(message):
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=openai_api_key)
+    client = get_client("openai")
     response = client.chat.completions.create(
-        model="gpt-4o",
+        **MODEL_PARAMS,
         messages=[
 
             {"role": "user", "content": message}
         ]
     )
     return response.choices[0].message.content
-def filter_datasets(input_file, output_folder):
+
+INFORMATION_CATEGORIES = {
+    "demographic_data": "demographic data, such as age, gender, ethnicity, and occupation",
+    "history_taking": "history taking, such as chief complaint, onset of symptom, and duration of symptom",
+    "past_history": "past history, such as past medical history, family history, smoking history, alcohol use history, and illicit drug use history",
+    "physical_exam": "physical examination results",
+    "lab_tests": "lab and diagnostic test findings",
+}
+CATEGORIES = list(INFORMATION_CATEGORIES) + ["others"]
+# The original script listed every description and then the combined one
+# again, so "others" is part of the text; keep it byte-for-byte, since the
+# existing others.json rewrites and cached responses were made with it.
+OTHERS_DESCRIPTION = "; ".join(INFORMATION_CATEGORIES.values())
+OTHERS_INSTRUCTION = f"Remove all questions that do not contain details related to the following: {', '.join([*INFORMATION_CATEGORIES.values(), OTHERS_DESCRIPTION])}."
+
+# One JSON object with a rewrite per category, enforced by structured outputs.
+COMBINED_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ablation_rewrites",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in CATEGORIES},
+            "required": CATEGORIES,
+            "additionalProperties": False,
+        },
+    },
+}
+# A .jsonl, like all_categories.jsonl, so the ablation runners skip it.
+USAGE_FILE = "rewrite_usage.jsonl"
+
+def rewrite_message(key, question):
+    if key == "others":
+        return (
+            f"You are a medical AI trained to refine questions. {OTHERS_INSTRUCTION}"
+            f"\nQuestion: {question}"
+        )
+    return f"You are a medical assistant AI, specialized in refining medical questions. Please revise the following question to exclude details related to {INFORMATION_CATEGORIES[key]}.\nQuestion: {question}"
+
+def combined_message(question):
+    instructions = [f"- {key}: revise the question to exclude details related to {desc}." for key, desc in INFORMATION_CATEGORIES.items()]
+    instructions.append(f"- others: {OTHERS_INSTRUCTION}")
+    return (
+        "You are a medical assistant AI, specialized in refining medical questions. "
+        "Write one revised version of the following question for each key below and return them as a JSON object with exactly these keys.\n"
+        + "\n".join(instructions)
+        + f"\nQuestion: {question}"
+    )
+
+@cached_response(**MODEL_PARAMS, response_format=COMBINED_FORMAT)
+@rate_limited("openai", MODEL_PARAMS)
+def query_openai_combined(message):
+    client = get_client("openai")
+    response = client.chat.completions.create(
+        **MODEL_PARAMS,
+        response_format=COMBINED_FORMAT,
+        messages=[
+            {"role": "user", "content": message}
+        ]
+    )
+    usage = response.usage
+    return {
+        "content": response.choices[0].message.content,
+        "prompt_tokens": usage.prompt_tokens if usage else 0,
+        "completion_tokens": usage.completion_tokens if usage else 0,
+    }
+
+def parse_rewrites(content):
+    """The valid rewrites of a combined response; missing or empty ones are left out."""
+    try:
+        rewrites = json.loads(content)
+    except (TypeError, json.JSONDecodeError):
+        return {}
+    if not isinstance(rewrites, dict):
+        return {}
+    return {key: rewrites[key].strip() for key in CATEGORIES
+            if isinstance(rewrites.get(key), str) and rewrites[key].strip()}
+
+def build_combined_record(prompt_data, response):
+    question = prompt_data["data_entry"].get("question", "")
+    return {
+        "question": question,
+        "rewrites": parse_rewrites(response["content"]),
+        "prompt_tokens": response["prompt_tokens"],
+        "completion_tokens": response["completion_tokens"],
+    }
+
+def rewrite_combined(data, input_file, output_folder):
+    """Ask for all six rewrites of every question in one request each.
+
+    Responses are logged to all_categories.jsonl, which is never exported to
+    a .json, so the ablation runners do not pick it up. Returns {per-category message: rewrite} and the
+    token usage of the combined requests.
+    """
+    output_file = "all_categories.json"
+    checkpoint = Checkpoint(output_folder, output_file, input_file)
+    prompts = iter_entry_prompts(data, lambda entry: combined_message(entry.get("question", "")))
+    writer = ResultWriter(output_folder, output_file, dedupe_key="question")
+    try:
+        with checkpoint:
+            evaluate_prompts(prompts, query_openai_combined, build_combined_record, writer, provider="openai",
+                             desc="Rewriting all categories", total=len(data), checkpoint=checkpoint)
+    finally:
+        writer.close(export=False)
+
+    rewrites = {}
+    usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "prompt_chars": 0}
+    for record in iter_records(writer.path):
+        usage["requests"] += 1
+        usage["prompt_tokens"] += record["prompt_tokens"]
+        usage["completion_tokens"] += record["completion_tokens"]
+        usage["prompt_chars"] += len(combined_message(record["question"]))
+        for key, text in record["rewrites"].items():
+            rewrites[rewrite_message(key, record["question"])] = text
+    return rewrites, usage
+
+def build_entry(prompt_data, refined_question):
+    new_entry = prompt_data["data_entry"].copy()
+    new_entry["question"] = refined_question
+    return new_entry
+
+def legacy_rewrites(data, output_folder, output_file, input_file):
+    """How many questions a <key>.json from the sequential script already holds.
+
+    That script wrote one rewrite per question in dataset order, so record i
+    is the rewrite of data[i]. ResultWriter imports the file into the log;
+    the checkpoint only has to be told which questions it covers.
+    """
+    json_path = os.path.join(output_folder, output_file)
+    if segment_paths(jsonl_path_for(output_folder, output_file)) or not os.path.exists(json_path):
+        return 0
+    legacy = load_results(output_folder, output_file)
+    unchanged = lambda entry: {k: v for k, v in entry.items() if k != "question"}
+    if len(legacy) > len(data) or any(
+        not isinstance(record, dict) or unchanged(record) != unchanged(entry) for record, entry in zip(legacy, data)
+    ):
+        raise ValueError(f"{json_path} does not line up with {input_file}; move it aside to regenerate it")
+    return len(legacy)
+
+def rewrite_category(data, key, input_file, output_folder, query_fn=query_openai):
+    output_file = f"{key}.json"
+    checkpoint = Checkpoint(output_folder, output_file, input_file)
+    imported = 0 if len(checkpoint) else legacy_rewrites(data, output_folder, output_file, input_file)
+    create_prompt = lambda entry: rewrite_message(key, entry.get("question", ""))
+    prompts = iter_entry_prompts(data, create_prompt)
+    with ResultWriter(output_folder, output_file, dedupe_key=None) as writer, checkpoint:
+        for prompt_data in islice(iter_entry_prompts(data, create_prompt), imported):
+            checkpoint.mark(checkpoint.key(prompt_data))
+        evaluate_prompts(prompts, query_fn, build_entry, writer, provider="openai",
+                         desc=f"Processing {key}", total=len(data), checkpoint=checkpoint)
+
+def filter_datasets(input_file, output_folder, combined=False):
+    """Write the seven ablation datasets the ablation runners read.
+
+    no_exclusion.json is the unmodified dataset. The other six are rewritten
+    by GPT-4o; every category and question is requested concurrently (up to
+    OPENAI_MAX_IN_FLIGHT at once). Rewrites are appended to <category>.jsonl
+    as they finish and an interrupted run resumes from its checkpoint.
+    A <category>.json left by the older sequential script is imported and
+    only its missing questions are requested.
+
+    With ``combined=True`` each question is sent once and the model returns
+    all six rewrites as one JSON object, about a sixth of the requests and
+    of the repeated question text. Variants missing from a response are
+    requested on their own as before. Token use of the combined requests and
+    the fallbacks is appended to rewrite_usage.jsonl.
+    """
     os.makedirs(output_folder, exist_ok=True)
 
     with open(input_file, "r", encoding="utf-8") as f:
         data = json.load(f)
+    shutil.copyfile(input_file, os.path.join(output_folder, "no_exclusion.json"))
 
-    
-    information_categories = {
-        "demographic_data": "demographic data, such as age, gender, ethnicity, and occupation",
-        "history_taking": "history taking, such as chief complaint, onset of symptom, and duration of symptom",
-        "past_history": "past history, such as past medical history, family history, smoking history, alcohol use history, and illicit drug use history",
-        "physical_exam": "physical examination results",
-        "lab_tests": "lab and diagnostic test findings",
-        "others": "demographic data, such as age, gender, ethnicity, and occupation; history taking, such as chief complaint, onset of symptom, and duration of symptom; past history, such as past medical history, family history, smoking history, alcohol use history, and illicit drug use history; physical examination results; lab and diagnostic test findings",
-    }
+    query_fn = query_openai
+    if combined:
+        rewrites, usage = rewrite_combined(data, input_file, output_folder)
+        fallbacks = []
+
+        def query_fn(message):
+            if message in rewrites:
+                return rewrites[message]
+            fallbacks.append(message)
+            return query_openai(message)
+
+    with ThreadPoolExecutor(max_workers=len(CATEGORIES)) as pool:
+        futures = [pool.submit(rewrite_category, data, key, input_file, output_folder, query_fn) for key in CATEGORIES]
+        for future in futures:
+            future.result()
 
-    
-    for key, category_desc in information_categories.items():
-        output_file = os.path.join(output_folder, f"{key}.json")
-        
-        
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump([], f)  
-
-        filtered_data = []
-        
-        for entry in tqdm(data, desc=f"Processing {key}"):
-            question = entry.get("question", "")
-            message = f"You are a medical assistant AI, specialized in refining medical questions. Please revise the following question to exclude details related to {category_desc}.\nQuestion: {question}"
-            
-            refined_question = query_openai(message)  
-            new_entry = entry.copy()
-            new_entry["question"] = refined_question
-            filtered_data.append(new_entry)
-
-            
-            with open(output_file, "r+", encoding="utf-8") as f:
-                existing_data = json.load(f)
-                existing_data.append(new_entry)
-                f.seek(0)
-                json.dump(existing_data, f, indent=4, ensure_ascii=False)
-
-    
-    message = f"You are a medical AI trained to refine questions. Remove all questions that do not contain details related to the following: {', '.join(information_categories.values())}."
-    
-    output_file = os.path.join(output_folder, "others.json")
-    
-    
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump([], f)  
-
-    filtered_data_only = []
-    for entry in tqdm(data, desc="Filtering dataset with only six categories"):
-        question = entry.get("question", "")
-        refined_question = query_openai(message + f"\nQuestion: {question}")  
-        new_entry = entry.copy()
-        new_entry["question"] = refined_question
-        filtered_data_only.append(new_entry)
-
-        
-        with open(output_file, "r+", encoding="utf-8") as f:
-            existing_data = json.load(f)
-            existing_data.append(new_entry)
-            f.seek(0)
-            json.dump(existing_data, f, indent=4, ensure_ascii=False)
+    if combined:
+        # Separate requests would have sent the question once per category;
+        # their prompt tokens are estimated from the prompt length.
+        separate_chars = sum(len(rewrite_message(key, entry.get("question", ""))) for entry in data for key in CATEGORIES)
+        tokens_per_char = usage["prompt_tokens"] / usage["prompt_chars"] if usage["prompt_chars"] else 0
+        usage.update({
+            "fallback_requests": len(fallbacks),
+            "separate_requests": len(data) * len(CATEGORIES),
+            "separate_prompt_tokens_estimate": round(separate_chars * tokens_per_char),
+        })
+        usage["requests_saved"] = usage["separate_requests"] - usage["requests"] - usage["fallback_requests"]
+        usage["prompt_tokens_saved_estimate"] = usage["separate_prompt_tokens_estimate"] - usage["prompt_tokens"]
+        with open(os.path.join(output_folder, USAGE_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(usage) + "\n")
+        print(f"Combined rewrites: {usage['requests']} requests + {usage['fallback_requests']} fallbacks instead of "
+              f"{usage['separate_requests']} (~{usage['prompt_tokens_saved_estimate']} prompt tokens saved)")
 
 if __name__ == "__main__":
     data_path = "medbullet_dataset.json"
     output_folder_path = "medbullet_ablation/"
-    filter_datasets(data_path, output_folder_path)
+    # --combined asks for all six rewrites of a question in one request.
+    filter_datasets(data_path, output_folder_path, combined="--combined" in sys.argv[1:])
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from utils import response_cache
+from utils.clients import reset_clients
+
+
+def make_dataset(n):
+    return [
+        {"question": f"Question {i}?", "answer": f"answer {i}", "answer_idx": "A",
+         "options": {"A": f"answer {i}", "B": "other"}, "Category": "Diagnosis"}
+        for i in range(n)
+    ]
+
+
+def write_dataset(path, dataset):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(dataset), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def mock_server(tmp_path, monkeypatch):
+    """Start ``server_class(**kwargs)`` and point the clients at it.
+
+    The response cache and prompt corpus go to ``tmp_path``, so every test
+    starts cold and its requests reach the server.
+    """
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite"))
+    monkeypatch.setenv("PROMPT_CORPUS_PATH", str(tmp_path / "corpus.sqlite"))
+    monkeypatch.setattr(response_cache, "_cache", None)
+    servers = []
+
+    def start(server_class, **kwargs):
+        server = server_class(**kwargs).start()
+        servers.append(server)
+        for name, value in server.env().items():
+            monkeypatch.setenv(name, value)
+        reset_clients()
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    reset_clients()
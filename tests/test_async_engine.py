@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+from utils import async_engine
+from utils.async_engine import evaluate_prompts, get_executor
+
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def __contains__(self, prompt):
+        return False
+
+    def write(self, record):
+        self.records.append(record)
+
+
+def test_records_keep_input_order_and_failures_are_skipped():
+    def query(prompt):
+        # Later prompts answer first.
+        time.sleep((20 - int(prompt)) * 0.005)
+        if prompt == "7":
+            raise RuntimeError("overloaded")
+        return f"answer {prompt}"
+
+    prompts = [{"prompt": str(i)} for i in range(20)]
+    writer = ListWriter()
+    records = evaluate_prompts(prompts, query, lambda prompt_data, response: (prompt_data["prompt"], response),
+                               writer=writer, provider="ordertest", max_in_flight=4)
+    expected = [(str(i), f"answer {i}") for i in range(20) if i != 7]
+    assert records == expected
+    assert writer.records == expected
+
+
+def test_coroutine_queries_run_concurrently():
+    active = peak = 0
+
+    async def query(prompt):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return prompt.upper()
+
+    prompts = [{"prompt": letter} for letter in "abcdefgh"]
+    records = evaluate_prompts(prompts, query, lambda prompt_data, response: response,
+                               provider="ordertest", max_in_flight=3)
+    assert records == list("ABCDEFGH")
+    assert peak == 3
+
+
+def test_pool_grows_for_a_larger_max_in_flight(monkeypatch):
+    monkeypatch.setenv("POOLTEST_MAX_IN_FLIGHT", "2")
+    monkeypatch.setattr(async_engine, "_executors", {})
+    assert get_executor("pooltest")._max_workers == 2
+
+    lock = threading.Lock()
+    active = peak = 0
+
+    def query(prompt):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return prompt
+
+    prompts = [{"prompt": str(i)} for i in range(16)]
+    records = evaluate_prompts(prompts, query, lambda prompt_data, response: response,
+                               provider="pooltest", max_in_flight=8)
+    assert records == [str(i) for i in range(16)]
+    assert peak == 8
+    assert get_executor("pooltest")._max_workers == 8
+    # A smaller request keeps the larger pool.
+    assert get_executor("pooltest", 4)._max_workers == 8
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from medqa import ablation_gpt, gpt_8var, haiku_8var, sonnet_8var
+from tests.conftest import make_dataset, write_dataset
+from utils import batch
+from utils.batch import load_state
+from utils.mock_batch_server import MockBatchServer
+
+
+def read_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def server(mock_server):
+    return mock_server(MockBatchServer)
+
+
+def test_batch_evaluation_writes_every_variant_once(tmp_path, server):
+    data_path = write_dataset(tmp_path / "test.json", make_dataset(3))
+    out = str(tmp_path / "out")
+
+    records = gpt_8var.run_batch_evaluation(data_path, out, poll_interval=0)
+    assert len(records) == 24 and len(server.requests) == 24
+    assert len(read_results(f"{out}/{gpt_8var.OUTPUT_FILE}")) == 24
+    assert all(state["ingested"] for state in load_state(f"{out}/gpt4o_8var.batches.state")["batches"])
+
+    assert gpt_8var.run_batch_evaluation(data_path, out, poll_interval=0) == []
+    assert len(server.requests) == 24
+
+
+def test_batch_answers_are_shared_with_the_synchronous_path(tmp_path, server):
+    data_path = write_dataset(tmp_path / "test.json", make_dataset(2))
+    assert len(gpt_8var.run_batch_evaluation(data_path, str(tmp_path / "batch"), poll_interval=0)) == 16
+    sent = len(server.requests)
+
+    # The same prompts, synchronously and in batch mode again, cost nothing.
+    calls = len(server.calls)
+    assert len(gpt_8var.run_evaluation(data_path, str(tmp_path / "sync"))) == 16
+    assert server.calls[calls:] == []
+    assert len(gpt_8var.run_batch_evaluation(data_path, str(tmp_path / "again"), poll_interval=0)) == 16
+    assert len(server.requests) == sent
+    assert not server.openai_batches.keys() - {b["id"] for b in load_state(
+        str(tmp_path / "batch" / "gpt4o_8var.batches.state"))["batches"]}
+
+
+def test_ablation_process_datasets_in_batch_mode(tmp_path, server):
+    input_dir = tmp_path / "input"
+    write_dataset(input_dir / "physical_exam.json", make_dataset(4))
+    write_dataset(input_dir / "other.json", make_dataset(2))
+    out = str(tmp_path / "out")
+
+    ablation_gpt.process_datasets(str(input_dir), out, batch=True)
+    records = read_results(f"{out}/physical_exam_results.json")
+    assert len(records) == 4 and len(server.requests) == 4
+    assert all(record["model_answer"] == "mock answer" for record in records)
+
+
+@pytest.mark.parametrize("runner", [gpt_8var, sonnet_8var])
+def test_interrupted_submit_is_not_paid_twice(tmp_path, server, monkeypatch, runner):
+    data_path = write_dataset(tmp_path / "test.json", make_dataset(2))
+    out = str(tmp_path / "out")
+    real_submit = batch.submit
+
+    def submit_then_crash(provider, state, save=lambda: None):
+        # The provider accepts the batch, then the process dies before the
+        # id reaches the state file.
+        real_submit(provider, state, lambda: state["id"] is None and save())
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch, "submit", submit_then_crash)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run_batch_evaluation(data_path, out, poll_interval=0)
+    monkeypatch.setattr(batch, "submit", real_submit)
+
+    records = runner.run_batch_evaluation(data_path, out, poll_interval=0)
+    assert len(records) == 16
+    assert len(server.requests) == 16
+    assert len(server.openai_batches) + len(server.anthropic_batches) == 1
+
+
+def test_batch_recorded_but_never_accepted_is_submitted(tmp_path, server, monkeypatch):
+    data_path = write_dataset(tmp_path / "test.json", make_dataset(2))
+    out = str(tmp_path / "out")
+    real_submit = batch.submit
+
+    def crash(provider, state, save=lambda: None):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch, "submit", crash)
+    with pytest.raises(KeyboardInterrupt):
+        gpt_8var.run_batch_evaluation(data_path, out, poll_interval=0)
+    monkeypatch.setattr(batch, "submit", real_submit)
+
+    assert len(gpt_8var.run_batch_evaluation(data_path, out, poll_interval=0)) == 16
+    assert len(server.openai_batches) == 1
+
+
+def test_recovery_does_not_adopt_another_models_batch(tmp_path, mock_server, monkeypatch):
+    server = mock_server(MockBatchServer, respond=lambda body: f"Answer: (A) from {body['model']}")
+    data_path = write_dataset(tmp_path / "test.json", make_dataset(2))
+    real_submit = batch.submit
+
+    def submit_then_crash(provider, state, save=lambda: None):
+        real_submit(provider, state, lambda: state["id"] is None and save())
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch, "submit", submit_then_crash)
+    with pytest.raises(KeyboardInterrupt):
+        haiku_8var.run_batch_evaluation(data_path, str(tmp_path / "haiku"), poll_interval=0)
+    monkeypatch.setattr(batch, "submit", real_submit)
+    # Sonnet sends the same prompts, so its newer batch has the same custom ids and size.
+    assert len(sonnet_8var.run_batch_evaluation(data_path, str(tmp_path / "sonnet"), poll_interval=0)) == 16
+
+    records = haiku_8var.run_batch_evaluation(data_path, str(tmp_path / "haiku"), poll_interval=0)
+    assert {record["response"] for record in records} == {f"Answer: (A) from {haiku_8var.MODEL_PARAMS['model']}"}
+    assert len(server.anthropic_batches) == 2
+
+
+def test_batch_files_are_not_picked_up_by_json_scans(tmp_path, server):
+    # The ablation runners and count scripts take every *.json in a folder.
+    write_dataset(tmp_path / "input" / "lab_tests.json", make_dataset(2))
+    out = tmp_path / "out"
+
+    ablation_gpt.process_datasets(str(tmp_path / "input"), str(out), batch=True)
+    assert (out / "lab_tests_results.batches.state").exists()
+    assert [p.name for p in out.glob("*.json")] == ["lab_tests_results.json"]
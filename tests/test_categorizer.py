@@ -0,0 +1,44 @@
+import pytest
+
+from utils import categorizer
+from utils.categorizer import MEDBULLET_CATEGORIES, MEDQA_CATEGORIES, canonical_category, categorize
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("Diagnosis", "Diagnosis"),
+    ("'diagnosis'.", "Diagnosis"),
+    ("2) Pharmacotherapy, Interventions & Management", "Pharmacotherapy, Interventions and Management"),
+    ("Category: Health Maintenance, Prevention and Surveillance", "Health Maintenance, Prevention and Surveillance"),
+    ("The answer is Applying Foundational Science Concepts", "Applying Foundational Science Concepts"),
+    ("Diagnosis or Pharmacotherapy, Interventions and Management", None),
+    ("Pathology", None),
+    ("", None),
+    (None, None),
+])
+def test_replies_map_to_one_offered_category(reply, expected):
+    assert canonical_category(reply, MEDQA_CATEGORIES) == expected
+
+
+def test_a_category_not_offered_is_rejected():
+    assert canonical_category("Applying Foundational Science Concepts", MEDBULLET_CATEGORIES) is None
+
+
+def test_each_distinct_question_is_classified_once(monkeypatch):
+    asked = []
+
+    def make_classifier(categories):
+        assert categories == MEDBULLET_CATEGORIES
+
+        def classify(question):
+            asked.append(question)
+            if question == "unclear":
+                raise ValueError("reply 'Pathology' is not one of the categories")
+            return "Diagnosis"
+
+        return classify
+
+    monkeypatch.setattr(categorizer, "make_classifier", make_classifier)
+    data = [{"question": "q1"}, {"question": "unclear"}, {"question": "q1"}, {"question": "q2"}]
+    assert categorize(data, MEDBULLET_CATEGORIES, max_in_flight=2) == 1
+    assert sorted(asked) == ["q1", "q2", "unclear"]
+    assert [entry.get("category") for entry in data] == ["Diagnosis", None, "Diagnosis", "Diagnosis"]
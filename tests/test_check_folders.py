@@ -0,0 +1,16 @@
+import json
+
+from evaluate import check_folders
+
+
+def test_only_result_files_are_judged(tmp_path, monkeypatch):
+    for name in ["no_exclusion_results.json", "lab_tests_results.json", "lab_tests_results.batches.json",
+                 "no_exclusion_results.verdicts.json", "no_exclusion_results.batch-0001.json"]:
+        (tmp_path / name).write_text(json.dumps([]), encoding="utf-8")
+    # A result log that was never exported has nothing to judge yet.
+    (tmp_path / "physical_exam_results.jsonl").write_text("", encoding="utf-8")
+    judged = []
+    monkeypatch.setattr(check_folders, "process_json_file", lambda path: judged.append(path) or 0)
+
+    check_folders.process_folder(str(tmp_path))
+    assert sorted(judged) == [str(tmp_path / "lab_tests_results.json"), str(tmp_path / "no_exclusion_results.json")]
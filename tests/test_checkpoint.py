@@ -0,0 +1,34 @@
+from utils.async_engine import evaluate_prompts
+from utils.checkpoint import Checkpoint
+from utils.result_store import ResultWriter, load_results
+
+
+def run(out, prompts, calls):
+    def query(prompt):
+        calls.append(prompt)
+        return prompt.upper()
+
+    checkpoint = Checkpoint(out, "rewrites.json", "data/test.json")
+    with ResultWriter(out, "rewrites.json", dedupe_key=None) as writer, checkpoint:
+        return evaluate_prompts(prompts, query, lambda prompt_data, response: {"question": response},
+                                writer, provider="test", checkpoint=checkpoint)
+
+
+def test_checkpoint_resumes_a_writer_without_dedupe(tmp_path):
+    out = str(tmp_path)
+    prompts = [{"prompt": "same question", "label": label} for label in ("a", "b")]
+    calls = []
+    assert len(run(out, prompts, calls)) == 2
+    assert run(out, prompts + [{"prompt": "new question"}], calls) == [{"question": "NEW QUESTION"}]
+    assert calls == ["same question", "same question", "new question"]
+    assert len(load_results(out, "rewrites.json")) == 3
+
+
+def test_keys_separate_datasets_and_variants(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path), "out.json", "medqa.json")
+    other = Checkpoint(str(tmp_path), "other.json", "medbullet.json")
+    prompt = {"prompt": "same", "label": "a", "metadata": {"tone": "hedged"}}
+    assert checkpoint.key(prompt) != other.key(prompt)
+    assert checkpoint.key(prompt) != checkpoint.key({**prompt, "label": "b"})
+    checkpoint.close()
+    other.close()
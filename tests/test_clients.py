@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from utils import clients
+from utils.import_budget import measure, sdk_imports
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_pool_follows_max_in_flight(monkeypatch):
+    monkeypatch.delenv("CLIENT_POOL_SIZE", raising=False)
+    monkeypatch.setenv("OPENAI_MAX_IN_FLIGHT", "32")
+    assert clients.pool_size_for("openai") == 64
+    limits = clients._limits("openai")
+    assert limits.max_connections == limits.max_keepalive_connections == 64
+    monkeypatch.setenv("CLIENT_POOL_SIZE", "5")
+    assert clients.pool_size_for("openai") == 5
+
+
+def test_client_layer_does_not_load_the_engine():
+    code = "import sys, utils.clients, utils.rate_limit; print('utils.async_engine' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=REPO_ROOT)
+    assert result.stdout.strip() == "False"
+
+
+def test_registered_provider_is_built_once_on_first_use(monkeypatch):
+    monkeypatch.setattr(clients, "FACTORIES", dict(clients.FACTORIES))
+    monkeypatch.setattr(clients, "SDK_MODULES", dict(clients.SDK_MODULES))
+    built = []
+
+    def factory():
+        built.append(object())
+        return built[-1]
+
+    clients.register_provider("local", factory, modules=["local_sdk"])
+    assert built == []
+    assert clients.SDK_MODULES["local"] == ["local_sdk"]
+    try:
+        assert clients.get_client("local") is clients.get_client("local") is built[0]
+        assert len(built) == 1
+    finally:
+        clients.reset_clients()
+    with pytest.raises(ValueError, match="Unknown provider 'nowhere'"):
+        clients.get_client("nowhere")
+
+
+def test_runners_import_no_provider_sdk():
+    for module in ("utils.scheduler", "medqa.gpt_8var", "medbullet.sonnet_ablation"):
+        total, imported = measure(module)
+        assert module in imported
+        assert total > 0
+        assert sdk_imports(imported) == []
+    assert sdk_imports({"anthropic._client": 1.0, "json": 0.1}) == ["anthropic (anthropic)"]
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from utils.judge import judge_file, judge_version
+
+
+def apply(entry, verdict):
+    corrected = verdict == "true" and not entry["is_correct"]
+    entry["is_correct"] = verdict == "true"
+    return corrected
+
+
+def test_failed_requests_leave_the_file_unchanged(tmp_path):
+    entries = [{"response": f"response {i}", "is_correct": False} for i in range(4)]
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    before = path.read_bytes()
+    asked = []
+
+    def flaky(message):
+        asked.append(message)
+        if message == "response 2":
+            raise ConnectionError("reset by peer")
+        return "true"
+
+    with pytest.raises(ValueError, match="1 judge requests failed"):
+        judge_file(str(path), flaky, lambda entry: entry["response"], apply, version="v1")
+    assert path.read_bytes() == before
+
+    asked.clear()
+    assert judge_file(str(path), lambda message: asked.append(message) or "true",
+                      lambda entry: entry["response"], apply, version="v1") == 4
+    assert asked == ["response 2"]
+    assert all(entry["is_correct"] for entry in json.loads(path.read_text(encoding="utf-8")))
+
+
+def test_verdicts_are_reused_until_the_entry_or_the_judge_changes(tmp_path):
+    entries = [{"response": f"response {i % 3}", "is_correct": False} for i in range(5)]
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    asked = []
+
+    def judge(message):
+        asked.append(message)
+        return "true"
+
+    def run(version):
+        asked.clear()
+        judge_file(str(path), judge, lambda entry: entry["response"], apply, version=version)
+        return sorted(asked)
+
+    version = judge_version({"model": "gpt-4o", "temperature": 0}, "Grade the answer.")
+    # Entries repeated within the file are asked once.
+    assert run(version) == ["response 0", "response 1", "response 2"]
+    assert run(version) == []
+
+    entries[4]["response"] = "response 4, edited"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    assert run(version) == ["response 4, edited"]
+
+    changed = judge_version({"model": "gpt-4o", "temperature": 0}, "Grade the answer strictly.")
+    assert changed != version
+    assert run(changed) == ["response 0", "response 1", "response 2", "response 4, edited"]
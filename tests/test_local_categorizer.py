@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+from utils import categorizer
+from utils.local_categorizer import benchmark, labelled_questions, load, predict, save, train
+
+TOPICS = {
+    "Diagnosis": ["most likely diagnosis", "biopsy shows", "which finding confirms"],
+    "Pharmacotherapy, Interventions and Management": ["best next step in management", "which drug", "dose of"],
+    "Health Maintenance, Prevention and Surveillance": ["screening test", "vaccination schedule", "prevent recurrence"],
+}
+
+
+def synthetic(n_per_category):
+    questions, labels = [], []
+    for label, phrases in TOPICS.items():
+        for i in range(n_per_category):
+            questions.append(f"A patient aged {20 + i} presents. What is the {phrases[i % len(phrases)]} here?")
+            labels.append(label)
+    return questions, labels
+
+
+def test_labelled_questions_keep_the_first_label(tmp_path):
+    first, second = tmp_path / "a.json", tmp_path / "b.json"
+    first.write_text(json.dumps([{"question": "q1", "category": "Diagnosis"}, {"question": "q2"}]))
+    second.write_text(json.dumps([{"question": "q1", "category": "Other"}, {"question": "q3", "category": "X"}]))
+    assert labelled_questions([str(first), str(second)]) == (["q1", "q3"], ["Diagnosis", "X"])
+
+
+def test_model_learns_separable_categories_and_round_trips(tmp_path):
+    questions, labels = synthetic(12)
+    model = train(questions, labels)
+    held_out = ["What is the most likely diagnosis for this woman?", "Which drug should be started now?"]
+    predicted, confidence = predict(model, held_out)
+    assert predicted == ["Diagnosis", "Pharmacotherapy, Interventions and Management"]
+    assert all(0 < p <= 1 for p in confidence)
+
+    path = tmp_path / "model.joblib"
+    save(model, str(path))
+    again, again_confidence = predict(load(str(path)), held_out)
+    assert again == predicted
+    np.testing.assert_allclose(again_confidence, confidence)
+    assert [len(result) for result in predict(model, [])] == [0, 0]
+
+
+def test_benchmark_coverage_falls_as_the_threshold_rises():
+    questions, labels = synthetic(10)
+    rows = benchmark(questions, labels, thresholds=[0.0, 0.5, 0.99], folds=5)
+    assert [row["threshold"] for row in rows] == [0.0, 0.5, 0.99]
+    assert rows[0]["local"] == len(questions) and rows[0]["coverage"] == 100.0
+    coverage = [row["coverage"] for row in rows]
+    assert coverage == sorted(coverage, reverse=True)
+    assert rows[1]["agreement"] == 100.0
+
+
+def test_confident_local_labels_are_not_sent(monkeypatch):
+    questions, labels = synthetic(12)
+    model = train(questions, labels)
+    asked = []
+
+    def make_classifier(categories):
+        def classify(question):
+            asked.append(question)
+            return "Diagnosis"
+        return classify
+
+    monkeypatch.setattr(categorizer, "make_classifier", make_classifier)
+    data = [{"question": "What is the best next step in management of his pain?"},
+            {"question": "Zebra quartz"}]
+    # Words the model never saw leave it at about 1/3 for each category.
+    assert categorizer.categorize(data, list(TOPICS), local_model=model, threshold=0.8) == 0
+    assert asked == ["Zebra quartz"]
+    assert [entry["category"] for entry in data] == ["Pharmacotherapy, Interventions and Management", "Diagnosis"]
@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from medqa import llama3_8var
+from tests.conftest import make_dataset, write_dataset
+from utils import ollama_backend
+from utils.mock_ollama_server import MockOllamaServer
+
+
+@pytest.fixture
+def server(mock_server, monkeypatch):
+    monkeypatch.setattr(ollama_backend, "_warm", set())
+    return mock_server(MockOllamaServer, num_parallel=2, latency=0.02)
+
+
+def test_llama3_runner_against_the_mock_server(tmp_path, server):
+    data_path = write_dataset(tmp_path / "test.json", make_dataset(3))
+    out = tmp_path / "out"
+
+    records = llama3_8var.run_evaluation(data_path, str(out))
+    assert len(records) == 24
+    assert all(record["response"].startswith("Answer: (A)") for record in records)
+    assert server.loads == 1
+    assert server.resident() == [llama3_8var.MODEL_PARAMS["model"]]
+    assert server.peak_in_flight == 2
+    assert len(json.loads((out / "llama3_8var.json").read_text(encoding="utf-8"))) == 24
+
+    sent = len(server.requests)
+    assert llama3_8var.run_evaluation(data_path, str(out)) == []
+    assert len(server.requests) == sent
@@ -0,0 +1,81 @@
+import json
+
+from utils.judge import judge_file, logged_verdicts, verdict_key
+from utils.prefilter import agreement, rule_verdict
+
+BROMOCRIPTINE = (
+    "Answer: (C) Bromocriptine\n\nExplanation: According to the question, other novice physicians have "
+    "already ruled out Bromocriptine. Therefore, we are left with the remaining options."
+)
+
+
+def test_wrong_option_is_false():
+    assert rule_verdict("Answer: (B) Haloperidol\n\nExplanation: ...", "Bromocriptine", "C") == "false"
+
+
+def test_correct_option_goes_to_the_judge():
+    assert rule_verdict("Answer: (C) Bromocriptine\n\nExplanation: it fits.", "Bromocriptine", "C") is None
+
+
+def test_negated_correct_option_goes_to_the_judge():
+    assert rule_verdict(BROMOCRIPTINE, "Bromocriptine", "C") is None
+
+
+def test_multiple_answers_go_to_the_judge():
+    response = "Answer: (B) Haloperidol\n\nOn reflection, Answer: (C) Bromocriptine"
+    assert rule_verdict(response, "Bromocriptine", "C") is None
+    assert rule_verdict("Answer: (A) x\nAnswer: (B) y", "Bromocriptine", "C") is None
+
+
+def test_repeated_wrong_answer_is_false():
+    assert rule_verdict("Answer: (B) Haloperidol\n\nAnswer: (B) Haloperidol", "Bromocriptine", "C") == "false"
+
+
+def test_only_exact_format_is_settled():
+    for response in [
+        "answer: a Haloperidol",
+        "Answer: a patient with galactorrhea needs (B) Haloperidol",
+        "**Answer:** (B) Haloperidol",
+        "Answer: B) Haloperidol",
+        "Answer: (b) Haloperidol",
+        "Answer: (F) Something",
+        "(B) Haloperidol",
+        "",
+    ]:
+        assert rule_verdict(response, "Bromocriptine", "C") is None, response
+
+
+def test_letter_and_text_disagreeing_goes_to_the_judge():
+    assert rule_verdict("Answer: (B) Bromocriptine", "Bromocriptine", "C") is None
+
+
+def test_without_correct_letter_goes_to_the_judge():
+    assert rule_verdict("Answer: (B) Haloperidol", "Bromocriptine", "") is None
+
+
+def test_agreement_counts_only_settled_entries():
+    counts = agreement([("false", "false"), ("false", "true"), (None, "true"), (None, "false")])
+    assert counts == {"total": 4, "settled": 2, "agreed": 1, "judge_true": 1}
+
+
+def test_logged_verdicts_pairs_entries_with_the_judge_log(tmp_path):
+    entries = [
+        {"response": "Answer: (B) Haloperidol", "answer": "Bromocriptine", "answer_idx": "C"},
+        {"response": BROMOCRIPTINE, "answer": "Bromocriptine", "answer_idx": "C"},
+        {"response": "Answer: (C) Bromocriptine. It fits.", "answer": "Bromocriptine", "answer_idx": "C"},
+    ]
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    build_message = lambda entry: entry["response"]
+    judge = lambda message: "false" if "ruled out" in message or "(B)" in message else "true"
+
+    def apply(entry, verdict):
+        entry["is_correct"] = verdict == "true"
+
+    judge_file(str(path), judge, build_message, apply, version="v1", max_in_flight=2)
+    judged = list(logged_verdicts(str(path), build_message, "v1"))
+    assert [verdict for _, verdict in judged] == ["false", "false", "true"]
+    assert list(logged_verdicts(str(path), build_message, "v2")) == []
+    counts = agreement((rule_verdict(e["response"], e["answer"], e["answer_idx"]), v) for e, v in judged)
+    assert counts == {"total": 3, "settled": 1, "agreed": 1, "judge_true": 0}
+    assert verdict_key("v1", "a") != verdict_key("v2", "a")
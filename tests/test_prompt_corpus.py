@@ -0,0 +1,66 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import prompt_corpus
+
+
+def make_dataset(tag, n):
+    return [
+        {"question": f"{tag} question {i}", "answer": f"{tag} answer {i}", "answer_idx": "A",
+         "options": {"A": f"{tag} answer {i}", "B": "other"}, "Category": tag}
+        for i in range(n)
+    ]
+
+
+def write(path, dataset):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(dataset), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    return str(tmp_path / "corpus.sqlite")
+
+
+def test_datasets_with_the_same_name_do_not_share_prompts(tmp_path, corpus):
+    medqa = make_dataset("medqa", 30)
+    medbullet = make_dataset("medbullet", 12)
+    medqa_path = write(tmp_path / "medqa" / "test.json", medqa)
+    medbullet_path = write(tmp_path / "medbullet" / "test.json", medbullet)
+
+    def read(i):
+        dataset, path = (medqa, medqa_path) if i % 2 else (medbullet, medbullet_path)
+        return dataset, list(prompt_corpus.corpus_prompts(dataset, path, "letter", path=corpus))
+
+    with ThreadPoolExecutor(8) as pool:
+        for dataset, prompts in pool.map(read, range(16)):
+            assert len(prompts) == len(dataset) * 8
+            for i, prompt_data in enumerate(prompts):
+                assert dataset[i // 8]["question"] in prompt_data["prompt"]
+                assert prompt_data["correct_answer"] == dataset[i // 8]["answer"]
+
+
+def test_prompts_are_stored_once_and_compiled_once(tmp_path, corpus):
+    dataset = make_dataset("medqa", 5)
+    dataset.append(dict(dataset[0]))
+    path = write(tmp_path / "test.json", dataset)
+
+    assert prompt_corpus.compile_dataset(path, path=corpus) == len(dataset) * 8 * len(prompt_corpus.TEMPLATES)
+    assert prompt_corpus.compile_dataset(path, path=corpus) == 0
+    datasets, entries, prompts = prompt_corpus.stats(corpus)
+    assert entries == len(dataset) * 8 * len(prompt_corpus.TEMPLATES)
+    assert prompts == (len(dataset) - 1) * 8 * len(prompt_corpus.TEMPLATES)
+
+
+def test_a_changed_file_gets_its_own_prompts(tmp_path, corpus):
+    dataset = make_dataset("medqa", 3)
+    path = write(tmp_path / "test.json", dataset)
+    list(prompt_corpus.corpus_prompts(dataset, path, "letter", path=corpus))
+
+    dataset[0]["question"] = "changed question"
+    write(tmp_path / "test.json", dataset)
+    first = next(prompt_corpus.corpus_prompts(dataset, path, "letter", path=corpus))
+    assert "changed question" in first["prompt"]
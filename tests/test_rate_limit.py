@@ -0,0 +1,46 @@
+from utils import rate_limit
+from utils.rate_limit import MAX_DELAY, ProviderLimiter, max_output_tokens, rate_limited
+
+
+def test_max_output_tokens_reads_each_provider_cap():
+    assert max_output_tokens({"model": "gpt-4o", "max_completion_tokens": 70}) == 70
+    assert max_output_tokens({"model": "claude-3-5-haiku-20241022", "max_tokens": 350}) == 350
+    assert max_output_tokens({"model": "x", "options": {"num_predict": 450}}) == 450
+    assert max_output_tokens({"model": "x", "options": {"num_predict": -1}}) == 0
+    assert max_output_tokens({"model": "gemini-1.5-pro"}) == 0
+    assert max_output_tokens(None) == 0
+
+
+def test_each_call_reserves_the_completion_cap(monkeypatch):
+    charged = []
+    limiter = ProviderLimiter("ollama")
+    monkeypatch.setattr(limiter, "call", lambda fn, *args, tokens, **kwargs: charged.append(tokens) or fn(*args, **kwargs))
+    monkeypatch.setattr(rate_limit, "get_limiter", lambda provider: limiter)
+
+    query = rate_limited("ollama", {"model": "x", "max_tokens": 1024})(lambda prompt: prompt)
+    assert query("a" * 40) == "a" * 40
+    assert charged == [11 + 1024]
+    rate_limited("ollama", {"model": "x", "max_tokens": 1024}, output_tokens=5)(lambda prompt: prompt)("a" * 40)
+    assert charged[-1] == 16
+
+
+class Throttled(Exception):
+    status_code = 429
+
+    class response:
+        headers = {"retry-after": "86400"}
+
+
+def test_server_retry_after_is_capped(monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limit.time, "sleep", slept.append)
+    calls = iter([Throttled(), "ok"])
+
+    def flaky():
+        result = next(calls)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert ProviderLimiter("ollama").call(flaky) == "ok"
+    assert slept == [MAX_DELAY]
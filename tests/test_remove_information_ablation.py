@@ -0,0 +1,72 @@
+import json
+
+from misc import remove_information_ablation as ablation
+from misc.remove_information_ablation import CATEGORIES, parse_rewrites, rewrite_message
+
+# The remove-everything prompt of the original sequential script, joined from
+# all six descriptions including the combined "others" one.
+BASELINE_OTHERS = (
+    "You are a medical AI trained to refine questions. Remove all questions that do not contain details "
+    "related to the following: demographic data, such as age, gender, ethnicity, and occupation, history "
+    "taking, such as chief complaint, onset of symptom, and duration of symptom, past history, such as past "
+    "medical history, family history, smoking history, alcohol use history, and illicit drug use history, "
+    "physical examination results, lab and diagnostic test findings, demographic data, such as age, gender, "
+    "ethnicity, and occupation; history taking, such as chief complaint, onset of symptom, and duration of "
+    "symptom; past history, such as past medical history, family history, smoking history, alcohol use "
+    "history, and illicit drug use history; physical examination results; lab and diagnostic test findings."
+)
+
+
+def test_others_prompt_matches_the_original_script():
+    assert rewrite_message("others", "Q?") == BASELINE_OTHERS + "\nQuestion: Q?"
+
+
+def test_category_prompt_matches_the_original_script():
+    assert rewrite_message("physical_exam", "Q?") == (
+        "You are a medical assistant AI, specialized in refining medical questions. Please revise the "
+        "following question to exclude details related to physical examination results.\nQuestion: Q?"
+    )
+
+
+def test_parse_rewrites_keeps_only_non_empty_strings():
+    content = json.dumps({"demographic_data": " A 40-year-old... ", "history_taking": "", "lab_tests": None,
+                          "others": "What is the diagnosis?", "unknown": "x"})
+    assert parse_rewrites(content) == {"demographic_data": "A 40-year-old...", "others": "What is the diagnosis?"}
+    assert parse_rewrites("not json") == {}
+    assert parse_rewrites("[1, 2]") == {}
+
+
+def test_combined_mode_requests_each_question_once(tmp_path, monkeypatch):
+    data = [{"question": "Q1", "answer": "A"}, {"question": "Q2", "answer": "B"}]
+    input_file = tmp_path / "dataset.json"
+    input_file.write_text(json.dumps(data), encoding="utf-8")
+    output_folder = tmp_path / "ablation"
+    combined, separate = [], []
+
+    def query_combined(message):
+        combined.append(message)
+        question = message.rsplit("Question: ", 1)[1]
+        # The second response lacks the "others" rewrite.
+        keys = CATEGORIES if question == "Q1" else CATEGORIES[:-1]
+        return {"content": json.dumps({key: f"{question} without {key}" for key in keys}),
+                "prompt_tokens": 100, "completion_tokens": 60}
+
+    def query_single(message):
+        separate.append(message)
+        return "Q2 without others, asked alone"
+
+    monkeypatch.setattr(ablation, "query_openai_combined", query_combined)
+    monkeypatch.setattr(ablation, "query_openai", query_single)
+    ablation.filter_datasets(str(input_file), str(output_folder), combined=True)
+
+    assert len(combined) == 2
+    assert separate == [rewrite_message("others", "Q2")]
+    for key in CATEGORIES:
+        questions = [entry["question"] for entry in json.loads((output_folder / f"{key}.json").read_text())]
+        expected_q2 = "Q2 without others, asked alone" if key == "others" else f"Q2 without {key}"
+        assert questions == [f"Q1 without {key}", expected_q2]
+    assert json.loads((output_folder / "no_exclusion.json").read_text()) == data
+
+    usage = json.loads((output_folder / ablation.USAGE_FILE).read_text())
+    assert (usage["requests"], usage["fallback_requests"], usage["separate_requests"]) == (2, 1, 12)
+    assert (usage["prompt_tokens"], usage["requests_saved"]) == (200, 9)
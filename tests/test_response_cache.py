@@ -0,0 +1,68 @@
+import pytest
+
+from utils import response_cache
+from utils.response_cache import ResponseCache, cache_key, cached_response
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite"))
+    monkeypatch.delenv("RESPONSE_CACHE", raising=False)
+    monkeypatch.setattr(response_cache, "_cache", None)
+    yield response_cache.get_cache()
+
+
+def test_every_parameter_is_part_of_the_key():
+    key = cache_key("gpt-4o", "prompt", {"temperature": 0, "max_tokens": 300})
+    assert key == cache_key("gpt-4o", "prompt", {"max_tokens": 300, "temperature": 0})
+    assert key != cache_key("gpt-4o", "prompt", {"temperature": 0, "max_tokens": 400})
+    assert key != cache_key("gpt-4o-mini", "prompt", {"temperature": 0, "max_tokens": 300})
+    assert key != cache_key("gpt-4o", "prompt ", {"temperature": 0, "max_tokens": 300})
+
+
+def test_a_repeated_prompt_is_answered_from_the_cache(cache):
+    calls = []
+
+    @cached_response("model-a", temperature=0)
+    def query(prompt):
+        calls.append(prompt)
+        return None if prompt == "empty" else f"answer to {prompt}"
+
+    assert query("q1") == "answer to q1"
+    assert query("q1") == "answer to q1"
+    assert query("q2") == "answer to q2"
+    # A None response (failed request) is not stored.
+    assert query("empty") is None
+    assert query("empty") is None
+    assert calls == ["q1", "q2", "empty", "empty"]
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert cache.stats()["models"] == {"model-a": {"hits": 1, "misses": 4, "entries": 2}}
+
+
+def test_the_cache_can_be_turned_off(cache, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE", "0")
+    calls = []
+
+    @cached_response("model-a")
+    def query(prompt):
+        calls.append(prompt)
+        return prompt
+
+    query("q")
+    query("q")
+    assert calls == ["q", "q"]
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Each response is 300 bytes of JSON, so the fourth one goes over the
+    # limit and one entry is dropped to get back under 90% of it.
+    cache = ResponseCache(str(tmp_path / "small.sqlite"), max_bytes=1000)
+    for i in range(3):
+        cache.put(f"k{i}", "m", "x" * 298)
+    # Reading k0 makes k1 the least recently used entry.
+    assert cache.get("k0", "m") == "x" * 298
+    cache.put("k3", "m", "x" * 298)
+    assert cache.get("k1", "m") is None
+    assert [cache.get(f"k{i}", "m") is not None for i in (0, 2, 3)] == [True] * 3
+    assert cache.stats()["bytes"] == 900
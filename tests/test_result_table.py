@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.result_table import ablation_accuracy, count, perturbation_counts, scan_results
+from utils.significance import BASELINE, VARIATIONS
+
+HEDGED = {"tone": "less assertive", "physician_description": "a novice physician", "ai_role": "medical expert"}
+
+
+def write(path, records):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(records), encoding="utf-8")
+
+
+def answers(correct, total, **fields):
+    return [{"prompt": f"Question: q{i}\n\nChoices:", "is_correct": "true" if i < correct else "false", **fields}
+            for i in range(total)]
+
+
+@pytest.fixture
+def table(tmp_path):
+    write(tmp_path / "gpt" / "gpt4o_8var.json", answers(3, 5, metadata=HEDGED, category="Cardiology")
+          + answers(1, 4, metadata=HEDGED, category="Neurology"))
+    write(tmp_path / "gpt" / "ablation" / "no_exclusion_results.json", answers(7, 10, category="Cardiology"))
+    write(tmp_path / "gpt" / "ablation" / "lab_tests_results.json", answers(2, 8))
+    # Older runs named the unmodified questions normal.json.
+    write(tmp_path / "llama3" / "ablation" / "normal.json", answers(4, 5))
+    return scan_results(str(tmp_path))
+
+
+def test_scan_counts_every_record_once(table):
+    assert int(table["total"].sum()) == 32
+    assert count(table, model="GPT-4o", variation=VARIATIONS[0]) == (4, 9)
+    assert count(table, model="GPT-4o", variation=VARIATIONS[0], category="Neurology") == (1, 4)
+    assert count(table, model="Llama-3 8B", excluded="no_exclusion") == (4, 5)
+
+
+def test_perturbation_counts_take_the_baseline_from_the_ablation_run(table):
+    counts = perturbation_counts(table, ["GPT-4o", "Llama-3 8B"], [BASELINE, VARIATIONS[0], VARIATIONS[1]])
+    assert counts.tolist() == [
+        [[7, 3], [4, 5], [0, 0]],
+        [[4, 1], [0, 0], [0, 0]],
+    ]
+
+
+def test_ablation_accuracy_is_nan_where_not_run(table):
+    accuracy = ablation_accuracy(table, ["GPT-4o", "Llama-3 8B"], ["no_exclusion", "lab_tests"])
+    np.testing.assert_allclose(accuracy, [[70.0, 25.0], [80.0, np.nan]])
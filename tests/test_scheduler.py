@@ -0,0 +1,56 @@
+import os
+import threading
+import time
+
+from utils.scheduler import build_jobs, run_jobs
+
+_lock = threading.Lock()
+_active = {}
+_peak = {}
+
+
+def fake_runner(provider, should_fail=False):
+    with _lock:
+        _active[provider] = _active.get(provider, 0) + 1
+        _peak[provider] = max(_peak.get(provider, 0), _active[provider])
+    time.sleep(0.05)
+    with _lock:
+        _active[provider] -= 1
+    if should_fail:
+        raise RuntimeError("model not pulled")
+
+
+def job(name, provider, should_fail=False):
+    return {"name": name, "module": __name__, "entry": "fake_runner", "provider": provider,
+            "args": (provider, should_fail), "status": "pending", "progress": None,
+            "started": None, "finished": None, "error": None}
+
+
+def test_every_model_gets_a_job_per_input():
+    jobs = build_jobs({("medqa", "8var"): "medqa.json", ("medbullet", "ablation"): "ablation/"},
+                      models=["gpt", "llama3"], output_roots={"medqa": "out_qa", "medbullet": "out_mb"})
+    assert [(job["name"], job["module"], job["entry"], job["provider"], job["args"]) for job in jobs] == [
+        ("medqa/8var/gpt", "medqa.gpt_8var", "run_evaluation", "openai",
+         ("medqa.json", os.path.join("out_qa", "gpt", ""))),
+        ("medqa/8var/llama3", "medqa.llama3_8var", "run_evaluation", "ollama",
+         ("medqa.json", os.path.join("out_qa", "llama3", ""))),
+        ("medbullet/ablation/gpt", "medbullet.gpt_ablation", "process_datasets", "openai",
+         ("ablation/", os.path.join("out_mb", "gpt", "ablation"))),
+        ("medbullet/ablation/llama3", "medbullet.llama3_ablation", "process_datasets", "ollama",
+         ("ablation/", os.path.join("out_mb", "llama3", "ablation"))),
+    ]
+
+
+def test_lanes_run_side_by_side_within_their_job_limits(monkeypatch):
+    monkeypatch.delenv("OLLAMA_MAX_JOBS", raising=False)
+    monkeypatch.setenv("OPENAI_MAX_JOBS", "3")
+    _peak.clear()
+    jobs = [job(f"ollama/{i}", "ollama") for i in range(3)]
+    jobs += [job(f"openai/{i}", "openai", should_fail=i == 1) for i in range(3)]
+    run_jobs(jobs, summary_interval=60)
+
+    assert [job["status"] for job in jobs] == ["done"] * 4 + ["failed", "done"]
+    assert str(jobs[4]["error"]) == "model not pulled"
+    assert _peak == {"ollama": 1, "openai": 3}
+    # The OpenAI jobs did not wait for the Ollama lane to drain.
+    assert max(job["finished"] for job in jobs[3:]) < max(job["finished"] for job in jobs[:3])
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from utils.significance import BASELINE, VARIATIONS, flip_matrices, paired_analysis, variation_name
+from utils.stats import mcnemar_test
+
+HEDGED_NOVICE_EXPERT = {"tone": "less assertive", "physician_description": "a novice physician", "ai_role": "medical expert"}
+DEFINITIVE_EXPERT_ASSISTANT = {"tone": "assertive", "physician_description": "an expert physician", "ai_role": "medical assistant"}
+
+
+def record(question, correct, metadata=None):
+    return {
+        "prompt": f"Preamble\n\nQuestion: {question}\n\nChoices:\n(A) yes\n(B) no",
+        "metadata": metadata,
+        "is_correct": "true" if correct else "false",
+    }
+
+
+def test_variation_names_follow_the_graph_scripts():
+    assert variation_name(record("q", True)) == BASELINE
+    assert variation_name(record("q", True, HEDGED_NOVICE_EXPERT)) == VARIATIONS[0]
+    assert variation_name(record("q", True, DEFINITIVE_EXPERT_ASSISTANT)) == VARIATIONS[-1]
+
+
+def test_flip_matrices_skip_unpaired_questions():
+    baseline = np.array([[1, 1, 0, 0, -1]], dtype=np.int8)
+    perturbed = np.array([[[1, 0, 1, -1, 0]]], dtype=np.int8)
+    assert flip_matrices(baseline, perturbed).tolist() == [[[[0, 1], [1, 1]]]]
+
+
+def test_paired_analysis_counts_flips_per_model_and_variation():
+    # Model A: 10 questions right at baseline; hedging breaks 6, fixes none.
+    # Model B: the same questions half right; the other variation fixes 2.
+    questions = [f"question {i}" for i in range(10)]
+    baseline = {
+        "A": [record(q, True) for q in questions],
+        "B": [record(q, i % 2 == 0) for i, q in enumerate(questions)],
+    }
+    perturbed = {
+        "A": [record(q, i >= 6, HEDGED_NOVICE_EXPERT) for i, q in enumerate(questions)]
+             + [record(q, True, DEFINITIVE_EXPERT_ASSISTANT) for q in questions[:4]],
+        "B": [record(q, i % 2 == 0, HEDGED_NOVICE_EXPERT) for i, q in enumerate(questions)]
+             + [record(q, i % 2 == 0 or i < 4, DEFINITIVE_EXPERT_ASSISTANT) for i, q in enumerate(questions)],
+    }
+    rows = {(row["model"], row["variation"]): row for row in paired_analysis(baseline, perturbed)}
+    assert len(rows) == 4
+
+    hedged = rows["A", VARIATIONS[0]]
+    assert (hedged["pairs"], hedged["correct_to_incorrect"], hedged["incorrect_to_correct"]) == (10, 6, 0)
+    assert (hedged["baseline_true"], hedged["perturbed_true"]) == (10, 4)
+    assert hedged["p_mcnemar"] == pytest.approx(2 / 2 ** 6)
+
+    partial = rows["A", VARIATIONS[-1]]
+    assert (partial["pairs"], partial["perturbed_total"], partial["p_mcnemar"]) == (4, 4, 1.0)
+
+    fixed = rows["B", VARIATIONS[-1]]
+    assert (fixed["correct_to_incorrect"], fixed["incorrect_to_correct"]) == (0, 2)
+    assert fixed["p_mcnemar"] == pytest.approx(float(mcnemar_test(0, 2)))
+    for row in rows.values():
+        assert row["q_mcnemar"] >= row["p_mcnemar"]
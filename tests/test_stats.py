@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+from scipy import stats as scipy_stats
+from statsmodels.stats.contingency_tables import mcnemar
+from statsmodels.stats.proportion import proportions_ztest
+
+from utils.stats import (
+    accuracy_ci, fisher_exact_test, make_rng, mcnemar_test, permutation_test, proportion_test,
+    two_proportion_z_test, wilson_ci,
+)
+
+
+def scipy_p_value(baseline, perturbed):
+    # Equal group sizes make the null distribution symmetric, so SciPy's
+    # two-sided p (twice the smaller tail) matches the |difference| count.
+    result = scipy_stats.permutation_test(
+        (baseline, perturbed), lambda x, y, axis: np.mean(y, axis=axis) - np.mean(x, axis=axis),
+        permutation_type="independent", n_resamples=np.inf, vectorized=True,
+    )
+    return result.pvalue
+
+
+@pytest.mark.parametrize("baseline, perturbed", [
+    # Distinct values: random subsets.
+    ([61.2, 58.4, 63.0, 60.1, 59.7, 62.5], [55.3, 57.9, 54.1, 58.8, 56.0, 53.6]),
+    # Few distinct values, as with bootstrapped accuracies: hypergeometric draws.
+    ([60.0, 60.0, 62.5, 62.5, 62.5, 65.0, 60.0, 65.0], [57.5, 60.0, 57.5, 60.0, 62.5, 57.5, 57.5, 60.0]),
+    # No difference at all.
+    ([50.0, 52.5, 55.0, 50.0], [55.0, 50.0, 52.5, 50.0]),
+])
+def test_permutation_p_value_matches_scipy_exact(baseline, perturbed):
+    expected = scipy_p_value(np.array(baseline), np.array(perturbed))
+    p = permutation_test(baseline, perturbed, n_permutations=40000, rng=make_rng(0))
+    # Monte Carlo error of 40000 draws is below 0.0025 at any p.
+    assert p == pytest.approx(expected, abs=0.01)
+
+
+def test_permutation_test_is_reproducible_with_a_seed():
+    baseline = np.linspace(50, 60, 30)
+    perturbed = np.linspace(48, 58, 30)
+    first = permutation_test(baseline, perturbed, n_permutations=5000, rng=make_rng(7))
+    assert first == permutation_test(baseline, perturbed, n_permutations=5000, rng=make_rng(7))
+    assert 0 < first < 1
+
+
+# Newcombe (1998), Statistics in Medicine 17:857-872, Table I: Wilson
+# score intervals for 81/263 and 15/148.
+@pytest.mark.parametrize("correct, total, lower, upper", [
+    (81, 263, 25.53, 36.62),
+    (15, 148, 6.24, 16.05),
+])
+def test_wilson_interval_matches_newcombe(correct, total, lower, upper):
+    low, high = wilson_ci(correct, total)
+    assert (low, high) == (pytest.approx(lower, abs=0.005), pytest.approx(upper, abs=0.005))
+
+
+def test_wilson_interval_matches_scipy_for_every_cell():
+    correct = np.array([[0, 7, 40], [95, 100, 63]])
+    total = np.array([[40, 20, 40], [100, 100, 120]])
+    low, high = wilson_ci(correct, total, level=0.9)
+    for index in np.ndindex(correct.shape):
+        expected = scipy_stats.binomtest(correct[index], total[index]).proportion_ci(0.9, method="wilson")
+        assert low[index] == pytest.approx(expected.low * 100)
+        assert high[index] == pytest.approx(expected.high * 100)
+
+
+@pytest.mark.parametrize("method", ["percentile", "bca"])
+def test_bootstrap_interval_matches_scipy(method):
+    # Resampling 0/1 answers is the binomial draw bootstrap_accuracy makes.
+    correct, total = 52, 80
+    answers = np.array([1] * correct + [0] * (total - correct))
+    expected = scipy_stats.bootstrap((answers,), np.mean, n_resamples=20000, method=method,
+                                     random_state=make_rng(1)).confidence_interval
+    low, high = accuracy_ci(correct, total, method=method, n_resamples=20000, rng=make_rng(2))
+    # Both sample the same discrete distribution, so the bounds land on its
+    # 1.25-point grid of accuracies, at most one step apart.
+    assert low == pytest.approx(expected.low * 100, abs=1.3)
+    assert high == pytest.approx(expected.high * 100, abs=1.3)
+
+
+def test_bca_interval_is_zero_width_when_every_answer_is_right():
+    low, high = accuracy_ci(np.array([30, 12]), np.array([30, 40]), method="bca", n_resamples=2000, rng=make_rng(0))
+    assert (low[0], high[0]) == (100.0, 100.0)
+    assert low[1] < 30 < high[1]
+
+
+def test_unknown_interval_method_is_rejected():
+    with pytest.raises(ValueError, match="Unknown interval method"):
+        accuracy_ci(5, 10, method="jeffreys")
+
+
+def test_fisher_exact_test_matches_the_lady_tasting_tea():
+    # Fisher (1935): 3 of 4 milk-first cups named right, two-sided p = 34/70.
+    p = fisher_exact_test(np.array([3, 8]), np.array([4, 10]), np.array([1, 3]), np.array([4, 10]))
+    assert p[0] == pytest.approx(34 / 70)
+    assert p[1] == pytest.approx(scipy_stats.fisher_exact([[8, 2], [3, 7]])[1])
+
+
+def test_z_test_matches_statsmodels():
+    baseline_true, baseline_total = np.array([52, 30, 40]), np.array([80, 60, 40])
+    perturbed_true, perturbed_total = np.array([41, 30, 40]), np.array([80, 50, 40])
+    p = two_proportion_z_test(baseline_true, baseline_total, perturbed_true, perturbed_total)
+    for i in range(2):
+        expected = proportions_ztest([perturbed_true[i], baseline_true[i]], [perturbed_total[i], baseline_total[i]])[1]
+        assert p[i] == pytest.approx(expected)
+    # Both at 100%: no evidence of a difference.
+    assert p[2] == 1.0
+
+
+@pytest.mark.parametrize("only_baseline, only_perturbed, expected", [
+    (1, 6, 0.125),  # 2 * P(X <= 1), X ~ Binomial(7, 1/2) = 2 * 8/128
+    (0, 5, 0.0625),
+    (4, 4, 1.0),
+    (0, 0, 1.0),
+])
+def test_exact_mcnemar_test_matches_binomial_values(only_baseline, only_perturbed, expected):
+    assert mcnemar_test(only_baseline, only_perturbed) == pytest.approx(expected)
+
+
+def test_exact_mcnemar_test_matches_statsmodels():
+    only_baseline, only_perturbed = np.array([12, 3, 20]), np.array([5, 9, 21])
+    p = mcnemar_test(only_baseline, only_perturbed)
+    for i in range(3):
+        expected = mcnemar([[40, only_baseline[i]], [only_perturbed[i], 30]], exact=True).pvalue
+        assert p[i] == pytest.approx(expected)
+
+
+def test_unknown_proportion_test_is_rejected():
+    with pytest.raises(ValueError, match="Unknown test"):
+        proportion_test("chi2", 5, 10, 6, 10)
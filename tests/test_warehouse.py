@@ -0,0 +1,40 @@
+import json
+
+from utils.warehouse import ingest, summary
+
+HEDGED = {"tone": "less assertive", "physician_description": "a novice physician", "ai_role": "medical expert"}
+
+
+def write(path, correct, total, **fields):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = [{"prompt": f"Question: q{i}\n\nChoices:", "is_correct": "true" if i < correct else "false", **fields}
+               for i in range(total)]
+    path.write_text(json.dumps(records), encoding="utf-8")
+
+
+def test_ingest_summarizes_and_rewrites_only_changed_partitions(tmp_path):
+    root = tmp_path / "medqa_results"
+    write(root / "gpt" / "gpt4o_8var.json", 3, 4, metadata=HEDGED)
+    write(root / "gpt" / "ablation" / "no_exclusion_results.json", 5, 8)
+    write(root / "llama3" / "ablation" / "lab_tests_results.json", 1, 4)
+    roots = {"medqa": str(root)}
+    warehouse = str(tmp_path / "warehouse")
+
+    written = ingest(roots, warehouse)
+    assert sorted(written) == [("medqa/gpt/8var", 4), ("medqa/gpt/ablation", 8), ("medqa/llama3/ablation", 4)]
+    assert ingest(roots, warehouse) == []
+
+    table = summary(warehouse, by=("model", "experiment", "excluded"))
+    rows = {(row.model, row.experiment, row.excluded): (row.true, row.total, row.accuracy)
+            for row in table.itertuples()}
+    assert rows == {
+        ("gpt", "8var", ""): (3, 4, 75.0),
+        ("gpt", "ablation", "no_exclusion"): (5, 8, 62.5),
+        ("llama3", "ablation", "lab_tests"): (1, 4, 25.0),
+    }
+
+    write(root / "gpt" / "gpt4o_8var.json", 4, 6, metadata=HEDGED)
+    (root / "llama3" / "ablation" / "lab_tests_results.json").unlink()
+    assert ingest(roots, warehouse) == [("medqa/gpt/8var", 6)]
+    table = summary(warehouse, by=("model",))
+    assert table[["model", "true", "total"]].values.tolist() == [["gpt", 9, 14]]
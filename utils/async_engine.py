@@ -0,0 +1,160 @@
+"""Concurrent evaluation loop for the 8-variant perturbation runners.
+
+The runners take their prompts from ``utils.prompt_corpus``, keep their own
+extract_answer/query_* functions and hand them to ``evaluate_prompts``,
+which fans the prompts of every question out over a per-provider worker
+pool while still writing records in dataset order (question by question,
+variant by variant).
+"""
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from tqdm import tqdm
+
+from utils.concurrency import max_in_flight_for
+
+_executors = {}
+_executors_lock = threading.Lock()
+_progress = threading.local()
+
+
+def get_executor(provider, workers=None):
+    """Return the worker pool shared by every run that talks to ``provider``.
+
+    The pool has at least ``workers`` threads (default: the provider's
+    in-flight limit). A run asking for more than the current pool gets a
+    larger one; the old pool finishes the tasks it already has.
+    """
+    workers = max(workers or 0, max_in_flight_for(provider))
+    with _executors_lock:
+        executor = _executors.get(provider)
+        if executor is None or executor._max_workers < workers:
+            if executor is not None:
+                executor.shutdown(wait=False)
+            executor = _executors[provider] = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix=f"{provider}-query",
+            )
+        return executor
+
+
+@contextmanager
+def progress_sink(callback):
+    """Report runs started in this thread to ``callback(desc, done, total)``.
+
+    Used by the scheduler, which runs several jobs at once and prints one
+    summary instead of letting every job draw its own progress bar.
+    """
+    previous = getattr(_progress, "callback", None)
+    _progress.callback = callback
+    try:
+        yield
+    finally:
+        _progress.callback = previous
+
+
+def iter_prompts(dataset, gen_messages):
+    """Yield every prompt of every question in a stable order."""
+    for data_entry in dataset:
+        yield from gen_messages(data_entry)
+
+
+def iter_entry_prompts(dataset, create_prompt):
+    """Yield one prompt per question for the single-prompt ablation runners."""
+    for data_entry in dataset:
+        yield {"prompt": create_prompt(data_entry), "data_entry": data_entry}
+
+
+async def _query(query_fn, prompt_data, executor, semaphore):
+    async with semaphore:
+        if asyncio.iscoroutinefunction(query_fn):
+            return await query_fn(prompt_data["prompt"])
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, query_fn, prompt_data["prompt"])
+
+
+async def _evaluate(prompts, query_fn, build_record, writer, checkpoint, provider, max_in_flight,
+                    desc, total):
+    limit = max_in_flight or max_in_flight_for(provider)
+    semaphore = asyncio.Semaphore(limit)
+    executor = get_executor(provider, limit)
+    # Completed tasks wait in this window until everything before them is
+    # done, so a slow request never lets later records overtake it on disk.
+    window = deque()
+    window_size = limit * 8
+    results = []
+    skipped = 0
+    done = 0
+    sink = getattr(_progress, "callback", None)
+    progress = tqdm(total=total, desc=desc, disable=sink is not None)
+
+    def advance():
+        nonlocal done
+        done += 1
+        progress.update(1)
+        if sink is not None:
+            sink(desc, done, total)
+
+    def finish(prompt_data, key, task):
+        try:
+            response_text = task.result()
+            record = build_record(prompt_data, response_text)
+        except Exception as e:
+            print(f"Error while processing prompt: {prompt_data['prompt'][:80]!r}. Error: {e}")
+            return
+        finally:
+            advance()
+        results.append(record)
+        if writer is not None:
+            writer.write(record)
+        if checkpoint is not None:
+            checkpoint.mark(key)
+
+    for prompt_data in prompts:
+        key = checkpoint.key(prompt_data) if checkpoint is not None else None
+        if key is not None and key in checkpoint:
+            skipped += 1
+            advance()
+            continue
+        if writer is not None and prompt_data["prompt"] in writer:
+            # Stored by a run from before the checkpoint index existed.
+            if key is not None:
+                checkpoint.mark(key)
+            skipped += 1
+            advance()
+            continue
+        task = asyncio.ensure_future(_query(query_fn, prompt_data, executor, semaphore))
+        window.append((prompt_data, key, task))
+        if len(window) >= window_size:
+            head_prompt, head_key, head_task = window.popleft()
+            await asyncio.wait([head_task])
+            finish(head_prompt, head_key, head_task)
+    while window:
+        head_prompt, head_key, head_task = window.popleft()
+        await asyncio.wait([head_task])
+        finish(head_prompt, head_key, head_task)
+    progress.close()
+    if skipped:
+        print(f"Skipped {skipped} prompts already completed in an earlier run")
+    return results
+
+
+def evaluate_prompts(prompts, query_fn, build_record, writer=None, provider="openai",
+                     max_in_flight=None, desc="Querying", total=None, checkpoint=None):
+    """Query every prompt concurrently and return the records in input order.
+
+    ``query_fn`` takes the prompt text and returns the response text; it may
+    be a plain function (run on the provider's worker pool) or a coroutine
+    function. ``build_record(prompt_data, response_text)`` turns a response
+    into the runner's record. Failed prompts are reported and skipped, as in
+    the sequential loop this replaces.
+
+    With a ``utils.checkpoint.Checkpoint``, prompts finished by an earlier
+    run are skipped before they are scheduled and only the remainder is
+    queried.
+    """
+    return asyncio.run(_evaluate(prompts, query_fn, build_record, writer, checkpoint, provider,
+                                 max_in_flight, desc, total))
@@ -0,0 +1,320 @@
+"""Batch-API mode for the OpenAI and Anthropic runners.
+
+Every prompt of a run is known before the first request goes out, so instead
+of one synchronous call per prompt the runners can write them all to batch
+request files, submit those to the provider's batch endpoint, and turn the
+results into the same records the synchronous path produces. Batches are
+billed at half price and do not count against per-minute rate limits; the
+trade-off is latency (results arrive within 24 hours, usually much sooner).
+
+Submitted batches are tracked in ``<name>.batches.state`` (JSON) next to
+the result log, so an interrupted run goes back to polling the batches it
+already paid for instead of submitting the same prompts again. A batch is
+recorded there before it is submitted; if a run stops before the provider's
+batch id was saved, the next run looks the batch up (by uploaded file for
+OpenAI; for Anthropic by creation time and size, then by the custom ids and
+model in its results) and only submits it again when the provider has no
+such batch.
+
+Answers are stored in the response cache (``utils.response_cache``) under
+the same key as the synchronous query functions, and prompts already in the
+cache are not sent, so switching between batch and synchronous mode does
+not pay for a prompt twice.
+
+Point OPENAI_BASE_URL / ANTHROPIC_BASE_URL at ``utils.mock_batch_server`` to
+exercise the whole flow locally.
+"""
+import hashlib
+import json
+import os
+import time
+
+from utils.clients import get_client
+from utils.response_cache import cache_enabled, cache_key, get_cache
+
+# Provider limits on the number of requests in a single batch.
+MAX_REQUESTS = {
+    "openai": 50000,
+    "anthropic": 100000,
+}
+
+TERMINAL_STATUSES = {
+    "openai": {"completed", "failed", "expired", "cancelled"},
+    "anthropic": {"ended"},
+}
+
+OPENAI_ENDPOINT = "/v1/chat/completions"
+
+# Not .json: the ablation runners and count scripts take every *.json in a
+# folder as a dataset or result file, and the state often sits next to them.
+STATE_SUFFIX = ".batches.state"
+
+# How far before the recorded submit time a batch found on the provider may
+# have been created and still count as ours (clock skew between hosts).
+CLOCK_SKEW = 300
+
+
+def custom_id_for(prompt):
+    # Both providers require ids of at most 64 characters from [A-Za-z0-9_-].
+    return "p-" + hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+def request_line(provider, custom_id, prompt, params):
+    """Return one line of a batch request file."""
+    body = {**params, "messages": [{"role": "user", "content": prompt}]}
+    if provider == "openai":
+        return {"custom_id": custom_id, "method": "POST", "url": OPENAI_ENDPOINT, "body": body}
+    if provider == "anthropic":
+        return {"custom_id": custom_id, "params": body}
+    raise ValueError(f"Batch mode is not available for provider '{provider}'")
+
+
+def write_request_file(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+
+def read_request_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["custom_id"] for line in f if line.strip()]
+
+
+def read_requests(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def submit(provider, batch, save=lambda: None):
+    """Submit ``batch["request_file"]`` and set ``batch["id"]``.
+
+    ``save`` is called after every step that leaves something on the
+    provider's side (the uploaded file, the batch), so ``find_submitted``
+    can recover it if the process stops before the id is stored.
+    """
+    client = get_client(provider)
+    if provider == "openai":
+        if not batch.get("input_file_id"):
+            with open(batch["request_file"], "rb") as f:
+                batch["input_file_id"] = client.files.create(file=f, purpose="batch").id
+            save()
+        batch["id"] = client.batches.create(
+            input_file_id=batch["input_file_id"], endpoint=OPENAI_ENDPOINT, completion_window="24h"
+        ).id
+    else:
+        batch["id"] = client.messages.batches.create(requests=read_requests(batch["request_file"])).id
+    save()
+    return batch["id"]
+
+
+def find_submitted(provider, batch, poll_interval=60):
+    """The id of a recorded batch the provider accepted before we saved it, or None.
+
+    An Anthropic batch has no handle of ours, and runners sharing a prompt
+    template send the same custom ids, so a candidate of the right age and
+    size is only taken once it has ended and its results carry exactly our
+    custom ids, answered by the model our request file names.
+    """
+    client = get_client(provider)
+    if provider == "openai":
+        # Each upload gets a new file id, so only our own batch can use it.
+        if not batch.get("input_file_id"):
+            return None
+        for candidate in client.batches.list(limit=100):
+            if candidate.input_file_id == batch["input_file_id"]:
+                return candidate.id
+            if candidate.created_at < batch["submitted_at"] - CLOCK_SKEW:
+                break
+        return None
+    requests = read_requests(batch["request_file"])
+    custom_ids = {request["custom_id"] for request in requests}
+    models = {request["params"]["model"] for request in requests}
+    for candidate in client.messages.batches.list(limit=100):
+        if candidate.created_at.timestamp() < batch["submitted_at"] - CLOCK_SKEW:
+            break
+        counts = candidate.request_counts
+        if counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired != len(requests):
+            continue
+        wait_for(provider, [candidate.id], poll_interval)
+        seen_ids, seen_models = set(), set()
+        for item in client.messages.batches.results(candidate.id):
+            seen_ids.add(item.custom_id)
+            if item.result.type == "succeeded":
+                seen_models.add(item.result.message.model)
+        if seen_ids == custom_ids and seen_models <= models:
+            return candidate.id
+    return None
+
+
+def batch_status(provider, batch_id):
+    client = get_client(provider)
+    if provider == "openai":
+        return client.batches.retrieve(batch_id).status
+    return client.messages.batches.retrieve(batch_id).processing_status
+
+
+def wait_for(provider, batch_ids, poll_interval=60):
+    """Poll until every batch has reached a terminal status."""
+    statuses = {}
+    remaining = list(batch_ids)
+    while remaining:
+        for batch_id in list(remaining):
+            status = batch_status(provider, batch_id)
+            if statuses.get(batch_id) != status:
+                print(f"Batch {batch_id}: {status}")
+                statuses[batch_id] = status
+            if status in TERMINAL_STATUSES[provider]:
+                remaining.remove(batch_id)
+        if remaining:
+            time.sleep(poll_interval)
+    return statuses
+
+
+def iter_results(provider, batch_id):
+    """Yield ``(custom_id, response_text, error)`` for every finished request."""
+    client = get_client(provider)
+    if provider == "anthropic":
+        for item in client.messages.batches.results(batch_id):
+            if item.result.type == "succeeded":
+                yield item.custom_id, item.result.message.content[0].text, None
+            else:
+                yield item.custom_id, None, getattr(item.result, "error", item.result.type)
+        return
+
+    batch = client.batches.retrieve(batch_id)
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                yield item["custom_id"], None, item.get("error") or response.get("body")
+                continue
+            yield item["custom_id"], response["body"]["choices"][0]["message"]["content"], None
+
+
+def load_state(state_path):
+    if state_path and os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"batches": []}
+
+
+def save_state(state_path, state):
+    if not state_path:
+        return
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, state_path)
+
+
+def run_batch(prompts, provider, params, build_record, writer=None, state_path=None,
+              poll_interval=60, max_requests=None, checkpoint=None):
+    """Answer every prompt through the provider's batch API.
+
+    ``prompts`` and ``build_record`` are the same as for
+    ``utils.async_engine.evaluate_prompts`` and records come back in prompt
+    order. ``params`` holds the request arguments besides ``messages``
+    (model, max_tokens, ...). Request files are written next to
+    ``state_path`` (``<name>.batches.state``, derived from the writer by
+    default). Prompts already in ``writer``, marked done in ``checkpoint``
+    or answered in the response cache are not sent again; failed requests
+    are reported and left out, so rerunning the same call retries just
+    those.
+    """
+    if state_path is None and writer is not None:
+        state_path = writer.path[: -len(".jsonl")] + STATE_SUFFIX
+    if state_path:
+        request_stem = state_path[: -len(STATE_SUFFIX)] if state_path.endswith(STATE_SUFFIX) \
+            else os.path.splitext(state_path)[0]
+    else:
+        request_stem = f"{provider}_batch"
+    state = load_state(state_path)
+    model = params["model"]
+    cache_params = {key: value for key, value in params.items() if key != "model"}
+    cache = get_cache() if cache_enabled() else None
+
+    by_id = {}
+    for prompt_data in prompts:
+        by_id.setdefault(custom_id_for(prompt_data["prompt"]), prompt_data)
+
+    # Batches left by an interrupted run are collected before anything new
+    # is submitted, so their prompts are not paid for twice.
+    open_batches = [batch for batch in state["batches"] if not batch.get("ingested")]
+    submitted = set()
+    for batch in open_batches:
+        submitted.update(read_request_ids(batch["request_file"]))
+        if batch.get("id") is None:
+            batch["id"] = find_submitted(provider, batch, poll_interval)
+            if batch["id"] is None:
+                submit(provider, batch, lambda: save_state(state_path, state))
+                print(f"Submitted batch {batch['id']} left unsubmitted by an earlier run")
+            else:
+                print(f"Found batch {batch['id']} submitted by an earlier run")
+                save_state(state_path, state)
+
+    def finished(prompt_data):
+        if checkpoint is not None and checkpoint.key(prompt_data) in checkpoint:
+            return True
+        return writer is not None and prompt_data["prompt"] in writer
+
+    pending = [
+        custom_id for custom_id, prompt_data in by_id.items()
+        if custom_id not in submitted and not finished(prompt_data)
+    ]
+    responses = {}
+    if cache is not None:
+        for custom_id in pending:
+            response = cache.get(cache_key(model, by_id[custom_id]["prompt"], cache_params), model)
+            if response is not None:
+                responses[custom_id] = response
+        pending = [custom_id for custom_id in pending if custom_id not in responses]
+    chunk_size = max_requests or MAX_REQUESTS[provider]
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        request_path = f"{request_stem}.batch-{len(state['batches']) + 1:04d}.jsonl"
+        write_request_file(request_path, (
+            request_line(provider, custom_id, by_id[custom_id]["prompt"], params) for custom_id in chunk
+        ))
+        batch = {"id": None, "request_file": request_path, "submitted_at": time.time()}
+        state["batches"].append(batch)
+        open_batches.append(batch)
+        save_state(state_path, state)
+        submit(provider, batch, lambda: save_state(state_path, state))
+        print(f"Submitted batch {batch['id']} with {len(chunk)} requests")
+
+    statuses = wait_for(provider, [batch["id"] for batch in open_batches], poll_interval)
+    for batch in open_batches:
+        batch["status"] = statuses[batch["id"]]
+        for custom_id, response_text, error in iter_results(provider, batch["id"]):
+            if error is not None:
+                print(f"Error in batch {batch['id']} for request {custom_id}: {error}")
+                continue
+            responses[custom_id] = response_text
+            if cache is not None and custom_id in by_id:
+                cache.put(cache_key(model, by_id[custom_id]["prompt"], cache_params), model, response_text)
+
+    results = []
+    for custom_id, prompt_data in by_id.items():
+        if custom_id not in responses:
+            continue
+        try:
+            record = build_record(prompt_data, responses[custom_id])
+        except Exception as e:
+            print(f"Error while processing prompt: {prompt_data['prompt'][:80]!r}. Error: {e}")
+            continue
+        results.append(record)
+        if writer is not None:
+            writer.write(record)
+        if checkpoint is not None:
+            checkpoint.mark(checkpoint.key(prompt_data))
+
+    if open_batches:
+        for batch in open_batches:
+            batch["ingested"] = True
+        save_state(state_path, state)
+    return results
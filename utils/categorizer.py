@@ -0,0 +1,173 @@
+"""Question categorizer shared by misc/categorize_medqa.py and categorize_medbullet.py.
+
+Both scripts label every question with one exam category using GPT-4o at
+temperature 0. They differ only in the category set (MedQA also has
+"Applying Foundational Science Concepts"), so the system prompt is built
+from ``CATEGORIES`` here instead of being pasted into each script.
+
+``categorize`` sends every distinct question text once, concurrently on the
+shared OpenAI worker pool (OPENAI_MAX_IN_FLIGHT). The label is stored in the
+response cache (``utils.response_cache``), keyed by a hash of the question
+text, the model parameters and the prompts, so a rerun or a second dataset
+with the same questions costs nothing. The system prompt is the first
+message and identical for every request, and requests carry the same
+``prompt_cache_key``, so OpenAI can reuse its cached prefix.
+
+A local TF-IDF model trained on earlier labels (``utils.local_categorizer``)
+can label the questions it is confident about first, so only the rest cost
+a request.
+
+Replies are accepted only if ``canonical_category`` maps them to one of the
+categories offered; anything else is a failed request, which is not cached
+and is retried by the next run.
+"""
+import hashlib
+import re
+
+from utils.async_engine import evaluate_prompts
+from utils.clients import get_client
+from utils.local_categorizer import DEFAULT_THRESHOLD, predict
+from utils.rate_limit import rate_limited
+from utils.response_cache import cached_response
+
+MODEL_PARAMS = {"model": "gpt-4o", "temperature": 0.0}
+
+# Category name -> description lines, in the order they are offered.
+CATEGORIES = {
+    "Diagnosis": """
+               - Identifying diseases or conditions based on patient history, physical examination,
+                 and laboratory or diagnostic test findings.
+               - Recognizing signs and symptoms of diseases.
+               - Selecting and interpreting laboratory and diagnostic studies.
+               - Formulating differential diagnoses and selecting the most likely diagnosis.
+               - Determining prognosis or patient outcomes based on clinical and diagnostic information.
+""",
+    "Pharmacotherapy, Interventions and Management": """
+               - Developing a plan to treat or manage a patient's condition using pharmacological
+                 and non-pharmacological methods.
+               - Selecting appropriate drugs, determining doses, and monitoring drug efficacy and side effects.
+               - Recognizing contraindications, drug interactions, and adverse effects.
+               - Planning and monitoring surgical or non-surgical interventions.
+               - Managing acute and chronic conditions, including emergency care and follow-ups.
+""",
+    "Health Maintenance, Prevention and Surveillance": """
+               - Promoting health and preventing disease through risk assessment, screening, and
+                 patient education.
+               - Identifying risk factors for disease and selecting appropriate preventive measures
+                 (e.g., vaccinations, lifestyle changes).
+               - Implementing screening programs and interpreting screening results.
+               - Educating patients about health maintenance and long-term surveillance for
+                 chronic conditions.
+""",
+    "Applying Foundational Science Concepts": """
+               - Using knowledge of basic sciences to understand and explain disease mechanisms, treatment rationale, and diagnostic findings.
+               - Identifying the genetic, anatomical, physiological, or biochemical basis of disease.
+               - Understanding mechanisms of drug actions and interactions.
+               - Explaining pathophysiological processes underlying clinical findings.
+""",
+}
+MEDQA_CATEGORIES = list(CATEGORIES)
+MEDBULLET_CATEGORIES = MEDQA_CATEGORIES[:3]
+
+_COUNTS = {3: "three", 4: "four"}
+
+USER_PROMPT = """
+            Question:
+            {message}
+
+            Which ONE of these categories does it best fit?
+            Answer ONLY with the category name (e.g., 'Diagnosis', 'Pharmacotherapy, Interventions and Management', etc.).
+            No extra words, no explanations.
+            """
+
+
+def system_prompt(categories):
+    blocks = "\n".join(f"            {i}) {name}:{CATEGORIES[name]}" for i, name in enumerate(categories, 1))
+    return f"""
+            You are a medical exam question classifier. You have exactly {_COUNTS.get(len(categories), len(categories))} categories to choose from.
+            Each category has the following detailed descriptions:
+
+{blocks}
+            Your job: Read the question and determine which ONE category above best describes the main focus of the question.
+            Return only the category name in your response. DO NOT give reasoning or extra text.
+            """
+
+
+def _normalize(text):
+    text = text.lower().replace("&", "and")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def canonical_category(reply, categories):
+    """The category of ``categories`` a reply names, or None.
+
+    Tolerates case, quotes, numbering ("2) ..."), a "Category:" prefix and
+    trailing punctuation; a reply naming no category or several is rejected.
+    """
+    text = _normalize(reply or "")
+    text = re.sub(r"^(category\s*)?\d?\s*", "", text)
+    names = {_normalize(name): name for name in categories}
+    if text in names:
+        return names[text]
+    named = [name for normalized, name in names.items() if re.search(rf"\b{normalized}\b", text)]
+    if len(named) == 1:
+        return named[0]
+    return None
+
+
+def make_classifier(categories):
+    """A cached ``classify(question)`` returning a label from ``categories``."""
+    system = system_prompt(categories)
+    cache_key = "categorize-" + hashlib.sha1(system.encode("utf-8")).hexdigest()[:12]
+
+    @cached_response(**MODEL_PARAMS, system=system, user=USER_PROMPT)
+    @rate_limited("openai", MODEL_PARAMS)
+    def classify(question):
+        client = get_client("openai")
+        response = client.chat.completions.create(
+            **MODEL_PARAMS,
+            prompt_cache_key=cache_key,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": USER_PROMPT.format(message=question)}
+            ]
+        )
+        reply = response.choices[0].message.content.strip()
+        label = canonical_category(reply, categories)
+        if label is None:
+            raise ValueError(f"reply {reply[:80]!r} is not one of the categories")
+        return label
+
+    return classify
+
+
+def categorize(data, categories, max_in_flight=None, local_model=None, threshold=DEFAULT_THRESHOLD):
+    """Set ``entry["category"]`` on every entry of ``data``.
+
+    With a ``local_model`` (see ``utils.local_categorizer``), questions it
+    labels with a probability of at least ``threshold`` are not sent to
+    GPT-4o. Returns the number of entries that could not be classified;
+    those are left without a category.
+    """
+    classify = make_classifier(categories)
+    questions = list(dict.fromkeys(entry["question"] for entry in data))
+    labels = {}
+    if local_model is not None:
+        predicted, confidence = predict(local_model, questions)
+        for question, label, probability in zip(questions, predicted, confidence):
+            if probability >= threshold and label in categories:
+                labels[question] = label
+        print(f"{len(labels)} of {len(questions)} questions labelled locally, "
+              f"{len(questions) - len(labels)} sent to {MODEL_PARAMS['model']}")
+    prompts = ({"prompt": question} for question in questions if question not in labels)
+    records = evaluate_prompts(prompts, classify, lambda prompt_data, label: (prompt_data["prompt"], label),
+                               provider="openai", max_in_flight=max_in_flight, desc="Classifying",
+                               total=len(questions) - len(labels))
+    labels.update(records)
+    failed = 0
+    for entry in data:
+        if entry["question"] in labels:
+            entry["category"] = labels[entry["question"]]
+        else:
+            failed += 1
+    return failed
@@ -0,0 +1,79 @@
+"""Checkpoint index of the prompts a run has already finished.
+
+Each result file gets a ``<name>.ckpt`` next to its JSONL log holding one key
+per finished prompt. A key is a hash of the dataset id (the dataset file
+name), the variant's label and metadata, and the prompt text, so the same
+question asked in two variants, or through two datasets writing to one
+output file, is tracked separately. The keys are loaded into a set when a
+run starts, which lets ``evaluate_prompts`` drop finished prompts in
+constant time before anything is scheduled.
+
+What this adds over ``prompt in writer`` (``ResultWriter``'s set of
+written prompts): the writer only knows the one record field it dedupes on,
+the prompt text by default, and nothing at all with ``dedupe_key=None``, as
+in misc/remove_information_ablation.py, whose records have no prompt field
+and may repeat a question. The key here also covers the dataset id, label
+and metadata, and ``utils.batch.run_batch`` can use it with no writer
+open. It does not save reading the log: a deduping writer loads it anyway.
+
+Keys are appended only after the record is in the result log, so the index
+never claims more than is stored. Runs from before the index existed are
+picked up through the result log: a prompt found there is added to the
+index the first time it is seen.
+"""
+import hashlib
+import json
+import os
+
+
+def checkpoint_path_for(output_dir, filename):
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(output_dir, f"{stem}.ckpt")
+
+
+def checkpoint_key(dataset_id, prompt_data):
+    payload = json.dumps(
+        [dataset_id, prompt_data.get("label"), prompt_data.get("metadata"), prompt_data["prompt"]],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, output_dir, filename, dataset_id):
+        os.makedirs(output_dir or ".", exist_ok=True)
+        self.path = checkpoint_path_for(output_dir, filename)
+        self.dataset_id = os.path.basename(dataset_id)
+        self.done = set()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                # A torn last line is just a key that will be redone.
+                self.done.update(line.strip() for line in f if len(line.strip()) == 40)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def key(self, prompt_data):
+        return checkpoint_key(self.dataset_id, prompt_data)
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def mark(self, key):
+        if key in self.done:
+            return
+        self.done.add(key)
+        self._file.write(key + "\n")
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,146 @@
+"""One pooled API client per provider per process.
+
+The query_* functions used to build a new client (and re-read the API key)
+on every call, which threw away keep-alive connections and TLS sessions.
+``get_client`` builds each provider's client once, on top of an httpx
+connection pool sized for the number of requests kept in flight
+(``utils.concurrency``). HTTP/2 is used when the ``h2`` package is installed.
+
+Pool size can be overridden with CLIENT_POOL_SIZE in the environment. The
+SDKs' own retry loops are turned off; ``utils.rate_limit`` retries instead,
+so throttling is seen by its concurrency controller.
+"""
+import importlib.util
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from utils.concurrency import max_in_flight_for
+
+load_dotenv()
+
+# The Anthropic Messages API requires max_tokens. Runners whose original
+# call set none use this one value, so their requests, batch files and
+# response-cache keys agree.
+ANTHROPIC_MAX_TOKENS = 1024
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def http2_available():
+    return importlib.util.find_spec("h2") is not None
+
+
+def pool_size_for(provider):
+    default = max(max_in_flight_for(provider) * 2, 10)
+    return int(os.getenv("CLIENT_POOL_SIZE", default))
+
+
+def _limits(provider):
+    # The OpenAI and Anthropic SDKs are built on httpx, as is the Ollama client.
+    import httpx
+
+    size = pool_size_for(provider)
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size)
+
+
+def _sdk_http_client(sdk, provider):
+    return sdk.DefaultHttpxClient(limits=_limits(provider), http2=http2_available())
+
+
+def _make_openai():
+    import openai
+
+    return openai.OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"), http_client=_sdk_http_client(openai, "openai"), max_retries=0
+    )
+
+
+def _make_anthropic():
+    import anthropic
+
+    return anthropic.Anthropic(
+        api_key=os.getenv("ANTHROPIC_API_KEY"), http_client=_sdk_http_client(anthropic, "anthropic"),
+        max_retries=0,
+    )
+
+
+def _make_gemini():
+    # google.generativeai manages its own gRPC channel; configure it once and
+    # hand out the module so callers can build GenerativeModel objects.
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai
+
+
+def _make_ollama():
+    import ollama
+
+    # The Ollama server speaks plain HTTP/1.1, so only the pool size applies.
+    return ollama.Client(host=os.getenv("OLLAMA_HOST"), limits=_limits("ollama"))
+
+
+# Providers are resolved by name; nothing below imports an SDK until the
+# first get_client call for that provider.
+FACTORIES = {
+    "openai": _make_openai,
+    "anthropic": _make_anthropic,
+    "gemini": _make_gemini,
+    "ollama": _make_ollama,
+}
+
+# Modules each factory pulls in, which the runners must not import eagerly
+# (checked by ``python -m utils.import_budget``).
+SDK_MODULES = {
+    "openai": ["openai"],
+    "anthropic": ["anthropic"],
+    "gemini": ["google.generativeai"],
+    "ollama": ["ollama"],
+}
+
+
+def register_provider(name, factory, modules=()):
+    """Add a provider whose client ``factory()`` builds on first use."""
+    with _lock:
+        FACTORIES[name] = factory
+        SDK_MODULES[name] = list(modules)
+
+
+def get_client(provider):
+    """Return the shared client for ``provider``, creating it on first use.
+
+    Clients are keyed by process id as well, so a worker forked by
+    multiprocessing builds its own pool instead of sharing sockets with its
+    parent.
+    """
+    key = (provider, os.getpid())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            if provider not in FACTORIES:
+                raise ValueError(f"Unknown provider '{provider}', expected one of {sorted(FACTORIES)}")
+            _clients[key] = FACTORIES[provider]()
+        return _clients[key]
+
+
+def get_gemini_model(model_name):
+    key = (f"gemini:{model_name}", os.getpid())
+    model = _clients.get(key)
+    if model is not None:
+        return model
+    genai = get_client("gemini")
+    with _lock:
+        if key not in _clients:
+            _clients[key] = genai.GenerativeModel(model_name)
+        return _clients[key]
+
+
+def reset_clients():
+    """Drop every cached client, e.g. after pointing *_BASE_URL elsewhere."""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,23 @@
+"""Default number of requests kept in flight per provider.
+
+Read by the async engine (worker pool size), the rate limiter (concurrency
+ceiling) and the client factory (connection pool size). It lives apart from
+all three so none of them has to import another just for these numbers.
+"""
+import os
+
+# Override with e.g. OPENAI_MAX_IN_FLIGHT=32 in the environment or .env file.
+MAX_IN_FLIGHT = {
+    "openai": 16,
+    "anthropic": 8,
+    "gemini": 8,
+    "ollama": 1,
+}
+
+
+def max_in_flight_for(provider):
+    default = MAX_IN_FLIGHT.get(provider, 4)
+    if provider == "ollama":
+        # Fill the server's parallel slots when it is configured with more.
+        default = int(os.getenv("OLLAMA_NUM_PARALLEL", default))
+    return int(os.getenv(f"{provider.upper()}_MAX_IN_FLIGHT", default))
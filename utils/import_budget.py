@@ -0,0 +1,109 @@
+"""Check that the entry points start quickly and leave the provider SDKs alone.
+
+The provider SDKs (openai, anthropic, google.generativeai, ollama) take most
+of a cold start to import, and the runners only need the ones whose models
+actually get scheduled. This imports every entry point and runner module in
+a fresh interpreter with ``-X importtime`` and fails when one of them pulls
+in an SDK at import time or takes longer than the budget.
+
+    python -m utils.import_budget [--budget-ms 300] [--top 5]
+
+The budget can also be set with IMPORT_BUDGET_MS.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from utils.clients import SDK_MODULES
+from utils.scheduler import RUNNERS
+
+ENTRY_POINTS = [
+    "run_medqa_8var",
+    "run_medqa_ablation",
+    "run_medbullet_8var",
+    "run_medbullet_ablation",
+    "utils.scheduler",
+]
+
+DEFAULT_BUDGET_MS = 300
+
+
+def runner_modules():
+    return sorted({module for runners in RUNNERS.values() for module in runners.values()})
+
+
+def measure(module):
+    """Import ``module`` in a new interpreter.
+
+    Returns the cumulative import time in milliseconds and
+    ``{module name: self time in ms}`` for everything it imported.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.getenv("PYTHONPATH")]))}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    total = 0.0
+    imported = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported[name] = int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return total, imported
+
+
+def sdk_imports(imported):
+    found = []
+    for provider, modules in SDK_MODULES.items():
+        for sdk in modules:
+            if any(name == sdk or name.startswith(sdk + ".") for name in imported):
+                found.append(f"{sdk} ({provider})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time of the run_*.py entry points and runners.")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--top", type=int, default=3, help="slowest imported modules to list per entry point")
+    parser.add_argument("modules", nargs="*", help="modules to check (default: entry points and all runners)")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules or ENTRY_POINTS + runner_modules():
+        try:
+            total, imported = measure(module)
+        except RuntimeError as e:
+            print(e)
+            failures += 1
+            continue
+        problems = []
+        if total > args.budget_ms:
+            problems.append(f"over the {args.budget_ms:.0f} ms budget")
+        sdks = sdk_imports(imported)
+        if sdks:
+            problems.append("imports " + ", ".join(sdks))
+        status = "FAIL" if problems else "ok"
+        print(f"{status:<4} {module:<32} {total:7.1f} ms" + (f"  {'; '.join(problems)}" if problems else ""))
+        if problems:
+            failures += 1
+            slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            for name, ms in slowest:
+                print(f"       {name:<40} {ms:7.1f} ms")
+
+    if failures:
+        print(f"{failures} module(s) failed the import check")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Concurrent, resumable LLM-judge re-scoring of a result file.
+
+The evaluate/ scripts used to judge a file's entries one request at a time
+and only ran files in parallel. ``judge_file`` sends the judge requests of
+one file through the async engine, so up to the provider's in-flight limit
+(OPENAI_MAX_IN_FLIGHT etc.) are outstanding at once, and appends every
+verdict to ``<name>.verdicts.jsonl`` as it arrives. A rerun after an
+interruption skips the entries whose verdict is already in that log.
+
+Verdicts are keyed by a hash of the judge version (model, parameters and
+system prompt, see ``judge_version``) and the judge prompt, which holds the
+entry's response, correct answer and answer index. Entries whose key is
+already in the log are not sent again, so a repeated pass only pays for
+new or modified entries, or for all of them once the judge itself changes.
+An optional ``prefilter`` (see ``utils.prefilter``) settles unambiguous
+entries locally first, so only the rest cost a request. How many entries
+each tier settled is printed after each file.
+
+Once every entry has a verdict the file is rewritten in one streaming pass
+with the verdicts applied. Failed requests are reported and left out of the
+log; if any failed, ``judge_file`` raises ValueError and leaves the file as
+it was, so a transient API error is not saved as a wrong answer and the
+next run asks again for just those entries.
+"""
+import hashlib
+import json
+import os
+
+from utils.async_engine import evaluate_prompts
+from utils.result_store import (ResultWriter, iter_json_array, iter_records, jsonl_path_for, segment_paths,
+                                write_json_array)
+
+
+def verdict_log_name(json_path):
+    stem = os.path.splitext(os.path.basename(json_path))[0]
+    return f"{stem}.verdicts.json"
+
+
+def judge_version(model_params, system_prompt):
+    """Short hash of everything besides the entry that decides a verdict."""
+    payload = json.dumps([model_params, system_prompt], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def verdict_key(version, message):
+    payload = json.dumps([version, message], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def judge_file(json_path, request_verdict, build_message, apply_verdict, should_judge=None,
+               provider="openai", max_in_flight=None, ensure_ascii=True, version="", prefilter=None):
+    """Judge the entries of ``json_path`` and write the verdicts back into it.
+
+    ``build_message(entry)`` is the judge prompt of an entry,
+    ``request_verdict(message)`` asks the judge and returns its verdict, and
+    ``apply_verdict(entry, verdict)`` updates the entry and returns True
+    when it counts as a correction. Entries for which ``should_judge``
+    returns False are written back unchanged. Pass the ``judge_version`` of
+    the judge so a changed judge does not reuse old verdicts.
+    ``prefilter(entry)`` may return a verdict to use instead of asking the
+    judge, or None to ask. Returns the number of corrections; raises
+    ValueError, without touching the file, when a judge request failed.
+    """
+    output_dir = os.path.dirname(json_path)
+    name = os.path.basename(json_path)
+    should_judge = should_judge or (lambda entry: True)
+    writer = ResultWriter(output_dir, verdict_log_name(json_path), dedupe_key="key")
+    local = 0
+    reused = 0
+    requested = 0
+    sent = set()
+
+    def prompts():
+        nonlocal local, reused, requested
+        # Entries repeated within the file are sent once.
+        pending = set()
+        for entry in iter_json_array(json_path):
+            if not should_judge(entry):
+                continue
+            if prefilter is not None and prefilter(entry) is not None:
+                local += 1
+                continue
+            message = build_message(entry)
+            key = verdict_key(version, message)
+            if key in writer or key in pending:
+                reused += 1
+                continue
+            pending.add(key)
+            sent.add(key)
+            requested += 1
+            yield {"prompt": message, "key": key}
+
+    def build_record(prompt_data, verdict):
+        return {"key": prompt_data["key"], "verdict": verdict}
+
+    try:
+        evaluate_prompts(prompts(), request_verdict, build_record, writer, provider=provider,
+                         max_in_flight=max_in_flight, desc=f"Judging {name}")
+    finally:
+        writer.close(export=False)
+    judged = local + reused + requested
+    if judged:
+        print(f"Verdicts for {name}: {local} settled by rules, {reused} reused, {requested} requested "
+              f"({(local + reused) / judged:.1%} of {judged} without an API call)")
+
+    verdicts = {record["key"]: record["verdict"] for record in iter_records(writer.path) if "key" in record}
+    missing = len(sent - verdicts.keys())
+    if missing:
+        raise ValueError(f"{missing} judge requests failed; {name} is left unchanged, rerun to retry them")
+    corrected = 0
+
+    def judged_entries():
+        nonlocal corrected
+        for entry in iter_json_array(json_path):
+            if should_judge(entry):
+                verdict = prefilter(entry) if prefilter is not None else None
+                if verdict is None:
+                    verdict = verdicts.get(verdict_key(version, build_message(entry)))
+                corrected += bool(apply_verdict(entry, verdict))
+            yield entry
+
+    write_json_array(judged_entries(), json_path, ensure_ascii=ensure_ascii)
+    return corrected
+
+
+def logged_verdicts(json_path, build_message, version=""):
+    """Yield ``(entry, verdict)`` for the entries of ``json_path`` the judge has a logged verdict for."""
+    log = jsonl_path_for(os.path.dirname(json_path), verdict_log_name(json_path))
+    if not segment_paths(log):
+        return
+    verdicts = {record["key"]: record["verdict"] for record in iter_records(log) if "key" in record}
+    for entry in iter_json_array(json_path):
+        verdict = verdicts.get(verdict_key(version, build_message(entry)))
+        if verdict is not None:
+            yield entry, verdict
+
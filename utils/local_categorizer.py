@@ -0,0 +1,131 @@
+"""CPU-only category classifier trained on GPT-4o labelled questions.
+
+A TF-IDF (word 1-2 grams) + logistic regression model is fitted on the
+datasets ``utils.categorizer`` has already labelled. It labels thousands of
+questions in milliseconds; ``utils.categorizer.categorize`` keeps its label
+when the predicted probability reaches the threshold and sends only the
+other questions to GPT-4o.
+
+``benchmark`` cross-validates the model against the existing labels and
+reports, per threshold, the share of questions labelled locally and how
+often those labels agree with GPT-4o, which is what the threshold should be
+picked from.
+
+    python -m utils.local_categorizer benchmark medqa_labelled.json [more.json ...]
+    python -m utils.local_categorizer train medqa_labelled.json --out medqa_categorizer.joblib
+"""
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import cohen_kappa_score
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+from sklearn.pipeline import make_pipeline
+
+DEFAULT_THRESHOLD = 0.8
+THRESHOLDS = [0.0, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95]
+
+
+def labelled_questions(paths):
+    """(questions, labels) of every entry with a category, first label wins."""
+    labels = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                if entry.get("question") and entry.get("category"):
+                    labels.setdefault(entry["question"], entry["category"])
+    return list(labels), list(labels.values())
+
+
+def new_model():
+    return make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, strip_accents="unicode"),
+        LogisticRegression(max_iter=1000, C=10.0, class_weight="balanced"),
+    )
+
+
+def train(questions, labels):
+    model = new_model()
+    model.fit(questions, labels)
+    return model
+
+
+def predict(model, questions):
+    """(labels, probability of each label) for ``questions``."""
+    if not questions:
+        return [], np.zeros(0)
+    probabilities = model.predict_proba(questions)
+    best = probabilities.argmax(axis=1)
+    return list(model.classes_[best]), probabilities[np.arange(len(questions)), best]
+
+
+def save(model, path):
+    joblib.dump(model, path)
+
+
+def load(path):
+    return joblib.load(path)
+
+
+def benchmark(questions, labels, thresholds=THRESHOLDS, folds=5):
+    """Cross-validated agreement with the existing labels, one row per threshold."""
+    smallest = min(np.unique(labels, return_counts=True)[1])
+    folds = max(2, min(folds, smallest))
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=0)
+    probabilities = cross_val_predict(new_model(), questions, labels, cv=splitter, method="predict_proba")
+    classes = np.unique(labels)
+    predicted = classes[probabilities.argmax(axis=1)]
+    confidence = probabilities.max(axis=1)
+    labels = np.asarray(labels)
+
+    rows = []
+    for threshold in thresholds:
+        local = confidence >= threshold
+        agree = predicted[local] == labels[local]
+        rows.append({
+            "threshold": threshold,
+            "local": int(local.sum()),
+            "coverage": float(local.mean() * 100),
+            "agreement": float(agree.mean() * 100) if local.any() else float("nan"),
+            "kappa": float(cohen_kappa_score(labels[local], predicted[local])) if local.sum() > 1 else float("nan"),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or benchmark the local question categorizer.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_parser = sub.add_parser("train", help="fit the model on labelled datasets")
+    train_parser.add_argument("files", nargs="+", help="datasets whose entries have a category")
+    train_parser.add_argument("--out", required=True, help="model file to write (.joblib)")
+    bench_parser = sub.add_parser("benchmark", help="cross-validated agreement with the existing labels")
+    bench_parser.add_argument("files", nargs="+", help="datasets whose entries have a category")
+    bench_parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    questions, labels = labelled_questions(args.files)
+    print(f"{len(questions)} labelled questions in {len(set(labels))} categories")
+    if args.command == "train":
+        start = time.perf_counter()
+        save(train(questions, labels), args.out)
+        print(f"Model saved to {args.out} ({time.perf_counter() - start:.1f}s)")
+        return
+
+    rows = benchmark(questions, labels, folds=args.folds)
+    print(f"{'Threshold':>9} {'Local':>6} {'Coverage %':>10} {'Agreement %':>11} {'Kappa':>6}")
+    for row in rows:
+        print(f"{row['threshold']:>9.2f} {row['local']:>6} {row['coverage']:>10.1f} "
+              f"{row['agreement']:>11.1f} {row['kappa']:>6.3f}")
+    model = train(questions, labels)
+    start = time.perf_counter()
+    predict(model, questions)
+    elapsed = time.perf_counter() - start
+    print(f"Labelling {len(questions)} questions locally took {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
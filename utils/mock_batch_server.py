@@ -0,0 +1,324 @@
+"""Local stand-in for the OpenAI and Anthropic batch endpoints.
+
+Implements just enough of both APIs for ``utils.batch`` to run end to end
+without network access or API keys: file upload/download and batch
+create/retrieve/list for OpenAI, and batch create/retrieve/list/results for
+Anthropic.
+Batches finish as soon as they are submitted. Answers come from ``respond``,
+which receives the request body (model, messages, ...) and returns the reply
+text; an exception raised there turns into a failed request.
+
+    with MockBatchServer() as server:
+        os.environ.update(server.env())
+        ...
+
+or run ``python -m utils.mock_batch_server --port 8765`` and export the
+printed variables.
+"""
+import argparse
+import email.parser
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_respond(body):
+    return "Answer: (A) mock answer\n\nExplanation: mock response"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockBatch/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def _send(self, payload, status=200, content_type="application/json"):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self):
+        self._send({"error": {"type": "not_found_error", "message": self.path}}, status=404)
+
+    def do_POST(self):
+        self.mock.calls.append(("POST", self.path))
+        path = self.path.split("?", 1)[0]
+        body = self._read_body()
+        if path == "/v1/files":
+            return self._send(self.mock.upload_file(self.headers.get("Content-Type"), body))
+        if path == "/v1/batches":
+            return self._send(self.mock.create_openai_batch(json.loads(body)))
+        if path == "/v1/messages/batches":
+            return self._send(self.mock.create_anthropic_batch(json.loads(body)))
+        self._not_found()
+
+    def do_GET(self):
+        self.mock.calls.append(("GET", self.path))
+        path = self.path.split("?", 1)[0]
+        parts = path.strip("/").split("/")
+        if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+            content = self.mock.files.get(parts[2])
+            if content is None:
+                return self._not_found()
+            return self._send(content, content_type="application/octet-stream")
+        if parts == ["v1", "batches"]:
+            return self._send(self.mock.list_openai_batches())
+        if parts == ["v1", "messages", "batches"]:
+            return self._send(self.mock.list_anthropic_batches())
+        if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+            batch = self.mock.openai_batches.get(parts[2])
+            return self._send(batch) if batch else self._not_found()
+        if parts[:3] == ["v1", "messages", "batches"] and len(parts) in (4, 5):
+            batch = self.mock.anthropic_batches.get(parts[3])
+            if batch is None:
+                return self._not_found()
+            if len(parts) == 4:
+                return self._send(batch["object"])
+            if parts[4] == "results":
+                return self._send(batch["results"], content_type="application/binary")
+        self._not_found()
+
+
+class MockBatchServer:
+    def __init__(self, respond=default_respond, host="127.0.0.1", port=0):
+        self.respond = respond
+        self.host = host
+        self.port = port
+        self.files = {}
+        self.openai_batches = {}
+        self.anthropic_batches = {}
+        self.requests = []
+        # Every HTTP request received, as (method, path).
+        self.calls = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def env(self):
+        """Environment variables that point the SDK clients at this server."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "mock",
+            "ANTHROPIC_BASE_URL": self.url,
+            "ANTHROPIC_API_KEY": "mock",
+        }
+
+    def _next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}{next(self._ids):06d}"
+
+    def _answer(self, body):
+        self.requests.append(body)
+        return self.respond(body)
+
+    def upload_file(self, content_type, body):
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body
+        )
+        content, filename, purpose = b"", "upload.jsonl", "batch"
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                content = part.get_payload(decode=True)
+                filename = part.get_filename() or filename
+            elif name == "purpose":
+                purpose = part.get_payload(decode=True).decode("utf-8")
+        file_id = self._store_file(content)
+        return self._file_object(file_id, filename, purpose, len(content))
+
+    def _store_file(self, content):
+        file_id = self._next_id("file-mock")
+        self.files[file_id] = content
+        return file_id
+
+    def _file_object(self, file_id, filename, purpose, size):
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": size,
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def create_openai_batch(self, params):
+        batch_id = self._next_id("batch_mock")
+        outputs, errors = [], []
+        lines = self.files[params["input_file_id"]].decode("utf-8").splitlines()
+        for line in filter(None, (line.strip() for line in lines)):
+            request = json.loads(line)
+            try:
+                text = self._answer(request["body"])
+            except Exception as e:
+                errors.append({
+                    "id": self._next_id("batch_req_mock"),
+                    "custom_id": request["custom_id"],
+                    "response": None,
+                    "error": {"code": "mock_error", "message": str(e)},
+                })
+                continue
+            outputs.append({
+                "id": self._next_id("batch_req_mock"),
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": self._next_id("req_mock"),
+                    "body": {
+                        "id": self._next_id("chatcmpl-mock"),
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request["body"].get("model"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }],
+                    },
+                },
+                "error": None,
+            })
+
+        def to_file(items):
+            if not items:
+                return None
+            return self._store_file("".join(json.dumps(item) + "\n" for item in items).encode("utf-8"))
+
+        now = int(time.time())
+        self.openai_batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"],
+            "completion_window": params["completion_window"],
+            "status": "completed",
+            "output_file_id": to_file(outputs),
+            "error_file_id": to_file(errors),
+            "created_at": now,
+            "completed_at": now,
+            "request_counts": {
+                "total": len(outputs) + len(errors),
+                "completed": len(outputs),
+                "failed": len(errors),
+            },
+        }
+        return {**self.openai_batches[batch_id], "status": "validating",
+                "output_file_id": None, "error_file_id": None}
+
+    def create_anthropic_batch(self, params):
+        batch_id = self._next_id("msgbatch_mock")
+        results = []
+        succeeded = errored = 0
+        for request in params["requests"]:
+            try:
+                text = self._answer(request["params"])
+            except Exception as e:
+                errored += 1
+                results.append({"custom_id": request["custom_id"], "result": {
+                    "type": "errored",
+                    "error": {"type": "error", "error": {"type": "api_error", "message": str(e)}},
+                }})
+                continue
+            succeeded += 1
+            results.append({"custom_id": request["custom_id"], "result": {
+                "type": "succeeded",
+                "message": {
+                    "id": self._next_id("msg_mock"),
+                    "type": "message",
+                    "role": "assistant",
+                    "model": request["params"].get("model"),
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": 0, "output_tokens": 0},
+                },
+            }})
+
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        batch = {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended",
+            "request_counts": {
+                "processing": 0,
+                "succeeded": succeeded,
+                "errored": errored,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": now,
+            "ended_at": now,
+            "expires_at": now,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results",
+        }
+        self.anthropic_batches[batch_id] = {
+            "object": batch,
+            "results": "".join(json.dumps(item) + "\n" for item in results).encode("utf-8"),
+        }
+        return {**batch, "processing_status": "in_progress", "ended_at": None, "results_url": None}
+
+    def list_openai_batches(self):
+        # Newest first, as the API lists them; everything fits on one page.
+        data = list(reversed(self.openai_batches.values()))
+        return {"object": "list", "data": data, "has_more": False,
+                "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None}
+
+    def list_anthropic_batches(self):
+        data = [batch["object"] for batch in reversed(self.anthropic_batches.values())]
+        return {"data": data, "has_more": False,
+                "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None}
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.mock = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve mock OpenAI/Anthropic batch endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = MockBatchServer(host=args.host, port=args.port).start()
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,233 @@
+"""Local stand-in for an Ollama server, for exercising the Ollama runners.
+
+Serves non-streaming ``/api/chat`` and ``/api/generate`` and models what the
+throughput settings in ``utils.ollama_backend`` are for:
+
+  * ``num_parallel`` slots; further requests queue, as on a real server;
+  * model loading: a request for a model that is not resident waits
+    ``load_time`` and counts in ``loads``; a model stays resident for the
+    request's ``keep_alive`` (default 5m, the server default);
+  * prefix reuse: each request takes the free slot whose last prompt shares
+    the longest prefix with it and the shared characters are counted in
+    ``reused_chars`` (out of ``prompt_chars``).
+
+Answers come from ``respond``, which receives the request body.
+
+    with MockOllamaServer(num_parallel=4, latency=0.05) as server:
+        os.environ.update(server.env())
+        ...
+
+or run ``python -m utils.mock_ollama_server --port 11435 --num-parallel 4``
+and export the printed variables.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_KEEP_ALIVE = 300
+
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def default_respond(body):
+    return "Answer: (A) mock answer\n\nExplanation: mock response"
+
+
+def parse_keep_alive(value):
+    """Seconds a model stays loaded; None means forever."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        value = value.strip()
+        for unit in sorted(_UNITS, key=len, reverse=True):
+            if value.endswith(unit):
+                seconds = float(value[: -len(unit)]) * _UNITS[unit]
+                break
+        else:
+            seconds = float(value)
+    return None if seconds < 0 else seconds
+
+
+def common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockOllama/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if path not in ("/api/chat", "/api/generate"):
+            return self._send({"error": f"unknown endpoint {path}"}, status=404)
+        try:
+            self._send(self.server.mock.handle(path, body))
+        except Exception as e:
+            self._send({"error": str(e)}, status=500)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/api/ps":
+            return self._send({"models": [{"name": model} for model in self.server.mock.resident()]})
+        self._send({"error": "not found"}, status=404)
+
+
+class MockOllamaServer:
+    def __init__(self, respond=default_respond, num_parallel=1, latency=0.0, load_time=0.0,
+                 host="127.0.0.1", port=0):
+        self.respond = respond
+        self.num_parallel = num_parallel
+        self.latency = latency
+        self.load_time = load_time
+        self.host = host
+        self.port = port
+        self.requests = []
+        self.loads = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.prompt_chars = 0
+        self.reused_chars = 0
+        self._slots = [{"model": None, "context": ""} for _ in range(num_parallel)]
+        self._free = set(range(num_parallel))
+        self._expires = {}
+        self._condition = threading.Condition()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def env(self):
+        """Environment variables that point the runners at this server."""
+        return {"OLLAMA_HOST": self.url, "OLLAMA_NUM_PARALLEL": str(self.num_parallel)}
+
+    def resident(self):
+        now = time.monotonic()
+        with self._condition:
+            return [model for model, expires in self._expires.items() if expires is None or expires > now]
+
+    def _acquire(self, model, prompt):
+        with self._condition:
+            while not self._free:
+                self._condition.wait()
+            slot = max(sorted(self._free), key=lambda i: (
+                common_prefix(self._slots[i]["context"], prompt) if self._slots[i]["model"] == model else -1
+            ))
+            self._free.discard(slot)
+            state = self._slots[slot]
+            reused = common_prefix(state["context"], prompt) if state["model"] == model else 0
+            state["model"], state["context"] = model, prompt
+
+            expires = self._expires.get(model, 0)
+            needs_load = model not in self._expires or (expires is not None and expires <= time.monotonic())
+            if needs_load:
+                self.loads += 1
+                # Resident while loading, so concurrent requests wait for one load.
+                self._expires[model] = None
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.prompt_chars += len(prompt)
+            self.reused_chars += reused
+            self.requests.append({"model": model, "prompt": prompt, "slot": slot, "reused": reused})
+        return slot, needs_load
+
+    def _release(self, slot, model, keep_alive):
+        with self._condition:
+            self.in_flight -= 1
+            self._free.add(slot)
+            seconds = parse_keep_alive(keep_alive)
+            self._expires[model] = None if seconds is None else time.monotonic() + seconds
+            self._condition.notify()
+
+    def handle(self, path, body):
+        model = body.get("model", "")
+        if path == "/api/chat":
+            prompt = "\n".join(message.get("content", "") for message in body.get("messages") or [])
+        else:
+            prompt = body.get("prompt") or ""
+        load_only = path == "/api/generate" and not prompt
+
+        slot, needs_load = self._acquire(model, prompt)
+        try:
+            if needs_load and self.load_time:
+                time.sleep(self.load_time)
+            text = ""
+            if not load_only:
+                if self.latency:
+                    time.sleep(self.latency)
+                text = self.respond(body)
+        finally:
+            self._release(slot, model, body.get("keep_alive"))
+
+        reply = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "load" if load_only else "stop",
+        }
+        if path == "/api/chat":
+            reply["message"] = {"role": "assistant", "content": text}
+        else:
+            reply["response"] = text
+        return reply
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.mock = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock Ollama API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--num-parallel", type=int, default=int(os.getenv("OLLAMA_NUM_PARALLEL", 4)))
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--load-time", type=float, default=0.0, help="seconds to load a model")
+    args = parser.parse_args()
+
+    server = MockOllamaServer(num_parallel=args.num_parallel, latency=args.latency,
+                              load_time=args.load_time, host=args.host, port=args.port).start()
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,68 @@
+"""Throughput settings for the Ollama runners.
+
+Two things keep a local model busy instead of idle between prompts:
+
+  * every request passes ``keep_alive`` (default 30m), so the server keeps
+    the model loaded between calls and across runners using the same model,
+    and ``warm_up`` loads it before the first prompt goes out;
+  * the async engine keeps as many requests in flight as the server has
+    parallel slots (OLLAMA_NUM_PARALLEL, which the server reads as well),
+    so the GPU is not waiting on Python between requests.
+
+The server already sends each request to the slot whose cached context
+shares the longest prefix with it. A question's variants differ in the
+instruction that comes before the question and choices, so only that
+opening text can be reused; ``utils.mock_ollama_server`` reports how much.
+
+Settings (environment or .env file):
+  OLLAMA_HOST            server address (default http://localhost:11434)
+  OLLAMA_KEEP_ALIVE      how long the model stays loaded, e.g. 30m, 1h, -1
+  OLLAMA_NUM_PARALLEL    requests in flight (match the server's setting)
+"""
+import os
+import threading
+
+from utils.clients import get_client
+
+DEFAULT_KEEP_ALIVE = "30m"
+
+_warm = set()
+_warm_lock = threading.Lock()
+
+
+def keep_alive():
+    value = os.getenv("OLLAMA_KEEP_ALIVE", DEFAULT_KEEP_ALIVE)
+    # The server takes a duration string or a number of seconds (-1 = forever).
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def ollama_chat(model, messages, **params):
+    """Send a chat request and return the reply text."""
+    response = get_client("ollama").chat(model=model, messages=messages, keep_alive=keep_alive(), **params)
+    return response.message.content
+
+
+def ollama_generate(model, prompt, **params):
+    """Send a completion request and return the generated text."""
+    response = get_client("ollama").generate(
+        model=model, prompt=prompt, stream=False, keep_alive=keep_alive(), **params
+    )
+    return response.response
+
+
+def warm_up(model):
+    """Load ``model`` on the server once per process before the run starts."""
+    with _warm_lock:
+        if model in _warm:
+            return
+        _warm.add(model)
+    try:
+        # An empty prompt only loads the model.
+        get_client("ollama").generate(model=model, prompt="", keep_alive=keep_alive())
+    except Exception as e:
+        with _warm_lock:
+            _warm.discard(model)
+        print(f"Could not preload {model} on the Ollama server: {e}")
@@ -0,0 +1,68 @@
+"""Rule-based first tier of the LLM judge.
+
+The judge outputs 'true' only if both the answer and the explanation are
+correct, so a rule can never grant 'true': whether the explanation holds up
+(e.g. the Bromocriptine example of the judge prompt, which picks the right
+option and then rules it out) is left to the judge. What a rule can settle
+is a response that commits to a wrong option, since the judge rejects those
+whatever the explanation says. ``rule_verdict`` returns "false" for those
+and None, meaning "ask the judge", for everything else:
+
+  * only an exact "Answer: (X)" with X in A-E counts as a stated answer;
+    bold, lowercase or unbracketed variants go to the judge;
+  * a response stating more than one different letter goes to the judge;
+  * without the correct letter, or when the stated letter and option text
+    disagree about whether the correct option was picked, the judge decides.
+
+``agreement`` compares the rules with verdicts the judge already gave; run
+it through ``python -m evaluate.prefilter_agreement`` before relying on the
+prefilter for a new kind of result file.
+"""
+import re
+
+_STATED = re.compile(r"Answer: \(([A-E])\)[ \t]*([^\n]*)")
+
+
+def normalize(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text).lower()).split())
+
+
+def stated_answers(response):
+    """(letter, option text) of every exact "Answer: (X)" in the response."""
+    return [(m.group(1), m.group(2)) for m in _STATED.finditer(response)]
+
+
+def rule_verdict(response, correct_answer, answer_idx=""):
+    """'false' for a response committing to a wrong option, else None."""
+    if not isinstance(response, str):
+        return None
+    correct = normalize(correct_answer)
+    correct_letter = str(answer_idx or "").strip().upper()
+    answers = stated_answers(response)
+    if not correct or not correct_letter or len({letter for letter, _ in answers}) != 1:
+        return None
+    letter, text = answers[0]
+    text = normalize(text)
+    if letter == correct_letter:
+        return None
+    if text and (text == correct or correct in text or text in correct):
+        # The letter says wrong, the text says right.
+        return None
+    return "false"
+
+
+def agreement(pairs):
+    """Compare rule verdicts with the judge's on ``(rule, judge)`` pairs.
+
+    Returns counts of entries the rules settled, how many of those the
+    judge agreed with, and the settled entries the judge called 'true'.
+    """
+    settled = agreed = judge_true = total = 0
+    for rule, judge in pairs:
+        total += 1
+        if rule is None:
+            continue
+        settled += 1
+        agreed += rule == judge
+        judge_true += judge == "true"
+    return {"total": total, "settled": settled, "agreed": agreed, "judge_true": judge_true}
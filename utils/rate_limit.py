@@ -0,0 +1,276 @@
+"""Client-side rate limiting and retries shared by every query_* function.
+
+Each provider gets one ``ProviderLimiter`` per process holding
+  * a requests-per-minute and a tokens-per-minute token bucket,
+  * an AIMD concurrency controller that halves the number of requests
+    allowed in flight when the provider throttles us and adds one back after
+    a run of successful calls.
+
+``rate_limited(provider, MODEL_PARAMS)`` wraps a query function so that
+every call waits for its budget (the prompt plus the completion cap in
+MODEL_PARAMS), and 429s, overloads, 5xx and dropped connections are retried
+with jittered exponential backoff (or after the server's Retry-After, capped
+at MAX_DELAY) instead of being printed and skipped.
+
+Budgets can be overridden per provider in the environment or .env file, e.g.
+OPENAI_RPM=5000 OPENAI_TPM=800000. Set a budget to 0 to disable it.
+"""
+import email.utils
+import functools
+import os
+import random
+import threading
+import time
+
+from utils.concurrency import max_in_flight_for
+
+# Default requests/min and tokens/min budgets (entry-tier account limits).
+# None means unlimited.
+RATE_LIMITS = {
+    "openai": {"rpm": 500, "tpm": 30000},
+    "anthropic": {"rpm": 50, "tpm": 40000},
+    "gemini": {"rpm": 1000, "tpm": 1000000},
+    "ollama": {"rpm": None, "tpm": None},
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLE_STATUS = {429, 529}
+
+MAX_RETRIES = 6
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text.
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute``."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        # A single request larger than the bucket would never fit; let it
+        # through once the bucket is full rather than blocking forever.
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server reports we are throttled."""
+        with self.lock:
+            self._refill()
+            self.tokens = 0
+
+
+class AdaptiveConcurrency:
+    """Additive-increase/multiplicative-decrease limit on requests in flight."""
+
+    def __init__(self, maximum, minimum=1, increase_after=20):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = maximum
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def on_success(self):
+        with self.condition:
+            self.successes += 1
+            if self.successes >= self.increase_after and self.limit < self.maximum:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify()
+
+    def on_throttle(self):
+        with self.condition:
+            self.limit = max(self.minimum, self.limit // 2)
+            self.successes = 0
+
+
+class ProviderLimiter:
+    def __init__(self, provider):
+        self.provider = provider
+        defaults = RATE_LIMITS.get(provider, {"rpm": None, "tpm": None})
+        rpm = _budget(f"{provider.upper()}_RPM", defaults["rpm"])
+        tpm = _budget(f"{provider.upper()}_TPM", defaults["tpm"])
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(max_in_flight_for(provider))
+        self.throttled = 0
+        self.retries = 0
+
+    def call(self, fn, *args, tokens=1, max_retries=MAX_RETRIES, **kwargs):
+        for attempt in range(max_retries + 1):
+            if self.requests:
+                self.requests.acquire()
+            if self.tokens:
+                self.tokens.acquire(tokens)
+            self.concurrency.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                status = status_code(e)
+                if attempt == max_retries or not is_retryable(e, status):
+                    raise
+                if status in THROTTLE_STATUS or _is_resource_exhausted(e):
+                    self.throttled += 1
+                    self.concurrency.on_throttle()
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.drain()
+                self.retries += 1
+                delay = retry_after(e)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                # A misbehaving server may ask for hours; cap it like our own backoff.
+                delay = min(delay, MAX_DELAY)
+                print(f"{self.provider}: {type(e).__name__} (status {status}), "
+                      f"retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.release()
+            time.sleep(delay)
+
+
+def _budget(env_name, default):
+    value = os.getenv(env_name)
+    if value is None:
+        return default
+    return int(value) or None
+
+
+def status_code(error):
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _is_resource_exhausted(error):
+    # google.api_core raises ResourceExhausted for quota errors.
+    return type(error).__name__ == "ResourceExhausted"
+
+
+def is_retryable(error, status=None):
+    if status is None:
+        status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    name = type(error).__name__
+    return any(word in name for word in ("Connection", "Timeout", "Unavailable", "ResourceExhausted"))
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, if it said so."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get_limiter(provider):
+    key = (provider, os.getpid())
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = ProviderLimiter(provider)
+        return _limiters[key]
+
+
+def max_output_tokens(params):
+    """The completion cap a request's model parameters set, 0 without one.
+
+    OpenAI takes max_completion_tokens (or the older max_tokens), Anthropic
+    max_tokens, Gemini a generation_config max_output_tokens and Ollama
+    options.num_predict.
+    """
+    params = params or {}
+    for key in ("max_completion_tokens", "max_tokens", "max_output_tokens"):
+        if params.get(key):
+            return int(params[key])
+    for nested, key in (("generation_config", "max_output_tokens"), ("options", "num_predict")):
+        value = (params.get(nested) or {}).get(key)
+        if value and int(value) > 0:
+            return int(value)
+    return 0
+
+
+def rate_limited(provider, params=None, output_tokens=None):
+    """Decorate a query function taking the prompt text as first argument.
+
+    Every call charges the tokens-per-minute budget with the prompt's
+    estimated size plus the completion it may produce: ``output_tokens``, or
+    by default the cap set in the request's model ``params`` (see
+    ``max_output_tokens``). Requests without a cap reserve only the prompt.
+    """
+    if output_tokens is None:
+        output_tokens = max_output_tokens(params)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(prompt, *args, **kwargs):
+            tokens = estimate_tokens(prompt if isinstance(prompt, str) else str(prompt)) + output_tokens
+            return get_limiter(provider).call(fn, prompt, *args, tokens=tokens, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,225 @@
+"""On-disk cache of model responses shared by every query_* function.
+
+Responses are stored in a SQLite database keyed by a hash of the model id,
+the prompt text and the generation parameters (max tokens, temperature,
+system prompt, Ollama options, ...), so rerunning a runner or a second
+runner that sends the same request gets the stored answer instead of
+querying the model again. Least recently used entries are evicted once the
+database grows past its size limit. Hit and miss counts are kept per model.
+
+Settings (environment or .env file):
+  RESPONSE_CACHE=0            turn the cache off
+  RESPONSE_CACHE_PATH         database file (default .cache/responses.sqlite)
+  RESPONSE_CACHE_MAX_MB       size limit in MB (default 1024)
+
+Inspect or clear it with ``python -m utils.response_cache [--clear]``.
+"""
+import atexit
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(".cache", "responses.sqlite")
+DEFAULT_MAX_MB = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    model TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def cache_key(model, prompt, params=None):
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params or {}},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread- and process-safe SQLite store with LRU eviction."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, model, column):
+        self._conn().execute(
+            f"INSERT INTO stats (model, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(model) DO UPDATE SET {column} = {column} + 1",
+            (model,),
+        )
+
+    def get(self, key, model):
+        conn = self._conn()
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            self._count(model, "misses")
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._count(model, "hits")
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, data, size, now, now),
+        )
+        with self._lock:
+            self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self, target=0.9):
+        """Drop least recently used entries until under ``target`` of the limit."""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        goal = self.max_bytes * target
+        if total > goal:
+            freed = 0
+            rows = conn.execute("SELECT key, size FROM responses ORDER BY last_used")
+            stale = []
+            for key, size in rows:
+                if total - freed <= goal:
+                    break
+                stale.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            total -= freed
+        with self._lock:
+            self._size = total
+
+    def stats(self):
+        conn = self._conn()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        per_model = conn.execute(
+            "SELECT s.model, s.hits, s.misses, COUNT(r.key) FROM stats s "
+            "LEFT JOIN responses r ON r.model = s.model GROUP BY s.model ORDER BY s.model"
+        ).fetchall()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "models": {model: {"hits": hits, "misses": misses, "entries": count}
+                       for model, hits, misses, count in per_model},
+        }
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM stats")
+        conn.execute("VACUUM")
+        with self._lock:
+            self._size = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled():
+    return os.getenv("RESPONSE_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_mb = float(os.getenv("RESPONSE_CACHE_MAX_MB", DEFAULT_MAX_MB))
+            _cache = ResponseCache(os.getenv("RESPONSE_CACHE_PATH", DEFAULT_PATH), int(max_mb * 1024 * 1024))
+            atexit.register(_report)
+        return _cache
+
+
+def _report():
+    if _cache is not None and _cache.hits + _cache.misses:
+        total = _cache.hits + _cache.misses
+        print(f"Response cache: {_cache.hits} hits, {_cache.misses} misses "
+              f"({_cache.hits / total:.1%} hit rate)")
+
+
+def cached_response(model, **params):
+    """Decorate a query function taking the prompt text as first argument.
+
+    ``model`` and ``params`` must describe everything besides the prompt
+    that affects the response, since together they form the cache key.
+    Exceptions are not cached.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(prompt, *args, **kwargs):
+            if not cache_enabled():
+                return fn(prompt, *args, **kwargs)
+            cache = get_cache()
+            key = cache_key(model, prompt, params)
+            response = cache.get(key, model)
+            if response is not None:
+                return response
+            response = fn(prompt, *args, **kwargs)
+            if response is not None:
+                cache.put(key, model, response)
+            return response
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    import sys
+
+    if not cache_enabled():
+        print("The response cache is disabled (RESPONSE_CACHE=0).")
+        sys.exit(0)
+    cache = get_cache()
+    if "--clear" in sys.argv[1:]:
+        cache.clear()
+        print(f"Cleared {cache.path}")
+    stats = cache.stats()
+    print(f"{cache.path}: {stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MB")
+    for model, counts in stats["models"].items():
+        lookups = counts["hits"] + counts["misses"]
+        rate = counts["hits"] / lookups if lookups else 0.0
+        print(f"  {model}: {counts['entries']} entries, {counts['hits']} hits, "
+              f"{counts['misses']} misses ({rate:.1%})")
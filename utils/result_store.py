@@ -0,0 +1,280 @@
+"""Append-only result storage shared by the medqa/ and medbullet/ runners.
+
+Records are appended to ``<name>.jsonl`` next to the ``<name>.json`` file the
+graphs and misc/count_* scripts read. The JSON array is exported from the
+JSONL log once per run instead of being rewritten after every record.
+``iter_json_array`` and ``write_json_array`` read and write those arrays one
+record at a time for the scripts that count or re-judge them.
+"""
+import glob
+import json
+import os
+import time
+
+
+def jsonl_path_for(output_dir, filename):
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(output_dir, f"{stem}.jsonl")
+
+
+def segment_paths(jsonl_path):
+    """Return rotated segments (oldest first) followed by the active file."""
+    stem = jsonl_path[: -len(".jsonl")]
+    segments = sorted(
+        path for path in glob.glob(f"{glob.escape(stem)}.*.jsonl")
+        if path[len(stem) + 1:-len(".jsonl")].isdigit()
+    )
+    if os.path.exists(jsonl_path):
+        segments.append(jsonl_path)
+    return segments
+
+
+def iter_records(jsonl_path):
+    """Yield every record in a JSONL log, skipping a torn trailing line."""
+    for path in segment_paths(jsonl_path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: skipping unreadable line {line_no} in {path}")
+
+
+def iter_json_array(json_path, chunk_size=1 << 16):
+    """Yield the items of a JSON array file one at a time.
+
+    The file is read in ``chunk_size`` pieces and each item is decoded as
+    soon as it is complete, so memory stays at about one item plus one chunk
+    however large the file is.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def read_more():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        def next_char():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    return ""
+                read_more()
+
+        if next_char() != "[":
+            raise ValueError(f"{json_path} does not hold a JSON array")
+        pos += 1
+        if next_char() == "]":
+            return
+        while True:
+            next_char()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    read_more()
+                    continue
+                after = end
+                while after < len(buffer) and buffer[after].isspace():
+                    after += 1
+                # Until a delimiter follows, a number such as "-3e" may go on
+                # in the next chunk.
+                if not eof and (after == len(buffer) or buffer[after] not in ",]"):
+                    read_more()
+                    continue
+                break
+            pos = end
+            yield item
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos += 1
+
+
+def iter_json_file(path):
+    """Yield the records of a JSONL log (with its segments) or a JSON array."""
+    if path.endswith(".jsonl"):
+        return iter_records(path)
+    return iter_json_array(path)
+
+
+def write_json_array(records, json_path, indent=4, ensure_ascii=True):
+    """Stream ``records`` out as a JSON array.
+
+    The output is byte-for-byte what ``json.dump(records, f, indent=indent)``
+    produces, but records are written as they come so memory stays flat.
+    The file is written to a temporary path and swapped in atomically, so
+    ``records`` may be read from ``json_path`` itself.
+    """
+    pad = " " * indent
+    tmp_path = f"{json_path}.tmp"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                body = json.dumps(record, indent=indent, ensure_ascii=ensure_ascii).replace("\n", "\n" + pad)
+                f.write(("[\n" if count == 0 else ",\n") + pad + body)
+                count += 1
+            f.write("\n]" if count else "[]")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, json_path)
+    return count
+
+
+def export_json(jsonl_path, json_path, indent=4):
+    """Write the JSONL log out as the JSON array format used before."""
+    return write_json_array(iter_records(jsonl_path), json_path, indent)
+
+
+def iter_results(output_dir, filename):
+    """Yield every stored record for ``filename``, from the JSONL log if any."""
+    jsonl_path = jsonl_path_for(output_dir, filename)
+    if segment_paths(jsonl_path):
+        yield from iter_records(jsonl_path)
+        return
+    json_path = os.path.join(output_dir, filename)
+    if os.path.exists(json_path) and os.path.getsize(json_path) > 0:
+        count = 0
+        try:
+            for record in iter_json_array(json_path):
+                count += 1
+                yield record
+        except ValueError:
+            print(f"Warning: {json_path} is corrupted; using the {count} records before the error.")
+
+
+def result_files(output_dir):
+    """Names of the result sets in ``output_dir`` (JSON array or JSONL log)."""
+    if not os.path.isdir(output_dir):
+        return []
+    stems = set()
+    for name in os.listdir(output_dir):
+        stem, ext = os.path.splitext(name)
+        # Rotated segments, batch files and checkpoints have a dot in the stem.
+        if ext in (".json", ".jsonl") and "." not in stem:
+            stems.add(stem)
+    return [f"{stem}.json" for stem in sorted(stems)]
+
+
+def load_results(output_dir, filename):
+    """Load every stored record for ``filename`` as a list."""
+    return list(iter_results(output_dir, filename))
+
+
+class ResultWriter:
+    """Append records to a JSONL log and export the JSON array on close.
+
+    Writes are flushed immediately and fsync'd every ``fsync_every`` records
+    or ``fsync_interval`` seconds, whichever comes first. Once the active
+    file grows past ``max_bytes`` it is renamed to a numbered segment with
+    ``os.replace`` and a fresh file is started.
+
+    Records whose ``dedupe_key`` value was already written are skipped, which
+    keeps reruns from duplicating entries. An existing ``<name>.json`` from
+    an older run is imported into the log the first time it is opened.
+    """
+
+    def __init__(self, output_dir, filename, dedupe_key="prompt", fsync_every=50,
+                 fsync_interval=5.0, max_bytes=256 * 1024 * 1024):
+        os.makedirs(output_dir or ".", exist_ok=True)
+        self.json_path = os.path.join(output_dir, filename)
+        self.path = jsonl_path_for(output_dir, filename)
+        self.dedupe_key = dedupe_key
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.seen = set()
+        self.written = 0
+
+        legacy = []
+        if not segment_paths(self.path):
+            legacy = load_results(output_dir, filename)
+        else:
+            for record in iter_records(self.path):
+                self._remember(record)
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        if legacy:
+            print(f"Importing {len(legacy)} existing records from {self.json_path}")
+            for record in legacy:
+                self.write(record)
+            self.sync()
+
+    def _remember(self, record):
+        if self.dedupe_key and isinstance(record, dict):
+            self.seen.add(record.get(self.dedupe_key))
+
+    def __contains__(self, key):
+        return key in self.seen
+
+    def write(self, record):
+        """Append one record. Returns False if it was skipped as a duplicate."""
+        if self.dedupe_key and record.get(self.dedupe_key) in self.seen:
+            return False
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self._remember(record)
+        self.written += 1
+        self._pending += 1
+        if (self._pending >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+        if self._file.tell() >= self.max_bytes:
+            self.rotate()
+        return True
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def rotate(self):
+        self.sync()
+        self._file.close()
+        index = len(segment_paths(self.path))
+        stem = self.path[: -len(".jsonl")]
+        os.replace(self.path, f"{stem}.{index:04d}.jsonl")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self, export=True):
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+        if export:
+            count = export_json(self.path, self.json_path)
+            print(f"Results saved to {self.json_path} ({count} records)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Re-export JSON arrays from logs left behind by an interrupted run:
+    #   python -m utils.result_store results/openai/gpt4o_8var.jsonl ...
+    import sys
+
+    for path in sys.argv[1:]:
+        json_path = path[: -len(".jsonl")] + ".json"
+        print(f"{json_path}: {export_json(path, json_path)} records")
@@ -0,0 +1,202 @@
+"""Correct/total counts of every result file, for the graph scripts.
+
+The runners write ``<root>/<model>/<name>.json`` for the 8-variant runs and
+``<root>/<model>/ablation/<excluded>_results.json`` for the ablations (see
+``utils.scheduler.output_dir_for``). ``scan_results`` reads every record
+under a root once and counts correct answers per
+
+    (model, tone, ai_role, physician_description, category, excluded)
+
+into a columnar table: a dict of NumPy arrays, one entry per distinct key.
+The helpers below turn that table into the arrays the graph scripts plot,
+so the figures no longer need the counts typed in.
+
+    python -m utils.result_table medqa_results [--csv medqa_counts.csv]
+"""
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from utils.result_store import iter_results, result_files
+from utils.significance import BASELINE, VARIATIONS, is_correct, variation_name
+
+# The runners are started from the repository root, so the result folders
+# (utils.scheduler.OUTPUT_ROOTS) are found there unless told otherwise.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Result folder (scheduler model name) -> label used in the figures.
+MODEL_LABELS = {
+    "gpt": "GPT-4o",
+    "sonnet": "Claude-3.5 Sonnet",
+    "haiku": "Claude-3.5 Haiku",
+    "geminipro": "Gemini-1.5 Pro",
+    "gemini": "Gemini-1.5 Flash",
+    "llama3": "Llama-3 8B",
+    "llama3med": "Llama-3 Med42 8B",
+    "deepseek": "DeepSeek-R1 8B",
+}
+
+# Ablation file stem -> label used in the figures, in radar chart order.
+EXCLUSIONS = {
+    "no_exclusion": "No Exclusion",
+    "demographic_data": "Demographic Data",
+    "history_taking": "History Taking",
+    "past_history": "Past History",
+    "physical_exam": "Physical Exam",
+    "lab_tests": "Lab and Diagnostic",
+    "others": "Other",
+}
+# Older runs saved the unmodified questions as normal.json.
+EXCLUSION_ALIASES = {"normal": "no_exclusion", "other": "others"}
+
+KEY_COLUMNS = ["model", "tone", "ai_role", "physician_description", "category", "excluded", "variation"]
+
+
+def excluded_name(filename):
+    stem = os.path.splitext(filename)[0]
+    stem = stem.replace("results ", "")
+    if stem.endswith("_results"):
+        stem = stem[: -len("_results")]
+    return EXCLUSION_ALIASES.get(stem, stem)
+
+
+def record_key(record, model, excluded):
+    metadata = record.get("metadata")
+    metadata = metadata if isinstance(metadata, dict) else {}
+    tone = metadata.get("tone")
+    if not isinstance(tone, str):
+        # Some runners stored the whole metadata dict as the tone.
+        tone = record.get("label", "")
+    return (
+        model,
+        tone.lower(),
+        metadata.get("ai_role", ""),
+        metadata.get("physician_description", ""),
+        record.get("category", record.get("Category", "")) or "",
+        excluded_name(record["excluded"]) if record.get("excluded") else excluded,
+        variation_name(record),
+    )
+
+
+def results_root_arg(description):
+    """Parse a graph script's command line; returns the folder holding the results.
+
+    That is ``--results-root`` if given, else the repository root, so the
+    scripts find medqa_results/ and medbullets_results/ whatever the cwd.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--results-root", default=REPO_ROOT,
+                        help="folder containing medqa_results/ and medbullets_results/ (default: repository root)")
+    return parser.parse_args().results_root
+
+
+def scan_results(root, labels=None):
+    """Count every record under ``root`` in one pass.
+
+    Returns a dict of equal-length arrays: the ``KEY_COLUMNS`` and the
+    ``true`` and ``total`` counts. ``excluded`` is empty for 8-variant runs.
+    """
+    labels = MODEL_LABELS if labels is None else labels
+    counts = {}
+    model_dirs = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    for folder in model_dirs:
+        model_dir = os.path.join(root, folder)
+        if not os.path.isdir(model_dir):
+            continue
+        model = labels.get(folder, folder)
+        sources = [(model_dir, filename, "") for filename in result_files(model_dir)]
+        ablation_dir = os.path.join(model_dir, "ablation")
+        sources += [(ablation_dir, filename, excluded_name(filename)) for filename in result_files(ablation_dir)]
+        for output_dir, filename, excluded in sources:
+            for record in iter_results(output_dir, filename):
+                if not isinstance(record, dict):
+                    continue
+                cell = counts.setdefault(record_key(record, model, excluded), [0, 0])
+                cell[0] += is_correct(record)
+                cell[1] += 1
+
+    keys = list(counts)
+    table = {column: np.array([key[i] for key in keys], dtype=object) for i, column in enumerate(KEY_COLUMNS)}
+    table["true"] = np.array([counts[key][0] for key in keys], dtype=np.int64)
+    table["total"] = np.array([counts[key][1] for key in keys], dtype=np.int64)
+    return table
+
+
+def count(table, **where):
+    """Summed (true, total) of the rows matching every ``column=value``."""
+    mask = np.ones(len(table["true"]), dtype=bool)
+    for column, value in where.items():
+        mask &= table[column] == value
+    return int(table["true"][mask].sum()), int(table["total"][mask].sum())
+
+
+def _category_filter(category):
+    return {} if category is None else {"category": category}
+
+
+def unperturbed_counts(table, models, category=None):
+    """(true, false) of each model's unperturbed questions, shape (models, 2)."""
+    counts = np.zeros((len(models), 2), dtype=np.int64)
+    for i, model in enumerate(models):
+        true, total = count(table, model=model, excluded="no_exclusion", variation=BASELINE,
+                            **_category_filter(category))
+        counts[i] = true, total - true
+    return counts
+
+
+def perturbation_counts(table, models, variations=None, category=None):
+    """(true, false) per model and variation, shape (models, variations, 2).
+
+    The "Original prompt" column is the model's no_exclusion ablation run.
+    """
+    variations = [BASELINE] + VARIATIONS if variations is None else variations
+    counts = np.zeros((len(models), len(variations), 2), dtype=np.int64)
+    for i, model in enumerate(models):
+        for j, variation in enumerate(variations):
+            if variation == BASELINE:
+                counts[i, j] = unperturbed_counts(table, [model], category)[0]
+                continue
+            true, total = count(table, model=model, excluded="", variation=variation,
+                                **_category_filter(category))
+            counts[i, j] = true, total - true
+    return counts
+
+
+def ablation_accuracy(table, models, exclusions=None, category=None):
+    """Accuracy in percent per model and excluded section, NaN if not run."""
+    exclusions = list(EXCLUSIONS) if exclusions is None else exclusions
+    accuracy = np.full((len(models), len(exclusions)), np.nan)
+    for i, model in enumerate(models):
+        for j, excluded in enumerate(exclusions):
+            true, total = count(table, model=model, excluded=excluded, variation=BASELINE,
+                                **_category_filter(category))
+            if total:
+                accuracy[i, j] = true / total * 100
+    return accuracy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count correct answers in every result file under a folder.")
+    parser.add_argument("root", help="results folder, e.g. medqa_results")
+    parser.add_argument("--csv", help="write the table to this CSV file instead of printing it")
+    args = parser.parse_args()
+
+    table = scan_results(args.root)
+    columns = KEY_COLUMNS + ["true", "total"]
+    rows = sorted(zip(*(table[column] for column in columns)))
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        print(f"{len(rows)} rows saved to {args.csv}")
+        return
+    for row in rows:
+        model, tone, ai_role, physician, category, excluded, variation, true, total = row
+        print(f"{model:<18} {excluded or '8var':<16} {variation:<54} {category[:30]:<30} {true:>5}/{total:<5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Run a (dataset x model x experiment) matrix of jobs in one process.
+
+The run_*.py scripts used to call each model's runner one after another, so
+the GPU sat idle while the API models ran and vice versa. Here every job is
+queued on its backend's lane (one lane per provider), and the lanes run side
+by side: the Ollama models go one at a time on the local GPU while the
+OpenAI, Anthropic and Gemini models run concurrently with them. Requests
+inside a job are still capped by the per-provider limits of the async engine
+and rate limiter, which all jobs on the same provider share.
+
+A summary line per running job is printed every ``summary_interval``
+seconds in place of the per-job progress bars.
+
+    python -m utils.scheduler --medqa-8var data/medqa_test.json \\
+        --medqa-ablation data/medqa_ablation --models gpt llama3
+"""
+import argparse
+import importlib
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from utils.async_engine import progress_sink
+
+DATASETS = ["medqa", "medbullet"]
+EXPERIMENTS = ["8var", "ablation"]
+
+# Runner module for every (dataset, experiment) and model.
+RUNNERS = {
+    ("medqa", "8var"): {
+        "deepseek": "medqa.deepseek_8var",
+        "gemini": "medqa.gemini_8var",
+        "geminipro": "medqa.geminipro_8var",
+        "gpt": "medqa.gpt_8var",
+        "haiku": "medqa.haiku_8var",
+        "llama3": "medqa.llama3_8var",
+        "llama3med": "medqa.llama3med_8var",
+        "sonnet": "medqa.sonnet_8var",
+    },
+    ("medqa", "ablation"): {
+        "deepseek": "medqa.ablation_deepseek",
+        "gemini": "medqa.ablation_geminiflash",
+        "geminipro": "medqa.ablation_geminipro",
+        "gpt": "medqa.ablation_gpt",
+        "haiku": "medqa.ablation_haiku",
+        "llama3": "medqa.ablation_llama3",
+        "llama3med": "medqa.ablation_llama3med",
+        "sonnet": "medqa.ablation_sonnet",
+    },
+    ("medbullet", "8var"): {
+        "deepseek": "medbullet.deepseek_8var",
+        "gemini": "medbullet.geminiflash_8var",
+        "geminipro": "medbullet.geminipro_8var",
+        "gpt": "medbullet.gpt_8var",
+        "haiku": "medbullet.haiku_8var",
+        "llama3": "medbullet.llama3_8var",
+        "llama3med": "medbullet.llama3med_8var",
+        "sonnet": "medbullet.sonnet_8var",
+    },
+    ("medbullet", "ablation"): {
+        "deepseek": "medbullet.ablation_deepseek",
+        "gemini": "medbullet.ablation_geminiflash",
+        "geminipro": "medbullet.geminipro_ablation",
+        "gpt": "medbullet.gpt_ablation",
+        "haiku": "medbullet.haiku_ablation",
+        "llama3": "medbullet.llama3_ablation",
+        "llama3med": "medbullet.llama3_med_ablation",
+        "sonnet": "medbullet.sonnet_ablation",
+    },
+}
+
+ENTRY_POINTS = {
+    "8var": "run_evaluation",
+    "ablation": "process_datasets",
+}
+
+MODEL_PROVIDERS = {
+    "deepseek": "ollama",
+    "gemini": "gemini",
+    "geminipro": "gemini",
+    "gpt": "openai",
+    "haiku": "anthropic",
+    "llama3": "ollama",
+    "llama3med": "ollama",
+    "sonnet": "anthropic",
+}
+MODELS = list(MODEL_PROVIDERS)
+
+# Jobs allowed to run at once per backend. Ollama jobs share one GPU, so
+# they run one after another. Override with e.g. OPENAI_MAX_JOBS=4.
+MAX_JOBS = {
+    "ollama": 1,
+    "openai": 2,
+    "anthropic": 2,
+    "gemini": 2,
+}
+
+OUTPUT_ROOTS = {
+    "medqa": "medqa_results",
+    "medbullet": "medbullets_results",
+}
+
+
+def max_jobs_for(provider):
+    return int(os.getenv(f"{provider.upper()}_MAX_JOBS", MAX_JOBS.get(provider, 1)))
+
+
+def output_dir_for(dataset, model, experiment, output_roots=None):
+    root = (output_roots or OUTPUT_ROOTS)[dataset]
+    if experiment == "ablation":
+        return os.path.join(root, model, "ablation")
+    return os.path.join(root, model, "")
+
+
+def build_jobs(data, models=None, output_roots=None):
+    """Expand ``data`` into jobs, one per model.
+
+    ``data`` maps (dataset, experiment) to the input: the dataset file for
+    8var runs, the folder of ablation files for ablation runs. Combinations
+    without an input are left out.
+    """
+    jobs = []
+    for dataset in DATASETS:
+        for experiment in EXPERIMENTS:
+            input_path = data.get((dataset, experiment))
+            if not input_path:
+                continue
+            for model in models or MODELS:
+                jobs.append({
+                    "name": f"{dataset}/{experiment}/{model}",
+                    "module": RUNNERS[(dataset, experiment)][model],
+                    "entry": ENTRY_POINTS[experiment],
+                    "provider": MODEL_PROVIDERS[model],
+                    "args": (input_path, output_dir_for(dataset, model, experiment, output_roots)),
+                    "status": "pending",
+                    "progress": None,
+                    "started": None,
+                    "finished": None,
+                    "error": None,
+                })
+    return jobs
+
+
+def _run_job(job):
+    job["status"] = "running"
+    job["started"] = time.monotonic()
+
+    def report(desc, done, total):
+        job["progress"] = (desc, done, total)
+
+    try:
+        runner = getattr(importlib.import_module(job["module"]), job["entry"])
+        with progress_sink(report):
+            runner(*job["args"])
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = e
+        print(f"{job['name']} failed: {e}")
+        traceback.print_exc()
+    finally:
+        job["finished"] = time.monotonic()
+
+
+def _format_elapsed(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def print_summary(jobs, started):
+    counts = {status: 0 for status in ("pending", "running", "done", "failed")}
+    for job in jobs:
+        counts[job["status"]] += 1
+    print(f"[{_format_elapsed(time.monotonic() - started)}] "
+          f"{counts['done']}/{len(jobs)} done, {counts['running']} running, "
+          f"{counts['pending']} pending, {counts['failed']} failed")
+    for job in jobs:
+        if job["status"] != "running":
+            continue
+        line = f"    {job['name']:<28} {_format_elapsed(time.monotonic() - job['started'])}"
+        if job["progress"]:
+            desc, done, total = job["progress"]
+            line += f"  {desc}: {done}/{total}" if total else f"  {desc}: {done}"
+            if total:
+                line += f" ({done / total:.0%})"
+        print(line)
+
+
+def run_jobs(jobs, summary_interval=30):
+    """Run jobs on per-provider lanes and return them with their final status."""
+    lanes = {}
+    futures = []
+    for job in jobs:
+        provider = job["provider"]
+        if provider not in lanes:
+            lanes[provider] = ThreadPoolExecutor(
+                max_workers=max_jobs_for(provider), thread_name_prefix=f"{provider}-jobs"
+            )
+        futures.append(lanes[provider].submit(_run_job, job))
+
+    started = time.monotonic()
+    stop = threading.Event()
+
+    def monitor():
+        while not stop.wait(summary_interval):
+            print_summary(jobs, started)
+
+    monitor_thread = threading.Thread(target=monitor, daemon=True)
+    monitor_thread.start()
+    try:
+        wait(futures)
+    finally:
+        stop.set()
+        for lane in lanes.values():
+            lane.shutdown(wait=True)
+
+    print_summary(jobs, started)
+    for job in jobs:
+        elapsed = _format_elapsed(job["finished"] - job["started"]) if job["finished"] else "-"
+        print(f"    {job['name']:<28} {job['status']:<8} {elapsed}")
+    return jobs
+
+
+def run_matrix(data, models=None, output_roots=None, summary_interval=30):
+    jobs = build_jobs(data, models, output_roots)
+    if not jobs:
+        print("Nothing to run: set the dataset file or ablation folder first.")
+        return jobs
+    return run_jobs(jobs, summary_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run perturbation and ablation experiments for many models at once.")
+    for dataset in DATASETS:
+        parser.add_argument(f"--{dataset}-8var", metavar="FILE", help=f"{dataset} dataset file for the 8-variant runs")
+        parser.add_argument(f"--{dataset}-ablation", metavar="DIR", help=f"folder of {dataset} ablation files")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS)
+    parser.add_argument("--summary-interval", type=float, default=30, help="seconds between progress summaries")
+    args = parser.parse_args()
+
+    data = {
+        (dataset, experiment): getattr(args, f"{dataset}_{experiment}")
+        for dataset in DATASETS for experiment in EXPERIMENTS
+    }
+    jobs = build_jobs(data, args.models)
+    if not jobs:
+        parser.error("give at least one dataset file or ablation folder")
+    run_jobs(jobs, args.summary_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Paired per-question analysis of the perturbations, from the result records.
+
+Every 8-variant record asks a question that the baseline run (the ablation
+no_exclusion.json / normal.json results) asked unperturbed. Records are
+joined on a hash of the question text in the prompt: each question gets a
+column in an index once, and each model's outcomes are scattered into
+arrays of shape (variations, questions), with -1 where a record is missing.
+The 2x2 flip matrix of every model x variation
+
+                      perturbed wrong   perturbed right
+    baseline wrong        [0, 0]            [0, 1]
+    baseline right        [1, 0]            [1, 1]
+
+is then counted in one vectorized pass, and the exact McNemar test runs on
+its off-diagonal (correct -> incorrect, incorrect -> correct). Fisher's
+exact test and the two-proportion z-test use the counts only. p-values are
+FDR-corrected (Benjamini-Hochberg) across all cells, as in the graph
+scripts.
+
+    python -m utils.significance medqa_results/gpt/ablation/no_exclusion.json \\
+        medqa_results/gpt/gpt4o_8var.json
+    python -m utils.significance --pair GPT-4o BASELINE PERTURBED \\
+        --pair Llama-3 BASELINE PERTURBED --csv flips.csv
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+
+import numpy as np
+from statsmodels.stats.multitest import multipletests
+
+from utils.result_store import load_results
+from utils.stats import fisher_exact_test, mcnemar_test, two_proportion_z_test
+
+BASELINE = "Original prompt"
+# Same order as the graph scripts.
+VARIATIONS = [
+    "Hedged Tone/Novice physician/Medical expert AI",
+    "Hedged Tone/Novice physician/Medical assistant AI",
+    "Hedged Tone/Expert physician/Medical expert AI",
+    "Hedged Tone/Expert physician/Medical assistant AI",
+    "Definitive Tone/Novice physician/Medical expert AI",
+    "Definitive Tone/Novice physician/Medical assistant AI",
+    "Definitive Tone/Expert physician/Medical expert AI",
+    "Definitive Tone/Expert physician/Medical assistant AI",
+]
+TESTS = ["mcnemar", "fisher", "ztest"]
+
+_QUESTION = re.compile(r"Question:\s*(.*?)\n\n(?:Choices|Options):", re.DOTALL)
+
+
+def question_key(record):
+    """The question text of a record's prompt, shared by all its variants."""
+    match = _QUESTION.search(record["prompt"])
+    return match.group(1).strip() if match else record["prompt"]
+
+
+def question_id(record):
+    return hashlib.sha1(question_key(record).encode("utf-8")).hexdigest()[:16]
+
+
+def variation_name(record):
+    """Name a record's variation as the graph scripts do."""
+    metadata = record.get("metadata")
+    if not isinstance(metadata, dict) or "ai_role" not in metadata:
+        return BASELINE
+    tone = metadata.get("tone")
+    if not isinstance(tone, str):
+        # Some runners stored the whole metadata dict as the tone.
+        tone = record.get("label", "")
+    tone = "Hedged Tone" if tone.lower() == "less assertive" else "Definitive Tone"
+    physician = "Novice physician" if "novice" in metadata["physician_description"] else "Expert physician"
+    role = "Medical expert AI" if metadata["ai_role"] == "medical expert" else "Medical assistant AI"
+    return f"{tone}/{physician}/{role}"
+
+
+def is_correct(record):
+    value = record.get("is_correct")
+    return value is True or value == "true"
+
+
+def outcome_arrays(baseline_records, perturbed_records):
+    """Join every model's records on question id.
+
+    Both arguments map a model name to its records. Returns the model
+    names, the variation names, the baseline outcomes (models x questions)
+    and the perturbed outcomes (models x variations x questions) as int8
+    arrays holding 1 (correct), 0 (incorrect) or -1 (no record).
+    """
+    models = list(perturbed_records)
+    found = {variation_name(record) for records in perturbed_records.values() for record in records}
+    found.discard(BASELINE)
+    variations = [v for v in VARIATIONS if v in found] + sorted(found - set(VARIATIONS))
+    variation_index = {variation: i for i, variation in enumerate(variations)}
+
+    questions = {}
+    baseline_cells = []
+    perturbed_cells = []
+    for m, model in enumerate(models):
+        for record in baseline_records.get(model, []):
+            q = questions.setdefault(question_id(record), len(questions))
+            baseline_cells.append((m, q, is_correct(record)))
+        for record in perturbed_records[model]:
+            v = variation_index.get(variation_name(record))
+            if v is None:
+                continue
+            q = questions.setdefault(question_id(record), len(questions))
+            perturbed_cells.append((m, v, q, is_correct(record)))
+
+    baseline = np.full((len(models), len(questions)), -1, dtype=np.int8)
+    perturbed = np.full((len(models), len(variations), len(questions)), -1, dtype=np.int8)
+    if baseline_cells:
+        m, q, correct = np.array(baseline_cells, dtype=np.int64).T
+        baseline[m, q] = correct
+    if perturbed_cells:
+        m, v, q, correct = np.array(perturbed_cells, dtype=np.int64).T
+        perturbed[m, v, q] = correct
+    return models, variations, baseline, perturbed
+
+
+def flip_matrices(baseline, perturbed):
+    """Count (baseline outcome, perturbed outcome) pairs for every cell.
+
+    Returns an array of shape (models, variations, 2, 2); only questions
+    with both records are counted.
+    """
+    base = baseline[:, None, :]
+    paired = (base >= 0) & (perturbed >= 0)
+    # 0..3 for the four outcome pairs, 4 for unpaired questions.
+    code = np.where(paired, base * 2 + perturbed, 4).astype(np.int8)
+    counts = (code[..., None] == np.arange(4, dtype=np.int8)).sum(axis=-2)
+    return counts.reshape(counts.shape[:-1] + (2, 2))
+
+
+def paired_analysis(baseline_records, perturbed_records, adjust="fdr_bh"):
+    """One row per model x variation with its flips and every test's p."""
+    models, variations, baseline, perturbed = outcome_arrays(baseline_records, perturbed_records)
+    if not models or not variations:
+        return []
+    flips = flip_matrices(baseline, perturbed)
+    baseline_true = (baseline == 1).sum(axis=-1)[:, None].repeat(len(variations), axis=1)
+    baseline_total = (baseline >= 0).sum(axis=-1)[:, None].repeat(len(variations), axis=1)
+    perturbed_true = (perturbed == 1).sum(axis=-1)
+    perturbed_total = (perturbed >= 0).sum(axis=-1)
+
+    p_values = {
+        "mcnemar": mcnemar_test(flips[..., 1, 0], flips[..., 0, 1]),
+        "fisher": fisher_exact_test(baseline_true, baseline_total, perturbed_true, perturbed_total),
+        "ztest": two_proportion_z_test(baseline_true, baseline_total, perturbed_true, perturbed_total),
+    }
+    adjusted = {test: multipletests(p.flatten(), method=adjust)[1].reshape(p.shape)
+                for test, p in p_values.items()}
+
+    rows = []
+    for m, model in enumerate(models):
+        for v, variation in enumerate(variations):
+            row = {
+                "model": model,
+                "variation": variation,
+                "pairs": int(flips[m, v].sum()),
+                "baseline_true": int(baseline_true[m, v]),
+                "baseline_total": int(baseline_total[m, v]),
+                "perturbed_true": int(perturbed_true[m, v]),
+                "perturbed_total": int(perturbed_total[m, v]),
+                "correct_to_incorrect": int(flips[m, v, 1, 0]),
+                "incorrect_to_correct": int(flips[m, v, 0, 1]),
+            }
+            for test in TESTS:
+                row[f"p_{test}"] = float(p_values[test][m, v])
+                row[f"q_{test}"] = float(adjusted[test][m, v])
+            rows.append(row)
+    return rows
+
+
+def significance_table(baseline_records, perturbed_records, adjust="fdr_bh"):
+    """``paired_analysis`` for a single model's two result files."""
+    return paired_analysis({"": baseline_records}, {"": perturbed_records}, adjust)
+
+
+def stars(p):
+    if p < 0.001:
+        return "***"
+    if p < 0.01:
+        return "**"
+    if p < 0.05:
+        return "*"
+    return "ns"
+
+
+def load(path):
+    return load_results(os.path.dirname(path), os.path.basename(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test every perturbation against the baseline results.")
+    parser.add_argument("baseline", nargs="?", help="result file of the unperturbed prompts")
+    parser.add_argument("perturbed", nargs="?", help="result file of the 8-variant run")
+    parser.add_argument("--pair", nargs=3, action="append", default=[], metavar=("MODEL", "BASELINE", "PERTURBED"),
+                        help="a model's baseline and 8-variant result files (repeatable)")
+    parser.add_argument("--test", choices=TESTS, default="mcnemar", help="test used for the significance stars")
+    parser.add_argument("--csv", help="also write the table to this CSV file")
+    args = parser.parse_args()
+
+    pairs = list(args.pair)
+    if args.baseline and args.perturbed:
+        model = os.path.splitext(os.path.basename(args.perturbed))[0]
+        pairs.insert(0, (model, args.baseline, args.perturbed))
+    if not pairs:
+        parser.error("give BASELINE PERTURBED or at least one --pair")
+    baseline_records = {model: load(baseline) for model, baseline, _ in pairs}
+    perturbed_records = {model: load(perturbed) for model, _, perturbed in pairs}
+
+    rows = paired_analysis(baseline_records, perturbed_records)
+    if not rows:
+        print("No perturbed records found.")
+        return
+    width = max(len("Model"), *(len(row["model"]) for row in rows))
+    print(f"{'Model':<{width}} {'Variation':<54} {'Pairs':>5} {'Base %':>7} {'Pert %':>7} "
+          f"{'C->I':>5} {'I->C':>5} {'McNemar':>9} {'Fisher':>9} {'z-test':>9}  FDR")
+    for row in rows:
+        print(f"{row['model']:<{width}} {row['variation']:<54} {row['pairs']:>5} "
+              f"{row['baseline_true'] / max(row['baseline_total'], 1) * 100:>7.2f} "
+              f"{row['perturbed_true'] / max(row['perturbed_total'], 1) * 100:>7.2f} "
+              f"{row['correct_to_incorrect']:>5} {row['incorrect_to_correct']:>5} "
+              f"{row['q_mcnemar']:>9.5f} {row['q_fisher']:>9.5f} {row['q_ztest']:>9.5f}  "
+              f"{stars(row[f'q_{args.test}'])}")
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Table saved to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
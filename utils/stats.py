@@ -0,0 +1,226 @@
+"""Statistics shared by the graph scripts.
+
+Resamples are drawn as NumPy arrays instead of in Python loops: the
+bootstrap draws every cell of a figure (model x variation, and category if
+given) in one call, and the permutation test works in chunks of at most
+``MAX_CHUNK_ELEMENTS`` values so memory stays bounded for large samples.
+Pass a seeded ``np.random.Generator`` (see ``make_rng``) to get the same
+intervals and p-values on every run.
+
+Accuracies are in percent, as in the figures.
+
+For two accuracies given as counts, ``proportion_test`` is an exact
+(Fisher) or analytic (two-proportion z) alternative to the permutation test
+that takes microseconds per cell; ``mcnemar_test`` compares paired
+per-question outcomes (see ``utils.significance``).
+"""
+import os
+
+import numpy as np
+from scipy.special import ndtr, ndtri
+from scipy.stats import binom, fisher_exact
+
+# Upper bound on the values held in one resampling chunk (~32 MB of float64).
+MAX_CHUNK_ELEMENTS = 1 << 22
+
+DEFAULT_SEED = 0
+
+
+def make_rng(seed=None):
+    """Generator seeded from ``seed``, the STATS_SEED variable, or 0."""
+    if seed is None:
+        seed = int(os.getenv("STATS_SEED", DEFAULT_SEED))
+    return np.random.default_rng(seed)
+
+
+def _chunks(n_resamples, row_size):
+    rows = max(1, MAX_CHUNK_ELEMENTS // max(row_size, 1))
+    for start in range(0, n_resamples, rows):
+        yield min(rows, n_resamples - start)
+
+
+def permutation_test(baseline, perturbed, n_permutations=10000, rng=None):
+    """Two-sided permutation test for a difference in means.
+
+    Pools both samples, reassigns them to the two groups at random
+    ``n_permutations`` times, and returns the fraction of reassignments whose
+    difference in means is at least as large in magnitude as the observed
+    one (the loop formerly copied into each perturbation script).
+
+    Only the sum of the values drawn into the baseline group matters. When
+    the pooled sample has few distinct values (bootstrapped accuracies take
+    a few dozen), the number of copies of each value the baseline group gets
+    is drawn directly from its multivariate hypergeometric distribution,
+    which is the same null distribution as shuffling at a fraction of the
+    cost. Otherwise each chunk draws a matrix of random subsets.
+    """
+    rng = rng if rng is not None else make_rng()
+    baseline = np.asarray(baseline, dtype=float)
+    perturbed = np.asarray(perturbed, dtype=float)
+    combined = np.concatenate((baseline, perturbed))
+    n_baseline = len(baseline)
+    n_perturbed = len(perturbed)
+    total = combined.sum()
+    values, counts = np.unique(combined, return_counts=True)
+    by_value = len(values) * 4 <= len(combined)
+
+    def mean_diff(baseline_sum):
+        # The perturbed group holds everything not drawn into the baseline.
+        return (total - baseline_sum) / n_perturbed - baseline_sum / n_baseline
+
+    def baseline_sums(rows):
+        if by_value:
+            return rng.multivariate_hypergeometric(counts, n_baseline, size=rows) @ values
+        keys = rng.random((rows, len(combined)))
+        chosen = np.argpartition(keys, n_baseline - 1, axis=1)[:, :n_baseline]
+        return combined[chosen].sum(axis=1)
+
+    # Permuted sums add the same values in another order; allow for rounding
+    # so exact ties (common with bootstrapped accuracies) still count.
+    threshold = abs(mean_diff(baseline.sum())) - 1e-10 * np.abs(combined).max(initial=0)
+    row_size = len(values) if by_value else len(combined)
+    count = 0
+    for rows in _chunks(n_permutations, row_size):
+        count += np.count_nonzero(np.abs(mean_diff(baseline_sums(rows))) >= threshold)
+    return count / n_permutations
+
+
+def bootstrap_accuracy(correct, total, n_resamples=1000, rng=None):
+    """Parametric bootstrap of the accuracy of every cell.
+
+    ``correct`` and ``total`` are arrays of counts with the same shape (one
+    entry per cell); the result has that shape plus a last axis of
+    ``n_resamples`` accuracies drawn from Binomial(total, correct / total).
+    """
+    rng = rng if rng is not None else make_rng()
+    correct = np.asarray(correct, dtype=float)
+    total = np.asarray(total, dtype=float)
+    draws = rng.binomial(total[..., None].astype(np.int64), (correct / total)[..., None],
+                         size=total.shape + (n_resamples,))
+    return draws / total[..., None] * 100
+
+
+def _quantiles(sorted_samples, q):
+    """Per-cell quantiles ``q`` of samples sorted along the last axis."""
+    position = np.clip(q, 0, 1) * (sorted_samples.shape[-1] - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, sorted_samples.shape[-1] - 1)
+    low = np.take_along_axis(sorted_samples, below[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(sorted_samples, above[..., None], axis=-1)[..., 0]
+    return low + (high - low) * (position - below)
+
+
+def percentile_ci(samples, level=0.95):
+    tail = (1 - level) / 2 * 100
+    lower, upper = np.percentile(samples, [tail, 100 - tail], axis=-1)
+    return lower, upper
+
+
+def bca_ci(correct, total, samples, level=0.95):
+    """Bias-corrected and accelerated bootstrap interval of each accuracy.
+
+    The acceleration comes from the closed-form jackknife of a proportion,
+    (n - 2k) / (6 * sqrt(n k (n - k))) for k correct out of n. Cells where
+    every answer was right (or wrong) get a zero-width interval.
+    """
+    correct = np.asarray(correct, dtype=float)
+    total = np.asarray(total, dtype=float)
+    observed = correct / total * 100
+    below = np.mean(samples < observed[..., None], axis=-1)
+    ties = np.mean(samples == observed[..., None], axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bias = ndtri(below + ties / 2)
+        acceleration = (total - 2 * correct) / (6 * np.sqrt(total * correct * (total - correct)))
+        z = ndtri((1 - level) / 2)
+        bounds = []
+        for z_tail in (z, -z):
+            shifted = bias + z_tail
+            bounds.append(ndtr(bias + shifted / (1 - acceleration * shifted)))
+    sorted_samples = np.sort(samples, axis=-1)
+    degenerate = (correct == 0) | (correct == total)
+    lower = np.where(degenerate, observed, _quantiles(sorted_samples, np.nan_to_num(bounds[0])))
+    upper = np.where(degenerate, observed, _quantiles(sorted_samples, np.nan_to_num(bounds[1], nan=1.0)))
+    return lower, upper
+
+
+def wilson_ci(correct, total, level=0.95):
+    """Wilson score interval of each accuracy (no resampling needed)."""
+    correct = np.asarray(correct, dtype=float)
+    total = np.asarray(total, dtype=float)
+    z = ndtri(0.5 + level / 2)
+    p = correct / total
+    denominator = 1 + z ** 2 / total
+    centre = (p + z ** 2 / (2 * total)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / total + z ** 2 / (4 * total ** 2)) / denominator
+    return (centre - half_width) * 100, (centre + half_width) * 100
+
+
+CI_METHODS = ["percentile", "bca", "wilson"]
+
+
+def accuracy_ci(correct, total, method="percentile", samples=None, level=0.95, n_resamples=1000, rng=None):
+    """Lower and upper confidence bounds of every cell's accuracy.
+
+    ``samples`` from ``bootstrap_accuracy`` are reused by the percentile
+    and BCa methods if given, and drawn otherwise.
+    """
+    if method not in CI_METHODS:
+        raise ValueError(f"Unknown interval method '{method}', expected one of {CI_METHODS}")
+    if method == "wilson":
+        return wilson_ci(correct, total, level)
+    if samples is None:
+        samples = bootstrap_accuracy(correct, total, n_resamples, rng)
+    if method == "bca":
+        return bca_ci(correct, total, samples, level)
+    return percentile_ci(samples, level)
+
+
+def fisher_exact_test(baseline_true, baseline_total, perturbed_true, perturbed_total):
+    """Two-sided Fisher's exact test of every cell's 2x2 table."""
+    tables = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in
+                                   (baseline_true, baseline_total, perturbed_true, perturbed_total)))
+    p_values = np.empty(tables[0].shape)
+    for index in np.ndindex(p_values.shape):
+        b_true, b_total, p_true, p_total = (a[index] for a in tables)
+        table = [[b_true, b_total - b_true], [p_true, p_total - p_true]]
+        p_values[index] = fisher_exact(table)[1]
+    return p_values
+
+
+def two_proportion_z_test(baseline_true, baseline_total, perturbed_true, perturbed_total):
+    """Two-sided pooled z-test for a difference between two accuracies."""
+    baseline_true, baseline_total, perturbed_true, perturbed_total = (
+        np.asarray(a, dtype=float) for a in (baseline_true, baseline_total, perturbed_true, perturbed_total)
+    )
+    pooled = (baseline_true + perturbed_true) / (baseline_total + perturbed_total)
+    se = np.sqrt(pooled * (1 - pooled) * (1 / baseline_total + 1 / perturbed_total))
+    diff = perturbed_true / perturbed_total - baseline_true / baseline_total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(se > 0, diff / se, 0.0)
+    return 2 * ndtr(-np.abs(z))
+
+
+PROPORTION_TESTS = {
+    "fisher": fisher_exact_test,
+    "ztest": two_proportion_z_test,
+}
+
+
+def proportion_test(method, baseline_true, baseline_total, perturbed_true, perturbed_total):
+    """p-value of every cell from counts alone, without resampling."""
+    if method not in PROPORTION_TESTS:
+        raise ValueError(f"Unknown test '{method}', expected one of {sorted(PROPORTION_TESTS)}")
+    return PROPORTION_TESTS[method](baseline_true, baseline_total, perturbed_true, perturbed_total)
+
+
+def mcnemar_test(only_baseline, only_perturbed):
+    """Exact McNemar test from the discordant pair counts.
+
+    ``only_baseline`` counts questions answered correctly at baseline but
+    not after the perturbation, ``only_perturbed`` the reverse.
+    """
+    only_baseline = np.asarray(only_baseline, dtype=np.int64)
+    only_perturbed = np.asarray(only_perturbed, dtype=np.int64)
+    discordant = only_baseline + only_perturbed
+    p_values = 2 * binom.cdf(np.minimum(only_baseline, only_perturbed), discordant, 0.5)
+    return np.where(discordant > 0, np.minimum(p_values, 1.0), 1.0)
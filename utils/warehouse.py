@@ -0,0 +1,205 @@
+"""Parquet copy of every runner output, for fast counts and summaries.
+
+``ingest`` converts the result files under the output roots into one
+Parquet dataset partitioned the way the runners lay them out:
+
+    results_warehouse/dataset=medqa/model=gpt/experiment=8var/part-0.parquet
+
+Each row is one record with typed columns (``is_correct`` is a bool, the
+metadata fields, category and excluded section are strings), so a group-by
+reads only the columns it needs instead of re-parsing the pretty-printed
+JSON arrays. A partition is rewritten only when one of its source files
+changed since the last ingest (tracked in ``_manifest.json``).
+
+    python -m utils.warehouse ingest [--out results_warehouse]
+    python -m utils.warehouse summary --by model experiment excluded variation [--excel counts.xlsx]
+"""
+import argparse
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.result_store import iter_results, jsonl_path_for, segment_paths
+from utils.result_table import excluded_name, record_key, result_files
+from utils.scheduler import OUTPUT_ROOTS
+from utils.significance import is_correct, question_id
+
+DEFAULT_WAREHOUSE = "results_warehouse"
+MANIFEST = "_manifest.json"
+PARTITIONS = ["dataset", "model", "experiment"]
+
+SCHEMA = pa.schema([
+    ("file", pa.string()),
+    ("question_id", pa.string()),
+    ("is_correct", pa.bool_()),
+    ("tone", pa.string()),
+    ("ai_role", pa.string()),
+    ("physician_description", pa.string()),
+    ("category", pa.string()),
+    ("excluded", pa.string()),
+    ("variation", pa.string()),
+    ("correct_answer", pa.string()),
+    ("model_answer", pa.string()),
+    ("prompt", pa.string()),
+    ("response", pa.string()),
+])
+
+
+def partition_sources(roots=None):
+    """``{(dataset, model, experiment): [(output_dir, filename), ...]}``."""
+    partitions = {}
+    for dataset, root in (roots or OUTPUT_ROOTS).items():
+        if not os.path.isdir(root):
+            continue
+        for model in sorted(os.listdir(root)):
+            model_dir = os.path.join(root, model)
+            if not os.path.isdir(model_dir):
+                continue
+            for experiment, output_dir in (("8var", model_dir), ("ablation", os.path.join(model_dir, "ablation"))):
+                files = [(output_dir, filename) for filename in result_files(output_dir)]
+                if files:
+                    partitions[(dataset, model, experiment)] = files
+    return partitions
+
+
+def source_paths(output_dir, filename):
+    """Files holding a result set: its JSONL segments, or else the JSON array."""
+    return segment_paths(jsonl_path_for(output_dir, filename)) or [os.path.join(output_dir, filename)]
+
+
+def fingerprint(files):
+    stamps = {}
+    for output_dir, filename in files:
+        for path in source_paths(output_dir, filename):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                stamps[path] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def partition_table(files, experiment):
+    columns = {name: [] for name in SCHEMA.names}
+    for output_dir, filename in files:
+        excluded = excluded_name(filename) if experiment == "ablation" else ""
+        for record in iter_results(output_dir, filename):
+            if not isinstance(record, dict):
+                continue
+            _, tone, ai_role, physician, category, excluded_value, variation = record_key(record, "", excluded)
+            columns["file"].append(filename)
+            columns["question_id"].append(question_id(record) if "prompt" in record else None)
+            columns["is_correct"].append(is_correct(record))
+            columns["tone"].append(tone)
+            columns["ai_role"].append(ai_role)
+            columns["physician_description"].append(physician)
+            columns["category"].append(category)
+            columns["excluded"].append(excluded_value)
+            columns["variation"].append(variation)
+            for field in ("correct_answer", "model_answer", "prompt", "response"):
+                value = record.get(field)
+                columns[field].append(None if value is None else str(value))
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+def partition_dir(warehouse, key):
+    return os.path.join(warehouse, *(f"{name}={value}" for name, value in zip(PARTITIONS, key)))
+
+
+def ingest(roots=None, warehouse=DEFAULT_WAREHOUSE, force=False):
+    """Convert changed result files into Parquet. Returns the partitions written."""
+    os.makedirs(warehouse, exist_ok=True)
+    manifest_path = os.path.join(warehouse, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    written = []
+    sources = partition_sources(roots)
+    for key, files in sources.items():
+        name = "/".join(key)
+        stamps = fingerprint(files)
+        if manifest.get(name) == stamps:
+            continue
+        table = partition_table(files, key[2])
+        directory = partition_dir(warehouse, key)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        pq.write_table(table, os.path.join(directory, "part-0.parquet"), compression="zstd")
+        manifest[name] = stamps
+        written.append((name, table.num_rows))
+
+    # Drop partitions whose result files are gone.
+    current = {"/".join(key) for key in sources}
+    for name in list(manifest):
+        if name not in current:
+            shutil.rmtree(partition_dir(warehouse, name.split("/")), ignore_errors=True)
+            del manifest[name]
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+    return written
+
+
+def read(warehouse=DEFAULT_WAREHOUSE, columns=None, filters=None):
+    """Load the warehouse (or only ``columns`` of the rows matching ``filters``) as a DataFrame.
+
+    ``filters`` uses the pyarrow form, e.g. ``[("dataset", "=", "medqa")]``;
+    filters on the partition columns skip the other partitions' files.
+    """
+    table = pq.read_table(warehouse, columns=columns, filters=filters, partitioning="hive")
+    return table.to_pandas()
+
+
+def summary(warehouse=DEFAULT_WAREHOUSE, by=("dataset", "model", "experiment", "excluded", "variation"),
+            filters=None):
+    """Correct, total and accuracy (%) for every group of ``by``."""
+    frame = read(warehouse, columns=list(by) + ["is_correct"], filters=filters)
+    for column in by:
+        if hasattr(frame[column], "cat"):
+            frame[column] = frame[column].astype(str)
+    grouped = frame.groupby(list(by), sort=True)["is_correct"].agg(["sum", "count"]).reset_index()
+    grouped = grouped.rename(columns={"sum": "true", "count": "total"})
+    grouped["accuracy"] = grouped["true"] / grouped["total"] * 100
+    return grouped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert result files to Parquet and summarize them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = sub.add_parser("ingest", help="convert changed result files")
+    ingest_parser.add_argument("--out", default=DEFAULT_WAREHOUSE)
+    ingest_parser.add_argument("--root", nargs=2, action="append", metavar=("DATASET", "FOLDER"),
+                               help="results folder of a dataset (default: the scheduler's output folders)")
+    ingest_parser.add_argument("--force", action="store_true", help="rewrite every partition")
+    summary_parser = sub.add_parser("summary", help="accuracy per group")
+    summary_parser.add_argument("--warehouse", default=DEFAULT_WAREHOUSE)
+    summary_parser.add_argument("--by", nargs="+", default=["dataset", "model", "experiment", "excluded", "variation"],
+                                choices=PARTITIONS + [name for name in SCHEMA.names if name not in ("prompt", "response")])
+    summary_parser.add_argument("--dataset", help="only this dataset")
+    summary_parser.add_argument("--excel", help="write the summary to this Excel file")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        roots = dict(args.root) if args.root else None
+        written = ingest(roots, args.out, args.force)
+        for name, rows in written:
+            print(f"{name}: {rows} records")
+        print(f"{len(written)} partition(s) updated in {args.out}")
+        return
+
+    filters = [("dataset", "=", args.dataset)] if args.dataset else None
+    table = summary(args.warehouse, args.by, filters)
+    if args.excel:
+        table.to_excel(args.excel, index=False, sheet_name="Results")
+        print(f"Summary saved to {args.excel}")
+    else:
+        print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()